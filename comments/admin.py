@@ -1,3 +1,83 @@
+from functools import partial, wraps
+
+from django.conf import settings
 from django.contrib import admin
+from django.db import transaction
+from django.http import QueryDict
+
+from comments.models import Comment
+from comments.sharding import comment_shards
+from posts.trending import record_comments
+from social_media.admin import ScalableModelAdmin, block_selected, unblock_selected
+
+
+def admin_shard(request) -> str:
+    """Shard picked in the changelist, kept by change pages in ``_changelist_filters``."""
+    shard = request.GET.get(ShardFilter.parameter_name) or QueryDict(
+        request.GET.get("_changelist_filters", "")
+    ).get(ShardFilter.parameter_name)
+    shards = comment_shards()
+    return shard if shard in shards else shards[0]
+
+
+def rescoring(action, sign: int):
+    """
+    Take the comments a bulk ``action`` hides out of trending (``sign=-1``),
+    or count the ones it shows (``sign=1``).
+    """
+    @wraps(action)
+    def wrapper(modeladmin, request, queryset):
+        visible = {"is_pending": False, "is_blocked": False}
+        changed = list(
+            (queryset.filter(**visible) if sign < 0 else queryset.exclude(**visible))
+            .select_related(None).only("post_id", "created_at")
+        )
+        action(modeladmin, request, queryset)
+        transaction.on_commit(partial(record_comments, changed, sign), using=queryset.db)
+    return wrapper
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """
+    Comment shard to browse, one at a time. Only shown when COMMENT_SHARDS
+    is set; CommentAdmin.get_queryset does the actual routing.
+    """
+
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in settings.COMMENT_SHARDS]
+
+    def value(self):
+        return super().value() or next(iter(settings.COMMENT_SHARDS), None)
+
+    def choices(self, changelist):
+        for alias, title in self.lookup_choices:
+            yield {
+                "selected": self.value() == alias,
+                "query_string": changelist.get_query_string({self.parameter_name: alias}),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset
+
+
+@admin.register(Comment)
+class CommentAdmin(ScalableModelAdmin):
+    list_display = ("id", "comment", "post", "user", "is_blocked", "is_pending", "created_at")
+    list_filter = (ShardFilter, "is_blocked", "created_at")
+    list_select_related = ("user", "post__user")
+    raw_id_fields = ("post", "user", "parent")
+    readonly_fields = ("path",)
+    actions = (rescoring(block_selected, -1), rescoring(unblock_selected, 1))
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(admin_shard(request))
 
-# Register your models here.
+    def get_list_select_related(self, request):
+        # Posts and users cannot be joined from another database.
+        if settings.COMMENT_SHARDS:
+            return ()
+        return super().get_list_select_related(request)
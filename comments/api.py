@@ -1,21 +1,42 @@
 from django.db.models import Count
 from django.db.models.functions.datetime import TruncDay
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.utils import timezone
+from django.db import models, transaction
 from ninja_extra import api_controller, route, permissions
 from ninja_jwt.authentication import JWTAuth
 from ninja import Query
-from better_profanity import profanity
-from datetime import date
+from datetime import date, datetime, time, timedelta
+from functools import partial
 
-from comments.models import Comment
+from comments.archive import archive_horizon, read_comments
+from comments.hll import HyperLogLog
+from comments.threads import build_thread, path_segment, reply_path
+from comments.ingestion import build_entry, get_comment_queue
+from comments.models import ArchivedComment, Comment, CommentDailySketch
+from comments.sharding import scatter
+from comments.sketches import flush_sketches
 from comments.schemas import (
     CommentSchema,
-    CommentCreationSchema
+    CommentCreationSchema,
+    CommentAcceptedSchema,
+    ThreadSchema
 )
-from posts.tasks import send_auto_reply
+from comments.tasks import drain_comment_queue
+from posts.trending import record_comments
+from posts.tasks import schedule_auto_reply
+from posts.metadata import get_post_metadata
 from posts.models import Post
+from posts.moderation import contains_profanity, is_deferred, visible_to
+from users.auth import OptionalJWTAuth
 from users.schemas import Error
+from social_media.fieldsets import USERNAME, embed_users, parse_expand, sparse_fields
+from social_media.renderers import json_response
+
+
+THREAD_FIELDS = ["id", "parent", "comment", "user", "created_at"]
 
 
 @api_controller
@@ -32,55 +53,226 @@ class CommentController:
             date_from: date = Query(...),
             date_to: date = Query(date.today())
     ):
-        queryset = Comment.objects.filter(
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to
-        ).annotate(day=TruncDay("created_at")).values("day").annotate(
-            created_count=Count("id"),
-            blocked_count=Count("id", filter=models.Q(is_blocked=True))
-        ).values("day", "created_count", "blocked_count")
+        sources = [(Comment, models.Q())]
+        if date_from <= archive_horizon().date():
+            sources.append((ArchivedComment, models.Q()))
+        elif date_from <= archive_horizon(blocked=True).date():
+            # Only blocked comments are archived this early.
+            sources.append((ArchivedComment, models.Q(is_blocked=True)))
 
-        results = list(queryset)
-        return {"results": results}
+        # A plain range on created_at can use its index, unlike __date lookups.
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
 
-    @route.get("/{post_id}/comments/", response=list[CommentSchema])
-    def get_comments_to_post(self, post_id: int):
-        return Comment.objects.filter(post_id=post_id, is_blocked=False)
+        def count_daily(alias):
+            return [
+                row
+                for model, condition in sources
+                for row in model.objects.using(alias).filter(
+                    condition,
+                    created_at__gte=start,
+                    created_at__lt=end
+                ).annotate(day=TruncDay("created_at")).values("day").annotate(
+                    created_count=Count("id"),
+                    blocked_count=Count("id", filter=models.Q(is_blocked=True))
+                ).values("day", "created_count", "blocked_count")
+            ]
 
-    @staticmethod
-    def create_task_to_reply(
-            user_id: int,
-            post: Post,
-            comment: str
+        # Every shard is counted in parallel, then the per-day rows are merged.
+        daily_counts = {}
+        for rows in scatter(count_daily):
+            for row in rows:
+                counts = daily_counts.setdefault(
+                    row["day"], {"day": row["day"], "created_count": 0, "blocked_count": 0}
+                )
+                counts["created_count"] += row["created_count"]
+                counts["blocked_count"] += row["blocked_count"]
+
+        results = sorted(daily_counts.values(), key=lambda counts: counts["day"])
+
+        flush_sketches()
+        sketches = CommentDailySketch.objects.filter(
+            day__gte=date_from,
+            day__lte=date_to
+        )
+        daily_sketches = {
+            sketch.day: (
+                HyperLogLog.from_bytes(sketch.commenters),
+                HyperLogLog.from_bytes(sketch.posts)
+            )
+            for sketch in sketches
+        }
+
+        total_commenters = HyperLogLog()
+        total_posts = HyperLogLog()
+        for commenters, posts in daily_sketches.values():
+            total_commenters.merge(commenters)
+            total_posts.merge(posts)
+
+        for result in results:
+            commenters, posts = daily_sketches.get(
+                result["day"].date(), (HyperLogLog(), HyperLogLog())
+            )
+            result["distinct_commenters"] = commenters.count()
+            result["distinct_posts"] = posts.count()
+
+        return {
+            "results": results,
+            "distinct_commenters": total_commenters.count(),
+            "distinct_posts": total_posts.count(),
+            "distinct_error_rate": total_commenters.error_rate,
+        }
+
+    @route.get(
+        "/{post_id}/comments/",
+        response={200: list[CommentSchema], 400: Error},
+        auth=OptionalJWTAuth()
+    )
+    def get_comments_to_post(
+            self,
+            request,
+            post_id: int,
+            fields: str = None,
+            expand: str = None,
+            before_id: int = None,
+            since_id: int = None,
+            limit: int = Query(None, ge=1, le=100)
     ):
-        if post.user.id == user_id or not post.auto_reply_enabled:
-            return
-        send_auto_reply.apply_async(
-            args=[post.id, post.user.id, comment],
-            countdown=post.auto_reply_delay * 60
+        try:
+            columns = list(sparse_fields(CommentSchema, fields))
+            expand = parse_expand(expand)
+        except ValueError as error:
+            return 400, {"message": str(error)}
+        if before_id is not None and since_id is not None:
+            return 400, {"message": "before_id and since_id cannot be combined"}
+        # Deferred moderation publishes comments out of id order, so a
+        # since_id cursor would skip the ones published after newer comments.
+        if since_id is not None and is_deferred():
+            return 400, {"message": "since_id is not supported with deferred moderation"}
+
+        expand_user = "user" in expand and "user" in columns
+        # Users can only be joined while comments share their database.
+        if expand_user and not settings.COMMENT_SHARDS:
+            columns.append(USERNAME)
+
+        # Comments of a deleted post stay in the table until the purge task
+        # reaches them, so hide them behind the post's tombstone.
+        if not Post.objects.filter(id=post_id).exists():
+            return 200, []
+
+        comments = read_comments(
+            Comment.objects.for_post(post_id).filter(
+                visible_to(request.user), is_blocked=False
+            ),
+            ArchivedComment.objects.for_post(post_id).filter(is_blocked=False),
+            columns,
+            before_id=before_id,
+            limit=limit,
+            since_id=since_id
+        )
+        return json_response(embed_users(comments) if expand_user else comments)
+
+    @route.get(
+        "/{post_id}/comments/thread/",
+        response={200: ThreadSchema},
+        auth=OptionalJWTAuth()
+    )
+    def get_post_thread(
+            self,
+            request,
+            post_id: int,
+            depth: int = Query(3, ge=1, le=settings.COMMENT_MAX_DEPTH + 1),
+            limit: int = Query(20, ge=1, le=100),
+            after_id: int = None
+    ):
+        if not Post.objects.filter(id=post_id).exists():
+            return 200, {"replies": [], "has_more_replies": False}
+
+        return json_response(build_thread(
+            self.thread_comments(request, post_id), THREAD_FIELDS,
+            None, "", depth, limit, after_id
+        ))
+
+    @route.get(
+        "/{post_id}/comments/{comment_id}/thread/",
+        response={200: ThreadSchema},
+        auth=OptionalJWTAuth()
+    )
+    def get_comment_thread(
+            self,
+            request,
+            post_id: int,
+            comment_id: int,
+            depth: int = Query(3, ge=1, le=settings.COMMENT_MAX_DEPTH + 1),
+            limit: int = Query(20, ge=1, le=100),
+            after_id: int = None
+    ):
+        comments = self.thread_comments(request, post_id)
+        root = get_object_or_404(comments.values("path"), id=comment_id)
+
+        return json_response(build_thread(
+            comments, THREAD_FIELDS, comment_id,
+            root["path"] + path_segment(comment_id), depth, limit, after_id
+        ))
+
+    @staticmethod
+    def thread_comments(request, post_id: int):
+        return Comment.objects.for_post(post_id).filter(
+            visible_to(request.user), is_blocked=False
         )
 
     @route.post(
         "/{post_id}/comments/",
-        response={201: CommentSchema, 400: Error},
+        response={201: CommentSchema, 202: CommentAcceptedSchema, 400: Error},
         auth=JWTAuth()
     )
     def create_comment(self, request, post_id: int, comment: CommentCreationSchema):
-        post = get_object_or_404(Post, id=post_id)
+        post = get_post_metadata(post_id)
+        if post is None or not post.visible_to(request.user):
+            raise Http404("Post not found")
 
         comment_data = comment.model_dump()
         user_id = request.user.id
 
-        comment_model = Comment.objects.create(
-            **comment_data, user_id=user_id, post_id=post.id
+        parent_id = comment_data.pop("parent")
+        if parent_id is not None:
+            parent = Comment.objects.for_post(post.id).filter(
+                id=parent_id
+            ).values("path").first()
+            if parent is None:
+                return 400, {"message": "Parent comment not found"}
+            try:
+                comment_data["path"] = reply_path(parent_id, parent["path"])
+            except ValueError as error:
+                return 400, {"message": str(error)}
+            comment_data["parent_id"] = parent_id
+
+        if settings.COMMENT_INGESTION_MODE == "async":
+            queue = get_comment_queue()
+            entry = build_entry(
+                post.id, user_id, comment_data["comment"],
+                parent_id, comment_data.get("path", "")
+            )
+            queue.push(entry)
+            queue.schedule_drain(drain_comment_queue)
+            return 202, {"ingestion_id": entry["ingestion_id"], "post": post.id}
+
+        # Blocked comments are stored as such from the start, so they never
+        # count towards trending posts; pending ones count once published.
+        is_pending = is_deferred()
+        comment_model = Comment.objects.for_post(post.id).create(
+            **comment_data, user_id=user_id, post_id=post.id,
+            is_pending=is_pending,
+            is_blocked=not is_pending and contains_profanity(comment_data["comment"])
         )
+        if comment_model.is_pending:
+            schedule_auto_reply(user_id, post, comment_model.comment, comment_model.id)
+            return 201, comment_model
 
-        if profanity.contains_profanity(comment_data["comment"]):
-            comment_model.is_blocked = True
-            comment_model.save()
+        if comment_model.is_blocked:
             return 400, {"message": "Comment contains profanity"}
 
-        self.create_task_to_reply(request.user.id, post, comment_model.comment)
+        schedule_auto_reply(request.user.id, post, comment_model.comment, comment_model.id)
 
         return 201, comment_model
 
@@ -89,22 +281,31 @@ class CommentController:
         response={200: CommentSchema, 401: Error, 400: Error},
         auth=JWTAuth()
     )
-    def update_comment(self, request, comment_id: int, new_comment: CommentCreationSchema):
-        comment = get_object_or_404(Comment, id=comment_id)
+    def update_comment(self, request, post_id: int, comment_id: int, new_comment: CommentCreationSchema):
+        comment = get_object_or_404(Comment.objects.for_post(post_id), id=comment_id)
 
-        if comment.user.id != request.user.id and not request.user.is_staff:
+        if comment.user_id != request.user.id and not request.user.is_staff:
             return 400, {"message": "Comment can be changed only by author or admin"}
 
-        for attr, value in new_comment.model_dump().items():
+        for attr, value in new_comment.model_dump(exclude={"parent"}).items():
             if value:
                 setattr(comment, attr, value)
 
-        if profanity.contains_profanity(comment.comment):
-            comment.is_blocked = True
-            comment.save()
-            return 400, {"message": "Comment contains profanity"}
-
+        was_visible, profane = comment.is_visible, False
+        if is_deferred():
+            comment.is_pending = True
+        elif contains_profanity(comment.comment):
+            comment.is_blocked = profane = True
         comment.save()
+
+        # An edit that hides the comment takes it out of trending until it
+        # is published again.
+        if was_visible and not comment.is_visible:
+            transaction.on_commit(
+                partial(record_comments, [comment], -1), using=comment._state.db
+            )
+        if profane:
+            return 400, {"message": "Comment contains profanity"}
         return comment
 
     @route.delete(
@@ -112,11 +313,16 @@ class CommentController:
         response={200: str, 401: Error, 400: Error},
         auth=JWTAuth()
     )
-    def delete_comment(self, request, comment_id: int):
-        comment = get_object_or_404(Comment, id=comment_id)
+    def delete_comment(self, request, post_id: int, comment_id: int):
+        comment = get_object_or_404(Comment.objects.for_post(post_id), id=comment_id)
 
-        if comment.user.id != request.user.id and not request.user.is_staff:
+        if comment.user_id != request.user.id and not request.user.is_staff:
             return 400, {"message": "Comment can be deleted only by author or admin"}
 
+        visible = comment.is_visible
         comment.delete()
+        if visible:
+            transaction.on_commit(
+                partial(record_comments, [comment], -1), using=comment._state.db
+            )
         return "Comment was deleted"
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CommentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "comments"
+
+    def ready(self):
+        import comments.signals  # noqa: F401
+        from comments.sharding import reserve_id_range
+
+        post_migrate.connect(reserve_id_range, sender=self)
@@ -0,0 +1,112 @@
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from comments.models import ArchivedComment, Comment
+from comments.sharding import comment_shards
+
+
+ARCHIVED_FIELDS = (
+    "id", "post_id", "comment", "is_blocked", "user_id", "created_at", "ingestion_id",
+    "parent_id", "path",
+)
+
+
+def archive_horizon(now=None, blocked: bool = False):
+    """
+    Nothing created after this moment has been archived, except blocked
+    comments, which may be archived sooner: ``blocked=True`` gives theirs.
+    """
+    days = settings.COMMENT_ARCHIVE_AFTER_DAYS
+    if blocked:
+        days = min(days, settings.BLOCKED_COMMENT_RETENTION_DAYS)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archivable(now=None) -> models.Q:
+    now = now or timezone.now()
+    return (
+        models.Q(created_at__lt=now - timedelta(days=settings.COMMENT_ARCHIVE_AFTER_DAYS))
+        | models.Q(
+            is_blocked=True,
+            created_at__lt=now - timedelta(days=settings.BLOCKED_COMMENT_RETENTION_DAYS)
+        )
+    ) & models.Q(is_pending=False)
+
+
+def archive_comments(batch_size: int = None, now=None) -> int:
+    """
+    Move archivable comments to ``ArchivedComment`` of the same shard in id
+    order, one short transaction per batch, so writers are never blocked for
+    long.
+    """
+    batch_size = batch_size or settings.COMMENT_ARCHIVE_BATCH_SIZE
+    condition = archivable(now)
+    archived = 0
+
+    for alias in comment_shards():
+        last_id = 0
+        while True:
+            with transaction.atomic(using=alias):
+                rows = list(
+                    Comment.objects.using(alias).select_for_update()
+                    .filter(condition, id__gt=last_id)
+                    .order_by("id")
+                    .values(*ARCHIVED_FIELDS)[:batch_size]
+                )
+                if not rows:
+                    break
+
+                ArchivedComment.objects.using(alias).bulk_create(
+                    [ArchivedComment(**row) for row in rows], ignore_conflicts=True
+                )
+                last_id = rows[-1]["id"]
+                Comment.objects.using(alias).filter(
+                    id__in=[row["id"] for row in rows]
+                ).delete()
+            archived += len(rows)
+
+    return archived
+
+
+def read_comments(hot, archived, fields, before_id: int = None, limit: int = None,
+                  since_id: int = None) -> list:
+    """
+    Read comments across hot and archived storage.
+
+    Without ``limit`` every comment (older than ``before_id``, if given) is
+    returned, oldest first. With ``limit`` a page of the newest comments
+    older than ``before_id`` is returned, and the archive is only queried
+    once the live page comes up short, which relies on archived comments
+    being older than the live ones of the same post.
+
+    With ``since_id`` only the comments newer than it are returned, oldest
+    first and at most ``limit`` of them, as two index range scans.
+    """
+    columns = list(dict.fromkeys(["id", *fields]))
+    if before_id is not None:
+        hot = hot.filter(id__lt=before_id)
+        archived = archived.filter(id__lt=before_id)
+
+    if since_id is not None:
+        rows = list(heapq.merge(
+            archived.filter(id__gt=since_id).order_by("id").values(*columns)[:limit],
+            hot.filter(id__gt=since_id).order_by("id").values(*columns)[:limit],
+            key=lambda row: row["id"]
+        ))[:limit]
+    elif limit is None:
+        rows = list(archived.order_by("id").values(*columns))
+        rows += hot.order_by("id").values(*columns)
+    else:
+        rows = list(hot.order_by("-id").values(*columns)[:limit])
+        if len(rows) < limit:
+            older = archived.order_by("-id").values(*columns)[:limit - len(rows)]
+            rows = list(heapq.merge(rows, older, key=lambda row: row["id"], reverse=True))
+
+    if "id" not in fields:
+        for row in rows:
+            del row["id"]
+    return rows
@@ -0,0 +1,205 @@
+import itertools
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+import orjson
+from django.conf import settings
+from django.db import connections, transaction
+
+from comments.live import publish_comments
+from comments.models import Comment
+from comments.sharding import shard_for_post
+from comments.sketches import buffer_comments
+from posts.models import Post
+from posts.moderation import contains_profanity
+from posts.tasks import schedule_auto_reply
+from posts.trending import record_comments
+from social_media.redis import get_redis
+
+
+class RedisCommentQueue:
+    stream = "comments:ingest"
+    drain_scheduled_key = "comments:ingest:scheduled"
+    drain_lock_key = "comments:ingest:lock"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def push(self, entry: dict) -> None:
+        self.client.xadd(self.stream, {"entry": orjson.dumps(entry)})
+
+    def read(self, count: int) -> list:
+        return [
+            (entry_id, orjson.loads(fields[b"entry"]))
+            for entry_id, fields in self.client.xrange(self.stream, count=count)
+        ]
+
+    def ack(self, entry_ids: list) -> None:
+        if entry_ids:
+            self.client.xdel(self.stream, *entry_ids)
+
+    def schedule_drain(self, drain, countdown: float = 0) -> None:
+        if self.client.set(self.drain_scheduled_key, 1, nx=True, ex=60):
+            drain.apply_async(countdown=countdown)
+
+    def drain_scheduled(self) -> None:
+        self.client.delete(self.drain_scheduled_key)
+
+    @contextmanager
+    def drain_lock(self):
+        lock = self.client.lock(self.drain_lock_key, timeout=300)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+
+class MemoryCommentQueue:
+    """
+    In-process stand-in for RedisCommentQueue, for tests and single-node
+    deployments. Draining runs in a background thread of the web process.
+    """
+
+    def __init__(self):
+        self._entries = deque()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._drain_scheduled = False
+
+    def push(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.append((next(self._ids), entry))
+
+    def read(self, count: int) -> list:
+        with self._lock:
+            return list(itertools.islice(self._entries, count))
+
+    def ack(self, entry_ids: list) -> None:
+        acked = set(entry_ids)
+        with self._lock:
+            while self._entries and self._entries[0][0] in acked:
+                self._entries.popleft()
+
+    def schedule_drain(self, drain, countdown: float = 0) -> None:
+        with self._lock:
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+
+        timer = threading.Timer(countdown, self._run_drain, args=[drain])
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _run_drain(drain) -> None:
+        try:
+            drain()
+        finally:
+            connections.close_all()
+
+    def drain_scheduled(self) -> None:
+        with self._lock:
+            self._drain_scheduled = False
+
+    @contextmanager
+    def drain_lock(self):
+        acquired = self._drain_lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._drain_lock.release()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache
+def _comment_queue(backend: str):
+    if backend == "memory":
+        return MemoryCommentQueue()
+    return RedisCommentQueue()
+
+
+def get_comment_queue():
+    return _comment_queue(settings.COMMENT_QUEUE_BACKEND)
+
+
+def build_entry(post_id: int, user_id: int, comment: str,
+                parent_id: int = None, path: str = "") -> dict:
+    return {
+        "ingestion_id": str(uuid.uuid4()),
+        "post_id": post_id,
+        "user_id": user_id,
+        "comment": comment,
+        "parent_id": parent_id,
+        "path": path,
+    }
+
+
+def ingest_comments(entries: list) -> list[Comment]:
+    """
+    Persist queued comments with one batch per shard, in queue order. Entries
+    whose ingestion_id is already stored are skipped, so replaying a batch
+    after a crash neither duplicates comments nor schedules their
+    auto-replies again.
+    """
+    posts = Post.objects.in_bulk({entry["post_id"] for entry in entries})
+    shards = {}
+    for entry in entries:
+        if entry["post_id"] in posts:
+            shards.setdefault(shard_for_post(entry["post_id"]), []).append(entry)
+
+    comments, comment_ids = [], {}
+    for alias, shard_entries in shards.items():
+        seen = {
+            str(ingestion_id) for ingestion_id in Comment.objects.using(alias).filter(
+                ingestion_id__in=[entry["ingestion_id"] for entry in shard_entries]
+            ).values_list("ingestion_id", flat=True)
+        }
+
+        shard_comments = []
+        for entry in shard_entries:
+            if entry["ingestion_id"] in seen:
+                continue
+            seen.add(entry["ingestion_id"])
+            shard_comments.append(Comment(
+                ingestion_id=entry["ingestion_id"],
+                post_id=entry["post_id"],
+                user_id=entry["user_id"],
+                comment=entry["comment"],
+                is_blocked=contains_profanity(entry["comment"]),
+                parent_id=entry.get("parent_id"),
+                path=entry.get("path", ""),
+            ))
+
+        with transaction.atomic(using=alias):
+            Comment.objects.using(alias).bulk_create(shard_comments, ignore_conflicts=True)
+
+        # bulk_create cannot return ids with ignore_conflicts; auto-replies
+        # need them to attach to the comment they answer.
+        comment_ids.update(Comment.objects.using(alias).filter(
+            ingestion_id__in=[comment.ingestion_id for comment in shard_comments]
+        ).values_list("ingestion_id", "id"))
+        comments.extend(shard_comments)
+
+    for comment in comments:
+        comment.id = comment_ids.get(uuid.UUID(comment.ingestion_id))
+
+    buffer_comments(comments)
+    record_comments([comment for comment in comments if comment.is_visible])
+    publish_comments(comments)
+
+    for comment in comments:
+        if not comment.is_blocked:
+            schedule_auto_reply(
+                comment.user_id, posts[comment.post_id], comment.comment, comment.id
+            )
+
+    return comments
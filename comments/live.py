@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import orjson
+from django.conf import settings
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from social_media.redis import get_redis
+from social_media.renderers import dumps
+
+
+logger = logging.getLogger(__name__)
+
+
+def comment_event(comment) -> dict:
+    """A new comment as sent to live listeners, shaped like CommentSchema."""
+    return {
+        "id": comment.id,
+        "post": comment.post_id,
+        "parent": comment.parent_id,
+        "comment": comment.comment,
+        "user": comment.user_id,
+        "created_at": comment.created_at,
+        "ingestion_id": comment.ingestion_id,
+    }
+
+
+class Fanout:
+    """
+    The listeners of this process, by post id. Every listener is an asyncio
+    queue drained by its stream; a listener that falls COMMENT_STREAM_BUFFER
+    events behind misses the newer ones and catches up with ``since_id``.
+    """
+
+    def __init__(self):
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def add(self, post_id: int, queue: asyncio.Queue) -> bool:
+        """Register ``queue``; returns whether it is the first listener of the post."""
+        with self._lock:
+            listeners = self._listeners.setdefault(post_id, {})
+            listeners[queue] = asyncio.get_running_loop()
+            return len(listeners) == 1
+
+    def remove(self, post_id: int, queue: asyncio.Queue) -> bool:
+        """Unregister ``queue``; returns whether the post has no listeners left."""
+        with self._lock:
+            listeners = self._listeners.get(post_id, {})
+            listeners.pop(queue, None)
+            if listeners:
+                return False
+            self._listeners.pop(post_id, None)
+            return True
+
+    def __bool__(self) -> bool:
+        return bool(self._listeners)
+
+    def deliver(self, post_id: int, event: dict) -> None:
+        """Queue ``event`` for every listener of the post; safe to call from any thread."""
+        with self._lock:
+            listeners = list(self._listeners.get(post_id, {}).items())
+        for queue, loop in listeners:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: dict) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class RedisCommentBroker:
+    """
+    Publishes new comments on a Redis channel per post. Each process keeps a
+    single subscriber connection, subscribed to the posts its listeners
+    follow, and fans the messages out in memory.
+    """
+
+    prefix = "comments:live:"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.fanout = Fanout()
+        self._pubsub = None
+        self._reader = None
+
+    def publish(self, post_id: int, event: dict) -> None:
+        self.client.publish(f"{self.prefix}{post_id}", dumps(event))
+
+    @asynccontextmanager
+    async def listen(self, post_id: int):
+        queue = asyncio.Queue(maxsize=settings.COMMENT_STREAM_BUFFER)
+        channel = f"{self.prefix}{post_id}"
+        if self._pubsub is None:
+            self._pubsub = AsyncRedis.from_url(settings.REDIS_URL).pubsub()
+        try:
+            if self.fanout.add(post_id, queue):
+                await self._pubsub.subscribe(channel)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+            yield queue
+        finally:
+            if self.fanout.remove(post_id, queue):
+                await self._pubsub.unsubscribe(channel)
+
+    async def _read(self) -> None:
+        # Stops with the last listener; the next one starts a new reader.
+        while self.fanout:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is not None:
+                post_id = int(message["channel"].decode().removeprefix(self.prefix))
+                self.fanout.deliver(post_id, orjson.loads(message["data"]))
+
+
+class MemoryCommentBroker:
+    """In-process stand-in for RedisCommentBroker, for tests and single-process runs."""
+
+    def __init__(self):
+        self.fanout = Fanout()
+
+    def publish(self, post_id: int, event: dict) -> None:
+        self.fanout.deliver(post_id, orjson.loads(dumps(event)))
+
+    @asynccontextmanager
+    async def listen(self, post_id: int):
+        queue = asyncio.Queue(maxsize=settings.COMMENT_STREAM_BUFFER)
+        self.fanout.add(post_id, queue)
+        try:
+            yield queue
+        finally:
+            self.fanout.remove(post_id, queue)
+
+
+@lru_cache
+def _comment_broker(backend: str):
+    if backend == "memory":
+        return MemoryCommentBroker()
+    return RedisCommentBroker()
+
+
+def get_comment_broker():
+    return _comment_broker(settings.COMMENT_STREAM_BACKEND)
+
+
+def publish_comments(comments) -> None:
+    """Send published ``comments`` to the live listeners of their posts."""
+    broker = get_comment_broker()
+    for comment in comments:
+        if comment.pk is None or comment.is_blocked or comment.is_pending:
+            continue
+        try:
+            broker.publish(comment.post_id, comment_event(comment))
+        except RedisError:
+            logger.warning("Could not publish a live comment", exc_info=True)
+            return
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from comments.archive import archive_comments
+
+
+class Command(BaseCommand):
+    help = "Move old and long-blocked comments to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        archived = archive_comments(batch_size=options["batch_size"])
+        self.stdout.write(f"Archived {archived} comments")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from comments.models import Comment
+from comments.sharding import comment_shards
+from comments.sketches import record_comments_in_sketches
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily distinct-commenter sketches from existing comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        processed = 0
+
+        for alias in comment_shards():
+            last_id = 0
+            while True:
+                batch = list(
+                    Comment.objects.using(alias).filter(id__gt=last_id)
+                    .order_by("id")
+                    .only("id", "user_id", "post_id", "created_at")[:batch_size]
+                )
+                if not batch:
+                    break
+
+                record_comments_in_sketches(batch)
+                last_id = batch[-1].id
+                processed += len(batch)
+
+        self.stdout.write(f"Recorded {processed} comments in daily sketches")
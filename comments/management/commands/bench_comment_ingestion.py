@@ -0,0 +1,81 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from ninja_jwt.tokens import RefreshToken
+
+from comments.models import Comment
+from posts.models import Post
+from social_media.benchmarks import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak comment write absorption of synchronous and write-behind "
+        "ingestion on a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16)
+        parser.add_argument("--comments", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            user = get_user_model().objects.create_user(
+                username="bench_ingestion", password="bench"
+            )
+            post = Post.objects.create(title="Bench", content="Bench", user=user)
+            token = str(RefreshToken.for_user(user).access_token)
+
+            for mode in ("sync", "async"):
+                Comment.objects.all().delete()
+                with override_settings(
+                    ALLOWED_HOSTS=["testserver"],
+                    COMMENT_INGESTION_MODE=mode,
+                    COMMENT_QUEUE_BACKEND="memory"
+                ):
+                    self.run_mode(mode, post.id, token, options)
+
+    def run_mode(self, mode: str, post_id: int, token: str, options: dict):
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def send():
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+            for i in range(options["comments"]):
+                start = time.perf_counter()
+                response = client.post(
+                    f"/api/posts/{post_id}/comments/",
+                    data={"comment": f"Comment {i}"},
+                    content_type="application/json",
+                )
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            connections.close_all()
+
+        threads = [threading.Thread(target=send) for _ in range(options["clients"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        accepted = time.perf_counter() - start
+
+        expected = options["clients"] * options["comments"]
+        while mode == "async" and Comment.objects.count() < statuses.get(202, 0):
+            time.sleep(0.05)
+        persisted = time.perf_counter() - start
+
+        latencies.sort()
+        self.stdout.write(
+            f"{mode:>5}: {expected / accepted:.0f} requests/s absorbed, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms, "
+            f"all persisted after {persisted:.2f}s, statuses {statuses}"
+        )
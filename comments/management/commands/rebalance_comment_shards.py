@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from comments.sharding import comment_shards, rebalance_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Move comments to the shard of their post after COMMENT_SHARDS grew, "
+        "or out of the default database when sharding is turned on"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--include-default", action="store_true",
+            help="Also move comments stored in the default database"
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        sources = comment_shards()
+        if options["include_default"] and settings.COMMENT_SHARDS:
+            sources = ["default", *sources]
+
+        for source in sources:
+            moved = rebalance_shard(source, options["batch_size"], options["dry_run"])
+            verb = "Would move" if options["dry_run"] else "Moved"
+            for target, count in sorted(moved.items()):
+                self.stdout.write(f"{verb} {count} comments from {source} to {target}")
+            if not moved:
+                self.stdout.write(f"{source}: nothing to move")
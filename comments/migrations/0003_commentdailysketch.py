@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0002_comment_is_blocked"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommentDailySketch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True)),
+                ("commenters", models.BinaryField()),
+                ("posts", models.BinaryField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0003_commentdailysketch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="ingestion_id",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
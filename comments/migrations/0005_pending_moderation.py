@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0004_comment_ingestion_id"),
+        ("posts", "0005_pending_moderation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="is_pending",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("is_pending", True)),
+                fields=["id"],
+                name="comment_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.7 on 2026-10-19 15:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0007_comment_threads"),
+        ("posts", "0007_admin_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["is_blocked", "id"], name="comment_blocked_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["created_at"], name="comment_created_idx"),
+        ),
+    ]
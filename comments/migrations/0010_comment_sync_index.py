@@ -0,0 +1,20 @@
+# Generated by Django 5.0.7 on 2026-10-19 15:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0009_shard_friendly_foreign_keys"),
+        ("posts", "0009_remoderation_job_database"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["post", "id"], name="comment_sync_idx"),
+        ),
+    ]
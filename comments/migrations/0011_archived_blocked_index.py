@@ -0,0 +1,22 @@
+# Generated by Django 5.0.7 on 2026-10-19 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comments", "0010_comment_sync_index"),
+        ("posts", "0009_remoderation_job_database"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivedcomment",
+            index=models.Index(
+                fields=["is_blocked", "created_at"], name="archived_blocked_idx"
+            ),
+        ),
+    ]
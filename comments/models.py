@@ -1,21 +1,127 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from comments.sharding import shard_for_post
+from comments.threads import reply_path
 from posts.models import Post
 
 
+class CommentQuerySet(models.QuerySet):
+    def for_post(self, post_id: int):
+        """Comments of a post, read from the post's shard."""
+        return self.using(shard_for_post(post_id)).filter(post_id=post_id)
+
+
 class Comment(models.Model):
+    # Comments may live on another database than posts and users (see
+    # comments.sharding), so their foreign keys are not database constraints.
     post = models.ForeignKey(
-        Post, on_delete=models.CASCADE, related_name="comments"
+        Post, on_delete=models.CASCADE, related_name="comments", db_constraint=False
     )
     comment = models.TextField()
     is_blocked = models.BooleanField(default=False)
     user = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
-        related_name="comments"
+        related_name="comments",
+        db_constraint=False
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    ingestion_id = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False
+    )
+    is_pending = models.BooleanField(default=False)
+    # Not a database constraint, so archiving or deleting a comment leaves
+    # its replies in place.
+    parent = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="replies"
+    )
+    # Concatenated ids of the ancestors, see comments.threads.
+    path = models.CharField(max_length=255, blank=True, default="")
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "path"], name="comment_thread_idx"),
+            # Incremental sync (?since_id=) is a range scan on this index.
+            models.Index(fields=["post", "id"], name="comment_sync_idx"),
+            models.Index(fields=["is_blocked", "id"], name="comment_blocked_idx"),
+            models.Index(fields=["created_at"], name="comment_created_idx"),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_pending=True),
+                name="comment_pending_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Comment by {self.user.username}"
+
+    @property
+    def is_visible(self) -> bool:
+        """Moderated and not blocked: shown to everyone and counted in trending."""
+        return not self.is_pending and not self.is_blocked
+
+    def save(self, *args, **kwargs):
+        if self.parent_id and not self.path:
+            self.path = reply_path(self.parent_id, self.parent.path)
+        super().save(*args, **kwargs)
+
+
+class ArchivedComment(models.Model):
+    """
+    Cold storage for comments moved out of ``Comment`` by
+    ``comments.archive.archive_comments``. Rows keep their original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="archived_comments",
+        db_constraint=False
+    )
+    comment = models.TextField()
+    is_blocked = models.BooleanField(default=False)
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="archived_comments",
+        db_constraint=False
+    )
+    created_at = models.DateTimeField()
+    ingestion_id = models.UUIDField(null=True, blank=True, unique=True)
+    parent = models.ForeignKey(
+        Comment,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+"
+    )
+    path = models.CharField(max_length=255, blank=True, default="")
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Analytics read recently archived blocked comments as a range scan.
+            models.Index(fields=["is_blocked", "created_at"], name="archived_blocked_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived comment by {self.user.username}"
+
+
+class CommentDailySketch(models.Model):
+    day = models.DateField(unique=True)
+    commenters = models.BinaryField()
+    posts = models.BinaryField()
+
+    def __str__(self) -> str:
+        return f"Comment sketch for {self.day}"
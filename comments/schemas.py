@@ -1,4 +1,6 @@
+from datetime import datetime
 from typing import Optional
+from uuid import UUID
 from ninja import Schema, ModelSchema
 
 from comments.models import Comment
@@ -7,10 +9,33 @@ from comments.models import Comment
 class CommentSchema(ModelSchema):
     class Meta:
         model = Comment
-        fields = ("id", "post", "comment", "user", "created_at",)
+        fields = ("id", "post", "parent", "comment", "user", "created_at", "ingestion_id",)
 
 
 class CommentCreationSchema(ModelSchema):
+    parent: Optional[int] = None
+
     class Meta:
         model = Comment
         fields = ("comment",)
+
+
+class CommentThreadSchema(Schema):
+    # A hidden comment with visible replies has only its id and parent set.
+    id: int
+    parent: Optional[int]
+    comment: Optional[str]
+    user: Optional[int]
+    created_at: Optional[datetime]
+    replies: list["CommentThreadSchema"]
+    has_more_replies: bool
+
+
+class ThreadSchema(Schema):
+    replies: list[CommentThreadSchema]
+    has_more_replies: bool
+
+
+class CommentAcceptedSchema(Schema):
+    ingestion_id: UUID
+    post: int
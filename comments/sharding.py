@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+SHARDED_MODELS = {"comments.Comment", "comments.ArchivedComment"}
+
+# Every shard hands out comment ids from its own range, so ids stay unique
+# across shards and comments keep them when rebalanced.
+SHARD_ID_SPACING = 1 << 40
+
+
+def comment_shards() -> list:
+    return settings.COMMENT_SHARDS or ["default"]
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach): growing from n to n + 1 buckets
+    only moves 1 / (n + 1) of the keys, all of them to the new bucket.
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_post(post_id: int) -> str:
+    shards = comment_shards()
+    return shards[jump_hash(post_id, len(shards))]
+
+
+def scatter(function, shards: list = None) -> list:
+    """
+    Call ``function(alias)`` for every shard in parallel and return the
+    results in shard order. A single shard is queried in the calling thread.
+    """
+    shards = shards or comment_shards()
+    if len(shards) == 1:
+        return [function(shards[0])]
+
+    def run(alias):
+        try:
+            return function(alias)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        return list(executor.map(run, shards))
+
+
+def reserve_id_range(using: str, **kwargs) -> None:
+    """post_migrate hook moving a shard's comment id sequence into its range."""
+    if using not in settings.COMMENT_SHARDS:
+        return
+
+    from comments.models import Comment
+
+    start = (settings.COMMENT_SHARDS.index(using) + 1) * SHARD_ID_SPACING
+    table = Comment._meta.db_table
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start]
+                )
+            elif row[0] < start:
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [start, table]
+                )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))",
+                [table, start]
+            )
+
+
+def rebalance_shard(source: str, batch_size: int, dry_run: bool = False) -> dict:
+    """
+    Move the comments of ``source`` whose post hashes to another shard there,
+    in id batches. Rows keep their ids and are copied before they are
+    deleted, so an interrupted run can simply be repeated. Returns the number
+    of rows moved to each shard.
+    """
+    from comments.models import ArchivedComment, Comment
+
+    moved = {}
+    for model in (ArchivedComment, Comment):
+        fields = [field.attname for field in model._meta.concrete_fields]
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.using(source).filter(id__gt=last_id)
+                .order_by("id")
+                .values(*fields)[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            misplaced = {}
+            for row in rows:
+                target = shard_for_post(row["post_id"])
+                if target != source:
+                    misplaced.setdefault(target, []).append(row)
+
+            for target, target_rows in misplaced.items():
+                moved[target] = moved.get(target, 0) + len(target_rows)
+                if dry_run:
+                    continue
+                with transaction.atomic(using=target):
+                    model.objects.using(target).bulk_create(
+                        [model(**row) for row in target_rows], ignore_conflicts=True
+                    )
+                model.objects.using(source).filter(
+                    id__in=[row["id"] for row in target_rows]
+                ).delete()
+    return moved
+
+
+class CommentShardRouter:
+    """
+    Sends comments to the shard of their post. Querysets, including
+    ``create()``, carry no post id, so they pick their shard explicitly with
+    ``Comment.objects.for_post()`` or ``.using()``; instances saved directly
+    are routed by their ``post_id``.
+    """
+
+    def _shard(self, model, hints):
+        instance = hints.get("instance")
+        if model._meta.label not in SHARDED_MODELS:
+            # Users and posts related to a comment live in "default".
+            if instance is not None and instance._meta.label in SHARDED_MODELS:
+                return "default"
+            return None
+
+        if instance is None:
+            return None
+        if instance._meta.label == "posts.Post":
+            return shard_for_post(instance.pk)
+        if instance._meta.label in SHARDED_MODELS:
+            if instance._state.db:
+                return instance._state.db
+            if instance.post_id is not None:
+                return shard_for_post(instance.post_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._meta.label, obj2._meta.label} & SHARDED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.COMMENT_SHARDS:
+            return f"{app_label}.{model_name}".lower() in {
+                label.lower() for label in SHARDED_MODELS
+            }
+        return None
@@ -0,0 +1,67 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from comments.live import publish_comments
+from comments.models import ArchivedComment, Comment
+from comments.sharding import scatter
+from comments.sketches import buffer_comments
+from posts.models import Post
+from posts.trending import forget_posts, record_comments
+
+
+@receiver(post_save, sender=Comment)
+def update_daily_sketch(sender, instance, created, **kwargs):
+    # Buffered, so comment writes never wait for the day's sketch row.
+    if created:
+        transaction.on_commit(partial(buffer_comments, [instance]), using=instance._state.db)
+
+
+@receiver(post_save, sender=Comment)
+def update_trending(sender, instance, created, **kwargs):
+    # Pending comments count once moderate_pending_content publishes them.
+    if created and instance.is_visible:
+        transaction.on_commit(partial(record_comments, [instance]), using=instance._state.db)
+
+
+@receiver(post_save, sender=Comment)
+def publish_live_comment(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(publish_comments, [instance]), using=instance._state.db)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_user_comments(sender, instance, using, **kwargs):
+    """
+    Comments reference users and posts without database constraints, so
+    deleting a user only cascades to the comments on "default". Once the
+    deletion commits, the user's comments and the comments on their posts
+    are deleted on every shard as well.
+    """
+    user_id = instance.pk
+    post_ids = list(
+        Post.all_objects.using(using).filter(user_id=user_id).values_list("id", flat=True)
+    )
+    owned = Q(user_id=user_id) | Q(post_id__in=post_ids)
+
+    def delete(alias):
+        # Comments on posts of other users leave those posts' trending scores.
+        counted = list(
+            Comment.objects.using(alias)
+            .filter(user_id=user_id, is_pending=False, is_blocked=False)
+            .exclude(post_id__in=post_ids)
+            .only("post_id", "created_at")
+        )
+        Comment.objects.using(alias).filter(owned).delete()
+        ArchivedComment.objects.using(alias).filter(owned).delete()
+        return counted
+
+    def delete_everywhere():
+        record_comments([comment for counted in scatter(delete) for comment in counted], -1)
+        forget_posts(post_ids)
+
+    transaction.on_commit(delete_everywhere, using=using)
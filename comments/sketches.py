@@ -0,0 +1,170 @@
+import logging
+import threading
+from datetime import date
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from comments.hll import HyperLogLog
+from comments.models import CommentDailySketch
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+def group_by_day(comments) -> dict:
+    """``{day: (commenter ids, post ids)}`` of ``comments``."""
+    by_day = {}
+    for comment in comments:
+        commenters, posts = by_day.setdefault(
+            timezone.localdate(comment.created_at), (set(), set())
+        )
+        commenters.add(comment.user_id)
+        posts.add(comment.post_id)
+    return by_day
+
+
+def merge_into_sketches(by_day: dict) -> None:
+    """Add ``{day: (commenter ids, post ids)}`` to the daily sketch rows, one lock per day."""
+    for day, (commenter_ids, post_ids) in by_day.items():
+        with transaction.atomic():
+            sketch, created = (
+                CommentDailySketch.objects.select_for_update().get_or_create(
+                    day=day,
+                    defaults={
+                        "commenters": HyperLogLog().to_bytes(),
+                        "posts": HyperLogLog().to_bytes(),
+                    }
+                )
+            )
+            commenters = HyperLogLog.from_bytes(sketch.commenters)
+            posts = HyperLogLog.from_bytes(sketch.posts)
+
+            changed = False
+            for user_id in commenter_ids:
+                changed |= commenters.add(user_id)
+            for post_id in post_ids:
+                changed |= posts.add(post_id)
+
+            if changed:
+                sketch.commenters = commenters.to_bytes()
+                sketch.posts = posts.to_bytes()
+                sketch.save(update_fields=["commenters", "posts"])
+
+
+def record_comments_in_sketches(comments) -> None:
+    """Write ``comments`` to the daily sketches at once, e.g. when backfilling."""
+    merge_into_sketches(group_by_day(comments))
+
+
+class RedisSketchBuffer:
+    """
+    Commenter and post ids of each day in Redis sets, until flush_sketches()
+    takes them. Sets only hold the ids since the last flush, and a day's keys
+    expire when nothing flushes them.
+    """
+
+    prefix = "comments:sketch:"
+    ttl = 7 * 24 * 60 * 60
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def add(self, by_day: dict) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for day, (commenter_ids, post_ids) in by_day.items():
+            for kind, ids in (("commenters", commenter_ids), ("posts", post_ids)):
+                key = f"{self.prefix}{day.isoformat()}:{kind}"
+                pipeline.sadd(key, *ids)
+                pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+    def take(self) -> dict:
+        by_day = {}
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            day, kind = key.decode().removeprefix(self.prefix).split(":")
+            pipeline = self.client.pipeline(transaction=True)
+            pipeline.smembers(key)
+            pipeline.delete(key)
+            members, _ = pipeline.execute()
+            ids = by_day.setdefault(date.fromisoformat(day), (set(), set()))
+            ids[kind == "posts"].update(int(member) for member in members)
+        return by_day
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class MemorySketchBuffer:
+    """In-process stand-in for RedisSketchBuffer, for tests and single-process runs."""
+
+    def __init__(self):
+        self._by_day = {}
+        self._lock = threading.Lock()
+
+    def add(self, by_day: dict) -> None:
+        with self._lock:
+            for day, (commenter_ids, post_ids) in by_day.items():
+                commenters, posts = self._by_day.setdefault(day, (set(), set()))
+                commenters.update(commenter_ids)
+                posts.update(post_ids)
+
+    def take(self) -> dict:
+        with self._lock:
+            by_day, self._by_day = self._by_day, {}
+            return by_day
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_day.clear()
+
+
+@lru_cache
+def _sketch_buffer(backend: str):
+    if backend == "memory":
+        return MemorySketchBuffer()
+    return RedisSketchBuffer()
+
+
+def get_sketch_buffer():
+    return _sketch_buffer(settings.COMMENT_SKETCH_BACKEND)
+
+
+def buffer_comments(comments) -> None:
+    """
+    Queue ``comments`` for the daily sketches, which flush_sketches() merges
+    into the database. When Redis is unavailable they are written directly.
+    """
+    buffer_comments_by_day(group_by_day(comments))
+
+
+def buffer_comments_by_day(by_day: dict) -> None:
+    if not by_day:
+        return
+    try:
+        get_sketch_buffer().add(by_day)
+    except RedisError:
+        logger.warning("Could not buffer comment sketches", exc_info=True)
+        merge_into_sketches(by_day)
+
+
+def flush_sketches() -> int:
+    """Merge the buffered ids into the daily sketch rows; returns the number of days."""
+    try:
+        by_day = get_sketch_buffer().take()
+    except RedisError:
+        logger.warning("Could not flush comment sketches", exc_info=True)
+        return 0
+    try:
+        merge_into_sketches(by_day)
+    except Exception:
+        # Put the ids back for the next flush.
+        buffer_comments_by_day(by_day)
+        raise
+    return len(by_day)
@@ -0,0 +1,35 @@
+from celery import shared_task
+from django.conf import settings
+
+from comments.archive import archive_comments
+from comments.ingestion import get_comment_queue, ingest_comments
+from comments.sketches import flush_sketches
+
+
+@shared_task
+def drain_comment_queue() -> int:
+    queue = get_comment_queue()
+    queue.drain_scheduled()
+
+    # A single drainer at a time keeps comments of a post in queue order.
+    with queue.drain_lock() as acquired:
+        if not acquired:
+            queue.schedule_drain(drain_comment_queue, countdown=1)
+            return 0
+
+        drained = 0
+        while batch := queue.read(settings.COMMENT_INGESTION_BATCH_SIZE):
+            ingest_comments([entry for _, entry in batch])
+            queue.ack([entry_id for entry_id, _ in batch])
+            drained += len(batch)
+        return drained
+
+
+@shared_task
+def archive_old_comments() -> int:
+    return archive_comments()
+
+
+@shared_task
+def flush_comment_sketches() -> int:
+    return flush_sketches()
@@ -1,13 +1,29 @@
 import json
-
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from ninja_jwt.tokens import RefreshToken
 
 from posts.models import Post
+from posts.tasks import moderate_pending_content, send_auto_reply
 from posts.tests import sample_post
-from comments.models import Comment
+from comments.archive import archive_comments
+from comments.hll import HyperLogLog
+from comments.ingestion import MemoryCommentQueue, ingest_comments
+from comments.models import ArchivedComment, Comment, CommentDailySketch
+from comments.sharding import SHARD_ID_SPACING, jump_hash, shard_for_post
+from comments.sketches import get_sketch_buffer
+from comments.tasks import drain_comment_queue, flush_comment_sketches
+from comments.threads import path_segment
 
 
 def sample_comment(post_id, user_id):
@@ -56,6 +72,13 @@ class CommentUnauthorizedTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response_data), 1)
 
+    def test_request_to_get_comments_with_sparse_fields(self):
+        response = self.client.get("/api/posts/1/comments/?fields=id,comment")
+        response_data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_data, [{"id": 1, "comment": "Comment"}])
+
 
 class CommentUserAuthorizedTests(TestCase):
     def setUp(self):
@@ -193,13 +216,14 @@ class CommentAdminTests(TestCase):
         post2 = Post(**post_data)
         post2.save()
 
-        comment = Comment.objects.create(**sample_comment(post1.id, self.user.id))
-        comment.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(**sample_comment(post1.id, self.user.id))
+            comment.save()
 
-        data_with_profanity = sample_comment(post2.id, self.user.id)
-        data_with_profanity["is_blocked"] = True
-        comment_with_profanity = Comment.objects.create(**data_with_profanity)
-        comment_with_profanity.save()
+            data_with_profanity = sample_comment(post2.id, self.user.id)
+            data_with_profanity["is_blocked"] = True
+            comment_with_profanity = Comment.objects.create(**data_with_profanity)
+            comment_with_profanity.save()
 
     def test_get_analytics(self):
         today = timezone.now().date()
@@ -213,6 +237,10 @@ class CommentAdminTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response_data["results"][0]["created_count"], 2)
         self.assertEqual(response_data["results"][0]["blocked_count"], 1)
+        self.assertEqual(response_data["results"][0]["distinct_commenters"], 1)
+        self.assertEqual(response_data["results"][0]["distinct_posts"], 2)
+        self.assertEqual(response_data["distinct_commenters"], 1)
+        self.assertEqual(response_data["distinct_posts"], 2)
 
     def test_get_analytics_with_date_limiter(self):
         comment_data = sample_comment(1, self.user.id)
@@ -229,3 +257,639 @@ class CommentAdminTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response_data["results"][0]["created_count"], 1)
         self.assertEqual(response_data["results"][0]["blocked_count"], 0)
+
+
+@override_settings(COMMENT_SKETCH_BACKEND="memory")
+class CommentSketchBufferTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="user1", password="user1")
+        self.post = Post.objects.create(**sample_post())
+        get_sketch_buffer().clear()
+
+    def test_comments_are_merged_into_the_sketch_by_the_flush(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(3):
+                    Comment.objects.create(**sample_comment(self.post.id, self.user.id))
+        self.assertFalse(any("commentdailysketch" in query["sql"] for query in queries))
+
+        self.assertEqual(flush_comment_sketches(), 1)
+        sketch = CommentDailySketch.objects.get(day=timezone.localdate())
+        self.assertEqual(HyperLogLog.from_bytes(sketch.commenters).count(), 1)
+        self.assertEqual(HyperLogLog.from_bytes(sketch.posts).count(), 1)
+        self.assertEqual(flush_comment_sketches(), 0)
+
+
+class HyperLogLogTests(TestCase):
+    def test_count_within_error_bound(self):
+        sketch = HyperLogLog()
+        for value in range(20000):
+            sketch.add(value)
+
+        error = abs(sketch.count() - 20000) / 20000
+        self.assertLess(error, 3 * sketch.error_rate)
+
+    def test_merge_and_serialization(self):
+        first = HyperLogLog()
+        second = HyperLogLog()
+        for value in range(1000):
+            first.add(value)
+            second.add(value + 500)
+
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+
+        error = abs(merged.count() - 1500) / 1500
+        self.assertLess(error, 3 * merged.error_rate)
+
+
+@override_settings(COMMENT_INGESTION_MODE="async")
+class CommentAsyncIngestionTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            username="user2", password="user2"
+        )
+        self.post = Post(**sample_post(), auto_reply_enabled=True)
+        self.post.save()
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(self.other_user).access_token)}"
+        }
+
+        self.queue = MemoryCommentQueue()
+        self.queue.schedule_drain = mock.Mock()
+        for target in ("comments.api.get_comment_queue", "comments.tasks.get_comment_queue"):
+            patcher = mock.patch(target, return_value=self.queue)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("comments.ingestion.schedule_auto_reply")
+        self.schedule_auto_reply = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_comment(self, text):
+        return self.client.post(
+            f"/api/posts/{self.post.id}/comments/",
+            data=json.dumps({"comment": text}),
+            content_type="application/json",
+            **self.headers
+        )
+
+    def test_comment_accepted_and_persisted_by_drain(self):
+        response = self.create_comment("First")
+        response_data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.queue.schedule_drain.assert_called_once()
+
+        self.assertEqual(drain_comment_queue(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(str(comment.ingestion_id), response_data["ingestion_id"])
+        self.assertEqual(len(self.queue), 0)
+        self.schedule_auto_reply.assert_called_once()
+
+    def test_drain_keeps_order_and_moderates(self):
+        for text in ("First", "damn", "Third"):
+            self.create_comment(text)
+
+        drain_comment_queue()
+
+        comments = Comment.objects.order_by("id")
+        self.assertEqual([c.comment for c in comments], ["First", "damn", "Third"])
+        self.assertEqual([c.is_blocked for c in comments], [False, True, False])
+        self.assertEqual(self.schedule_auto_reply.call_count, 2)
+
+    def test_replay_is_idempotent(self):
+        self.create_comment("First")
+        entries = [entry for _, entry in self.queue.read(10)]
+
+        ingest_comments(entries)
+        ingest_comments(entries)
+
+        self.assertEqual(Comment.objects.count(), 1)
+        self.schedule_auto_reply.assert_called_once()
+
+
+@override_settings(MODERATION_MODE="deferred")
+class CommentDeferredModerationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            username="user2", password="user2"
+        )
+        self.post = Post(**sample_post(), auto_reply_enabled=True)
+        self.post.save()
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(self.other_user).access_token)}"
+        }
+
+        patcher = mock.patch("posts.tasks.send_auto_reply.apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_comment(self, text):
+        return self.client.post(
+            f"/api/posts/{self.post.id}/comments/",
+            data=json.dumps({"comment": text}),
+            content_type="application/json",
+            **self.headers
+        )
+
+    def test_pending_comment_visible_only_to_author(self):
+        response = self.create_comment("damn")
+        url = f"/api/posts/{self.post.id}/comments/"
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(json.loads(self.client.get(url).content)), 0)
+        self.assertEqual(
+            len(json.loads(self.client.get(url, **self.headers).content)), 1
+        )
+
+        moderate_pending_content()
+        self.assertEqual(
+            len(json.loads(self.client.get(url, **self.headers).content)), 0
+        )
+
+    @mock.patch("posts.tasks.get_llm_client")
+    def test_auto_reply_skipped_for_blocked_comment(self, get_llm_client):
+        self.create_comment("damn")
+        comment = Comment.objects.get()
+        self.apply_async.assert_called_once()
+
+        moderate_pending_content()
+        send_auto_reply(self.post.id, self.user.id, comment.comment, comment.id)
+
+        get_llm_client.assert_not_called()
+
+
+@override_settings(COMMENT_ARCHIVE_AFTER_DAYS=30, BLOCKED_COMMENT_RETENTION_DAYS=7)
+class CommentArchiveTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.post = Post.objects.create(**sample_post())
+        now = timezone.now()
+        ages = [40, 35, 10, 1]
+        for age in ages:
+            comment = Comment.objects.create(**sample_comment(self.post.id, self.user.id))
+            Comment.objects.filter(id=comment.id).update(created_at=now - timedelta(days=age))
+        Comment.objects.filter(id=comment.id).update(comment="Latest")
+        self.blocked = Comment.objects.create(
+            **sample_comment(self.post.id, self.user.id), is_blocked=True
+        )
+        Comment.objects.filter(id=self.blocked.id).update(created_at=now - timedelta(days=8))
+
+    def get_comments(self, query=""):
+        response = self.client.get(f"/api/posts/{self.post.id}/comments/{query}")
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_archives_old_and_blocked_comments_in_batches(self):
+        self.assertEqual(archive_comments(batch_size=2), 3)
+
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(ArchivedComment.objects.count(), 3)
+        self.assertTrue(ArchivedComment.objects.get(id=self.blocked.id).is_blocked)
+        self.assertEqual(archive_comments(), 0)
+
+    def test_reads_span_hot_and_archived_comments(self):
+        before = self.get_comments()
+        archive_comments()
+
+        self.assertEqual(self.get_comments(), before)
+        self.assertEqual(len(before), 4)
+        self.assertEqual(self.get_comments(f"?before_id={before[2]['id']}"), before[:2])
+
+    def test_fully_archived_post_is_still_listed(self):
+        post = Post.objects.create(**sample_post())
+        comment = Comment.objects.create(**sample_comment(post.id, self.user.id))
+        Comment.objects.filter(id=comment.id).update(created_at=timezone.now() - timedelta(days=40))
+        archive_comments()
+
+        for query in ("", "?limit=10"):
+            response = self.client.get(f"/api/posts/{post.id}/comments/{query}")
+            self.assertEqual([row["id"] for row in json.loads(response.content)], [comment.id])
+
+    def test_archive_read_only_when_paging_past_live_comments(self):
+        archive_comments()
+
+        with self.assertNumQueries(2):
+            page = self.get_comments("?limit=2")
+        self.assertEqual([comment["comment"] for comment in page], ["Latest", "Comment"])
+
+        with self.assertNumQueries(3):
+            page = self.get_comments(f"?limit=2&before_id={page[-1]['id']}&fields=comment")
+        self.assertEqual(page, [{"comment": "Comment"}, {"comment": "Comment"}])
+
+    def test_analytics_count_archived_comments(self):
+        archive_comments()
+        admin = get_user_model().objects.create_superuser(username="admin", password="admin")
+        token = str(RefreshToken.for_user(admin).access_token)
+        date_from = (timezone.now() - timedelta(days=40)).date()
+
+        response = self.client.get(
+            f"/api/posts/comments-daily-breakdown/?date_from={date_from}",
+            HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        results = json.loads(response.content)["results"]
+        self.assertEqual(sum(result["created_count"] for result in results), 5)
+        self.assertEqual(sum(result["blocked_count"] for result in results), 1)
+
+        date_from = (timezone.now() - timedelta(days=9)).date()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/api/posts/comments-daily-breakdown/?date_from={date_from}",
+                HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+        results = json.loads(response.content)["results"]
+        self.assertEqual(sum(result["blocked_count"] for result in results), 1)
+        archive_reads = [
+            query["sql"] for query in queries if "comments_archivedcomment" in query["sql"]
+        ]
+        self.assertEqual(len(archive_reads), 1)
+        self.assertIn('"is_blocked"', archive_reads[0].split("WHERE")[1])
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.post = Post.objects.create(**sample_post())
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(self.user).access_token)}"
+        }
+
+        patcher = mock.patch("posts.tasks.send_auto_reply.apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reply(self, text, parent=None):
+        response = self.client.post(
+            f"/api/posts/{self.post.id}/comments/",
+            data=json.dumps({"comment": text, "parent": parent}),
+            content_type="application/json",
+            **self.headers
+        )
+        return response.status_code, json.loads(response.content)
+
+    def get_thread(self, query="", comment_id=None):
+        url = f"/api/posts/{self.post.id}/comments/"
+        if comment_id is not None:
+            url += f"{comment_id}/"
+        return json.loads(self.client.get(f"{url}thread/{query}").content)
+
+    def test_thread_is_nested_in_two_queries(self):
+        _, root = self.reply("Root")
+        _, child = self.reply("Child", root["id"])
+        _, grandchild = self.reply("Grandchild", child["id"])
+        self.reply("Second root")
+
+        self.assertEqual(Comment.objects.get(id=grandchild["id"]).parent_id, child["id"])
+        # Plus one to look up the post or the subtree's root.
+        with self.assertNumQueries(3):
+            thread = self.get_thread()
+
+        first = thread["replies"][0]
+        self.assertEqual([node["comment"] for node in thread["replies"]], ["Root", "Second root"])
+        self.assertEqual(first["replies"][0]["comment"], "Child")
+        self.assertEqual(first["replies"][0]["replies"][0]["comment"], "Grandchild")
+
+        thread = self.get_thread("?depth=1")
+        self.assertEqual(thread["replies"][0]["replies"], [])
+
+        with self.assertNumQueries(3):
+            subtree = self.get_thread(comment_id=child["id"])
+        self.assertEqual([node["id"] for node in subtree["replies"]], [grandchild["id"]])
+
+    def test_every_level_is_paginated(self):
+        _, root = self.reply("Root")
+        replies = [self.reply(f"Reply {i}", root["id"])[1]["id"] for i in range(3)]
+        self.reply("Second root")
+
+        thread = self.get_thread("?limit=1")
+        self.assertTrue(thread["has_more_replies"])
+        self.assertTrue(thread["replies"][0]["has_more_replies"])
+        self.assertEqual(thread["replies"][0]["replies"][0]["id"], replies[0])
+
+        page = self.get_thread(f"?limit=2&after_id={replies[0]}", comment_id=root["id"])
+        self.assertEqual([node["id"] for node in page["replies"]], replies[1:])
+        self.assertFalse(page["has_more_replies"])
+
+    def test_replies_to_hidden_comments_stay_under_a_placeholder(self):
+        _, root = self.reply("Root")
+        _, child = self.reply("Child", root["id"])
+        _, grandchild = self.reply("Grandchild", child["id"])
+        _, hidden_root = self.reply("Hidden root")
+        _, orphan = self.reply("Orphan", hidden_root["id"])
+        Comment.objects.filter(id=child["id"]).update(is_blocked=True)
+        Comment.objects.filter(id=hidden_root["id"]).delete()
+
+        thread = self.get_thread()
+        self.assertEqual([node["id"] for node in thread["replies"]], [root["id"], hidden_root["id"]])
+        placeholder = thread["replies"][0]["replies"][0]
+        self.assertEqual((placeholder["id"], placeholder["comment"]), (child["id"], None))
+        self.assertEqual(placeholder["replies"][0]["id"], grandchild["id"])
+        self.assertEqual(thread["replies"][1]["replies"][0]["id"], orphan["id"])
+
+    def test_thread_reads_only_the_page(self):
+        _, first = self.reply("First")
+        _, second = self.reply("Second")
+        self.reply("Reply", second["id"])
+
+        with CaptureQueriesContext(connection) as queries:
+            thread = self.get_thread("?limit=1")
+        self.assertEqual([node["id"] for node in thread["replies"]], [first["id"]])
+        self.assertTrue(thread["has_more_replies"])
+        # Replies are read up to the next page's first top-level comment only.
+        self.assertIn(f"< '{path_segment(first['id'] + 1)}'", queries[-1]["sql"])
+
+        page = self.get_thread(f"?limit=1&after_id={first['id']}")
+        self.assertEqual(page["replies"][0]["replies"][0]["comment"], "Reply")
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_rejects_replies_beyond_max_depth(self):
+        _, root = self.reply("Root")
+        _, child = self.reply("Child", root["id"])
+
+        status, _ = self.reply("Too deep", child["id"])
+        self.assertEqual(status, 400)
+        self.assertEqual(self.reply("Orphan", 12345)[0], 400)
+
+    @mock.patch("posts.tasks.get_llm_client")
+    def test_auto_reply_attaches_to_triggering_comment(self, get_llm_client):
+        get_llm_client().chat.completions.create().choices[0].message.content = "Thanks!"
+        _, comment = self.reply("Nice post")
+
+        send_auto_reply(self.post.id, self.user.id, "Nice post", comment["id"])
+
+        reply = Comment.objects.get(comment="Thanks!")
+        self.assertEqual(reply.parent_id, comment["id"])
+        self.assertEqual(self.get_thread()["replies"][0]["replies"][0]["comment"], "Thanks!")
+
+
+class CommentAdminModerationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        admin = get_user_model().objects.create_superuser(username="admin", password="admin")
+        self.client.force_login(admin)
+        post = Post.objects.create(**sample_post())
+        self.comments = [
+            Comment.objects.create(**sample_comment(post.id, admin.id)) for _ in range(3)
+        ]
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        with self.assertNumQueries(4):
+            self.client.get("/admin/comments/comment/")
+
+    def test_bulk_block_is_a_single_update(self):
+        ids = [str(comment.id) for comment in self.comments]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                "/admin/comments/comment/",
+                {"action": "block_selected", "_selected_action": ids}
+            )
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Comment.objects.filter(is_blocked=True).count(), 3)
+
+        self.client.post(
+            "/admin/comments/comment/",
+            {"action": "unblock_selected", "_selected_action": ids[:1]}
+        )
+        self.assertEqual(Comment.objects.filter(is_blocked=True).count(), 2)
+
+
+@override_settings(COMMENT_STREAM_BACKEND="memory", TRENDING_BACKEND="memory")
+class CommentLiveTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="user1", password="user1")
+        self.post = Post.objects.create(**sample_post())
+        self.comments = [
+            Comment.objects.create(post=self.post, user=self.user, comment=text)
+            for text in ("First", "Second", "Third")
+        ]
+
+    def get_comments(self, query):
+        response = self.client.get(f"/api/posts/{self.post.id}/comments/{query}")
+        return response.status_code, json.loads(response.content)
+
+    def test_since_id_returns_only_newer_comments(self):
+        since_id = self.comments[0].id
+
+        status, comments = self.get_comments(f"?since_id={since_id}&fields=comment")
+        self.assertEqual(comments, [{"comment": "Second"}, {"comment": "Third"}])
+        status, comments = self.get_comments(f"?since_id={since_id}&limit=1&fields=comment")
+        self.assertEqual(comments, [{"comment": "Second"}])
+        status, _ = self.get_comments(f"?since_id={since_id}&before_id={since_id}")
+        self.assertEqual(status, 400)
+
+    @override_settings(MODERATION_MODE="deferred")
+    def test_since_id_is_unsupported_with_deferred_moderation(self):
+        status, _ = self.get_comments(f"?since_id={self.comments[0].id}")
+        self.assertEqual(status, 400)
+
+    async def test_stream_pushes_comments_published_by_moderation(self):
+        await Comment.objects.acreate(
+            post=self.post, user=self.user, comment="Late", is_pending=True
+        )
+        newer = await Comment.objects.acreate(post=self.post, user=self.user, comment="Newer")
+        response = await self.async_client.get(
+            f"/api/posts/{self.post.id}/comments/stream/",
+            headers={"Last-Event-ID": str(newer.id)}
+        )
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b": connected\n\n")
+
+        await sync_to_async(moderate_pending_content)()
+        event = await anext(stream)
+        # Without an id, so Last-Event-ID stays at the newest comment.
+        self.assertTrue(event.startswith(b"event: comment"))
+        self.assertIn(b'"comment":"Late"', event)
+        await response.streaming_content.aclose()
+
+    @mock.patch("posts.tasks.get_llm_client")
+    async def test_stream_catches_up_and_pushes_auto_replies(self, get_llm_client):
+        get_llm_client().chat.completions.create().choices[0].message.content = "Thanks!"
+        response = await self.async_client.get(
+            f"/api/posts/{self.post.id}/comments/stream/",
+            headers={"Last-Event-ID": str(self.comments[1].id)}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+
+        self.assertIn(b'"comment":"Third"', await anext(stream))
+        self.assertEqual(await anext(stream), b": connected\n\n")
+
+        def reply():
+            with self.captureOnCommitCallbacks(execute=True):
+                send_auto_reply(self.post.id, self.user.id, "Third", self.comments[2].id)
+
+        await sync_to_async(reply)()
+        event = await anext(stream)
+        self.assertTrue(event.startswith(b"id: "))
+        self.assertIn(b'"comment":"Thanks!"', event)
+        await response.streaming_content.aclose()
+
+
+@override_settings(
+    COMMENT_SHARDS=["comments_shard_0", "comments_shard_1"],
+    COMMENT_STREAM_BACKEND="memory", TRENDING_BACKEND="memory"
+)
+class CommentShardingTests(TransactionTestCase):
+    """Shards are throwaway SQLite files, added once the test databases exist."""
+
+    shards = ["comments_shard_0", "comments_shard_1"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        for alias in cls.shards:
+            connections.databases[alias] = {
+                **connections.databases["default"],
+                "NAME": os.path.join(cls.directory.name, f"{alias}.sqlite3"),
+                "TEST": {},
+            }
+            call_command("migrate", database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.shards:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def tearDown(self):
+        for alias in self.shards:
+            Comment.objects.using(alias).all().delete()
+            ArchivedComment.objects.using(alias).all().delete()
+
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        }
+        self.posts = [
+            Post.objects.create(**{**sample_post(), "user_id": self.user.id}) for _ in range(6)
+        ]
+
+    def comment(self, post, text="Comment"):
+        response = self.client.post(
+            f"/api/posts/{post.id}/comments/",
+            data={"comment": text},
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.content)
+
+    def test_deleting_a_user_deletes_their_comments_on_every_shard(self):
+        other = get_user_model().objects.create_user(username="other", password="other")
+        other_post = Post.objects.create(**{**sample_post(), "user_id": other.id})
+        kept = self.comment(self.posts[0])
+        self.comment(other_post)
+        for post in self.posts:
+            Comment.objects.for_post(post.id).create(post=post, user=other, comment="Other")
+        ArchivedComment.objects.using(shard_for_post(self.posts[1].id)).create(
+            id=1, post=self.posts[1], user=other, comment="Archived", created_at=timezone.now()
+        )
+
+        other.delete()
+
+        for alias in self.shards:
+            self.assertFalse(Comment.objects.using(alias).filter(user_id=other.id).exists())
+            self.assertFalse(Comment.objects.using(alias).filter(post_id=other_post.id).exists())
+            self.assertFalse(ArchivedComment.objects.using(alias).exists())
+        self.assertEqual(
+            [comment.id for alias in self.shards for comment in Comment.objects.using(alias)],
+            [kept["id"]]
+        )
+
+    def test_jump_hash_only_moves_keys_to_new_bucket(self):
+        for key in range(1000):
+            before, after = jump_hash(key, 3), jump_hash(key, 4)
+            self.assertIn(after, (before, 3))
+
+    def test_comments_are_stored_and_read_on_their_posts_shard(self):
+        for post in self.posts:
+            comment = self.comment(post)
+            shard = shard_for_post(post.id)
+
+            self.assertTrue(Comment.objects.using(shard).filter(id=comment["id"]).exists())
+            self.assertFalse(Comment.objects.using("default").exists())
+            self.assertGreater(comment["id"], (self.shards.index(shard) + 1) * SHARD_ID_SPACING)
+
+            response = self.client.get(f"/api/posts/{post.id}/comments/")
+            self.assertEqual([row["id"] for row in json.loads(response.content)], [comment["id"]])
+        self.assertEqual({shard_for_post(post.id) for post in self.posts}, set(self.shards))
+
+    def test_analytics_gather_every_shard(self):
+        for post in self.posts:
+            self.comment(post)
+        today = timezone.now().date()
+
+        response = self.client.get(
+            f"/api/posts/comments-daily-breakdown/?date_from={today}", **self.headers
+        )
+        self.assertEqual(json.loads(response.content)["results"][0]["created_count"], 6)
+
+    @mock.patch("posts.tasks.get_llm_client")
+    def test_auto_reply_lands_on_the_posts_shard(self, get_llm_client):
+        get_llm_client().chat.completions.create().choices[0].message.content = "Thanks!"
+        post = self.posts[0]
+        comment = self.comment(post)
+
+        send_auto_reply(post.id, self.user.id, "Comment", comment["id"])
+
+        reply = Comment.objects.for_post(post.id).get(comment="Thanks!")
+        self.assertEqual(reply.parent_id, comment["id"])
+
+    def test_rebalance_moves_comments_out_of_default(self):
+        for post in self.posts:
+            Comment(**sample_comment(post.id, self.user.id)).save(using="default")
+
+        call_command("rebalance_comment_shards", "--include-default", "--dry-run")
+        self.assertEqual(Comment.objects.using("default").count(), 6)
+
+        call_command("rebalance_comment_shards", "--include-default", "--batch-size=4")
+        self.assertEqual(Comment.objects.using("default").count(), 0)
+        for post in self.posts:
+            self.assertEqual(Comment.objects.for_post(post.id).count(), 1)
+
+    def test_admin_browses_one_shard_at_a_time(self):
+        comments = {shard_for_post(post.id): self.comment(post)["id"] for post in self.posts}
+        self.client.force_login(self.user)
+
+        for shard, comment_id in comments.items():
+            response = self.client.get(f"/admin/comments/comment/?shard={shard}")
+            self.assertContains(response, f"/admin/comments/comment/{comment_id}/change/")
+            response = self.client.get(
+                f"/admin/comments/comment/{comment_id}/change/"
+                f"?_changelist_filters=shard%3D{shard}"
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_expand_user_resolves_authors_outside_the_shard(self):
+        post = self.posts[0]
+        self.comment(post)
+
+        response = self.client.get(f"/api/posts/{post.id}/comments/?expand=user&fields=user")
+        self.assertEqual(
+            json.loads(response.content), [{"user": {"id": self.user.id, "username": "admin"}}]
+        )
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import Length, RowNumber
+
+
+# Every ancestor takes a fixed-width segment of ``Comment.path``, so the path
+# of a subtree is a prefix of all its descendants' and sorts right after it.
+PATH_STEP = 12
+
+
+def path_segment(comment_id: int) -> str:
+    return f"{comment_id:0{PATH_STEP}d}"
+
+
+def reply_path(parent_id: int, parent_path: str) -> str:
+    path = parent_path + path_segment(parent_id)
+    if len(path) // PATH_STEP > settings.COMMENT_MAX_DEPTH:
+        raise ValueError("Reply is nested too deep")
+    return path
+
+
+def subtree(queryset, prefix: str, depth: int):
+    """
+    Descendants at most ``depth`` levels below the node whose children have
+    path ``prefix``, as a single range scan of the (post, path) index.
+    """
+    return queryset.annotate(path_length=Length("path")).filter(
+        path__gte=prefix,
+        path__lt=prefix + "z",
+        path_length__lte=len(prefix) + (depth - 1) * PATH_STEP,
+    )
+
+
+def ancestors(path: str, prefix: str) -> list:
+    """Ids of the ancestors in ``path`` below ``prefix``, outermost first."""
+    return [
+        int(path[index:index + PATH_STEP]) for index in range(len(prefix), len(path), PATH_STEP)
+    ]
+
+
+def build_thread(queryset, fields, parent_id, prefix: str, depth: int,
+                 limit: int, after_id: int = None) -> dict:
+    """
+    Fetch a thread in two queries and nest it. Every level is paginated:
+    each node carries at most ``limit`` replies, oldest first, and
+    ``has_more_replies`` tells the client to fetch that node's thread to see
+    the rest. ``after_id`` pages the top level.
+
+    The first query picks the page's top-level comments, the second reads
+    only their subtrees. Replies whose parent is hidden (deleted, archived,
+    blocked or pending) are kept under a placeholder node for that parent,
+    with only ``id``, ``parent`` and the replies set.
+    """
+    roots = list(
+        queryset.filter(path=prefix, id__gt=after_id or 0)
+        .order_by("id").values_list("id", flat=True)[:limit + 1]
+    )
+    has_more = len(roots) > limit
+    roots = roots[:limit]
+
+    # Subtrees of hidden top-level comments between two pages go with the later one.
+    branches = models.Q(path__gte=prefix + path_segment((after_id or 0) + 1))
+    if has_more:
+        branches &= models.Q(path__lt=prefix + path_segment(roots[-1] + 1))
+    rows = subtree(queryset, prefix, depth).filter(
+        models.Q(path=prefix, id__in=roots) | (~models.Q(path=prefix) & branches)
+    ).annotate(
+        position=Window(RowNumber(), partition_by=F("parent_id"), order_by=F("id").asc())
+    ).filter(position__lte=limit + 1).order_by("path", "id").values(
+        *dict.fromkeys(["id", "parent", "path", *fields]), "position"
+    )
+
+    root = {"replies": [], "has_more_replies": has_more}
+    nodes = {parent_id: root}
+    paged_out = set()
+    for row in rows:
+        lineage = ancestors(row["path"], prefix)
+        # Replies past a page, and their subtrees, are left for the next page.
+        if paged_out.intersection(lineage):
+            paged_out.add(row["id"])
+            continue
+
+        parent = nodes.get(row["parent"])
+        if parent is None:
+            parent = root
+            for ancestor_id in lineage:
+                if ancestor_id not in nodes:
+                    nodes[ancestor_id] = placeholder(ancestor_id, parent.get("id", parent_id))
+                    parent["replies"].append(nodes[ancestor_id])
+                parent = nodes[ancestor_id]
+
+        if row.pop("position") > limit:
+            parent["has_more_replies"] = True
+            paged_out.add(row["id"])
+            continue
+
+        node = {**row, "replies": [], "has_more_replies": False}
+        nodes[row["id"]] = node
+        parent["replies"].append(node)
+
+    for node in nodes.values():
+        # Placeholders are appended when their first reply shows up.
+        node["replies"].sort(key=lambda reply: reply["id"])
+    for node in nodes.values():
+        if "path" not in fields:
+            node.pop("path", None)
+        if "parent" not in fields:
+            node.pop("parent", None)
+        if "id" not in fields:
+            node.pop("id", None)
+    return root
+
+
+def placeholder(comment_id: int, parent_id) -> dict:
+    return {
+        "id": comment_id, "parent": parent_id, "comment": None, "user": None,
+        "created_at": None, "replies": [], "has_more_replies": False,
+    }
@@ -1,3 +1,69 @@
-from django.shortcuts import render
+import asyncio
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+
+from comments.live import get_comment_broker
+from comments.models import Comment
+from comments.schemas import CommentSchema
+from posts.models import Post
+from social_media.renderers import dumps
+
+
+def server_sent_event(event: dict, cursor: bool = True) -> bytes:
+    data = b"event: comment\ndata: %s\n\n" % dumps(event)
+    return b"id: %d\n%s" % (event["id"], data) if cursor else data
+
+
+async def comment_stream(request, post_id: int):
+    """
+    Server-sent events with the new published comments of a post. Clients
+    that reconnect send Last-Event-ID (or ``?since_id=``) and first receive
+    up to COMMENT_STREAM_CATCH_UP comments they missed. Streams are plain
+    coroutines on the ASGI event loop, so idle listeners hold no thread.
+
+    With deferred moderation a comment is published after newer ones, so it
+    is sent without an event id to keep Last-Event-ID at the newest comment.
+    Catching up cannot return such comments once the stream has moved past
+    their id: clients that were disconnected when they were published miss
+    them.
+    """
+    if not await Post.objects.filter(id=post_id).aexists():
+        raise Http404("Post not found")
+
+    since_id = request.headers.get("Last-Event-ID") or request.GET.get("since_id")
+    since_id = int(since_id) if since_id and since_id.isdigit() else None
+
+    async def events():
+        async with get_comment_broker().listen(post_id) as queue:
+            last_id = since_id or 0
+            caught_up = set()
+            # Listening starts before the catch-up query, so no comment
+            # falls between the two; duplicates are skipped by id.
+            if since_id is not None:
+                missed = Comment.objects.for_post(post_id).filter(
+                    id__gt=since_id, is_blocked=False, is_pending=False
+                ).order_by("id").values(*CommentSchema.model_fields)
+                async for event in missed[:settings.COMMENT_STREAM_CATCH_UP]:
+                    last_id = event["id"]
+                    caught_up.add(last_id)
+                    yield server_sent_event(event)
+            yield b": connected\n\n"
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), settings.COMMENT_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if event["id"] in caught_up:
+                    continue
+                yield server_sent_event(event, cursor=event["id"] > last_id)
+                last_id = max(last_id, event["id"])
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,3 +1,40 @@
+from functools import partial, wraps
+
 from django.contrib import admin
+from django.db import transaction
+
+from posts.metadata import invalidate_posts
+from posts.models import Post
+from posts.tasks import delete_posts
+from social_media.admin import ScalableModelAdmin, block_selected, unblock_selected
+
+
+def invalidating(action):
+    """Evict the cached metadata of the posts a bulk ``action`` updated."""
+    @wraps(action)
+    def wrapper(modeladmin, request, queryset):
+        post_ids = list(queryset.values_list("id", flat=True))
+        action(modeladmin, request, queryset)
+        transaction.on_commit(partial(invalidate_posts, post_ids))
+    return wrapper
+
+
+@admin.register(Post)
+class PostAdmin(ScalableModelAdmin):
+    list_display = ("id", "title", "user", "is_blocked", "is_pending", "created_at")
+    list_filter = ("is_blocked", "created_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    actions = (invalidating(block_selected), invalidating(unblock_selected))
+
+    # Deleting from the admin goes through the same tombstone and background
+    # purge as the API, instead of cascading over every comment in the request.
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set() if self.has_delete_permission(request) else {"post"}
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        delete_posts([obj.id])
 
-# Register your models here.
+    def delete_queryset(self, request, queryset):
+        delete_posts(list(queryset.values_list("id", flat=True)))
@@ -1,22 +1,43 @@
 from django.shortcuts import get_object_or_404
+from ninja import Query
 from ninja_extra import NinjaExtraAPI, api_controller, route
 from ninja_jwt.authentication import JWTAuth
-from better_profanity import profanity
+from redis.exceptions import RedisError
 
 from posts.models import Post
-from posts.schemas import PostSchema, PostCreationSchema, PostUpdateSchema
+from posts.moderation import contains_profanity, is_deferred, visible_to
+from posts.schemas import PostSchema, PostCreationSchema, PostUpdateSchema, TrendingPostSchema
+from posts.tasks import delete_posts
+from posts.trending import get_trending_ranking
+from users.auth import OptionalJWTAuth
 from users.schemas import Error
 from comments.api import CommentController
+from social_media.fieldsets import USERNAME, embed_users, parse_expand, sparse_fields
+from social_media.renderers import ORJSONRenderer, json_response, projection_response
 
 
-api = NinjaExtraAPI(urls_namespace="post-api")
+api = NinjaExtraAPI(urls_namespace="post-api", renderer=ORJSONRenderer())
 
 
 @api_controller
 class PostController:
-    @route.get("/", response=list[PostSchema])
-    def get_posts(self):
-        return Post.objects.all()
+    @route.get(
+        "/",
+        response={200: list[PostSchema], 400: Error},
+        auth=OptionalJWTAuth()
+    )
+    def get_posts(self, request, fields: str = None, expand: str = None):
+        try:
+            fields = sparse_fields(PostSchema, fields)
+            expand = parse_expand(expand)
+        except ValueError as error:
+            return 400, {"message": str(error)}
+
+        posts = Post.objects.filter(visible_to(request.user))
+        if "user" in expand and "user" in fields:
+            # The author's name comes from a join in the same query.
+            return json_response(embed_users(list(posts.values(*fields, USERNAME))))
+        return projection_response(posts, fields)
 
     @route.post(
         "/",
@@ -27,19 +48,59 @@ class PostController:
         post_data = post.model_dump()
         user_id = request.user.id
 
-        post_model = Post.objects.create(**post_data, user_id=user_id)
+        post_model = Post.objects.create(
+            **post_data, user_id=user_id, is_pending=is_deferred()
+        )
+        if post_model.is_pending:
+            return 201, post_model
 
-        if (profanity.contains_profanity(post_data["title"])
-                or profanity.contains_profanity(post_data["content"])):
+        if contains_profanity(post_data["title"], post_data["content"]):
             post_model.is_blocked = True
             post_model.save()
             return 400, {"message": "Post contains profanity"}
 
         return 201, post_model
 
-    @route.get("/{post_id}/", response=PostSchema)
-    def get_post(self, post_id: int):
-        return get_object_or_404(Post, id=post_id)
+    @route.get(
+        "/trending/",
+        response={200: list[TrendingPostSchema], 503: Error},
+        auth=OptionalJWTAuth()
+    )
+    def get_trending_posts(self, request, limit: int = Query(20, ge=1, le=100)):
+        """The ``limit`` posts with the highest time-decayed comment activity."""
+        try:
+            ranked = get_trending_ranking().top(limit)
+        except RedisError:
+            return 503, {"message": "Trending posts are unavailable"}
+
+        posts = {
+            post["id"]: post for post in Post.objects.filter(
+                visible_to(request.user), is_blocked=False,
+                id__in=[post_id for post_id, _ in ranked]
+            ).values(*PostSchema.model_fields)
+        }
+        return json_response([
+            {**posts[post_id], "score": score} for post_id, score in ranked if post_id in posts
+        ])
+
+    @route.get(
+        "/{post_id}/",
+        response={200: PostSchema, 400: Error},
+        auth=OptionalJWTAuth()
+    )
+    def get_post(self, request, post_id: int, fields: str = None, expand: str = None):
+        try:
+            columns = list(sparse_fields(PostSchema, fields))
+            expand = parse_expand(expand)
+        except ValueError as error:
+            return 400, {"message": str(error)}
+
+        if "user" in expand and "user" in columns:
+            columns.append(USERNAME)
+        post = get_object_or_404(
+            Post.objects.filter(visible_to(request.user)).values(*columns), id=post_id
+        )
+        return json_response(embed_users([post])[0] if USERNAME in columns else post)
 
     @route.patch(
         "/{post_id}/",
@@ -56,8 +117,12 @@ class PostController:
             if value:
                 setattr(post, attr, value)
 
-        if (profanity.contains_profanity(post.title)
-                or profanity.contains_profanity(post.content)):
+        if is_deferred():
+            post.is_pending = True
+            post.save()
+            return post
+
+        if contains_profanity(post.title, post.content):
             post.is_blocked = True
             post.save()
             return 400, {"message": "Post contains profanity"}
@@ -76,7 +141,7 @@ class PostController:
         if post.user.id != request.user.id and not request.user.is_staff:
             return 400, {"message": "Post can be deleted only by author or admin"}
 
-        post.delete()
+        delete_posts([post.id])
         return "Post was deleted"
 
 
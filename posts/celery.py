@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "social_media.settings")
@@ -10,3 +11,24 @@ app = Celery("social_media")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+@worker_process_init.connect
+def configure_worker_connections(**kwargs):
+    from django.conf import settings
+    from django.db import connections
+
+    for alias in connections:
+        connections.settings[alias]["CONN_MAX_AGE"] = settings.WORKER_DB_CONN_MAX_AGE
+        connections.settings[alias]["CONN_HEALTH_CHECKS"] = True
+
+
+@worker_init.connect
+@worker_process_init.connect
+def warm_up_worker(**kwargs):
+    from posts.moderation import get_profanity
+    from posts.tasks import get_llm_client
+
+    get_profanity()
+    get_llm_client()
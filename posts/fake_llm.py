@@ -0,0 +1,101 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """
+    Local OpenAI-compatible chat completions endpoint for benchmarks and
+    tests. Every request waits a latency drawn from a log-normal
+    distribution with median ``latency`` seconds and shape ``jitter``, then
+    fails with a status drawn from ``errors`` ({status: probability}) or
+    answers with a short reply.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, errors: dict = None,
+                 seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors or {}
+        self.statuses = {}
+        self.models = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def draw(self) -> tuple:
+        """The latency and status of the next request."""
+        with self._lock:
+            latency = self.latency * self._random.lognormvariate(0, self.jitter)
+            roll = self._random.random()
+        for status, probability in self.errors.items():
+            if roll < probability:
+                return latency, status
+            roll -= probability
+        return latency, 200
+
+    def record(self, status: int, model: str) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.models.add(model)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                latency, status = server.draw()
+                time.sleep(latency)
+                server.record(status, request.get("model"))
+
+                if status == 200:
+                    body = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "Thank you!"},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                    }
+                else:
+                    body = {"error": {"message": f"Fake error {status}", "type": "server_error"}}
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
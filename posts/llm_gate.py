@@ -0,0 +1,357 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+# Calls to the LLM go through a gate shared by every worker:
+#
+# - a circuit breaker opens when at least LLM_BREAKER_FAILURE_RATIO of the
+#   calls in the last LLM_BREAKER_WINDOW seconds failed or took longer than
+#   LLM_SLOW_CALL_SECONDS. After LLM_BREAKER_COOLDOWN seconds it lets a
+#   single probe through, which closes it again or keeps it open;
+# - the number of calls in flight is capped by a limit that grows by one
+#   per limit successful calls and halves on every failed or slow one
+#   (additive increase, multiplicative decrease), between
+#   LLM_CONCURRENCY_MIN and LLM_CONCURRENCY_MAX;
+# - scheduled replies are tracked until they are settled, and no more than
+#   LLM_MAX_QUEUE_DEPTH of them are queued at once.
+
+
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('zremrangebyscore', KEYS[2], '-inf', now)
+local gate = redis.call('hmget', KEYS[1], 'state', 'opened_at', 'limit', 'probe')
+local state = gate[1] or 'closed'
+if state == 'open' then
+    if now < tonumber(gate[2]) + tonumber(ARGV[4]) then
+        return 0
+    end
+    state = 'half_open'
+    redis.call('hset', KEYS[1], 'state', state)
+end
+if state == 'half_open' then
+    if gate[4] and redis.call('zscore', KEYS[2], gate[4]) then
+        return 0
+    end
+    redis.call('hset', KEYS[1], 'probe', ARGV[2])
+elseif redis.call('zcard', KEYS[2]) >= math.floor(tonumber(gate[3] or ARGV[5])) then
+    return 0
+end
+redis.call('zadd', KEYS[2], ARGV[3], ARGV[2])
+return 1
+"""
+
+RELEASE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local failed = tonumber(ARGV[3])
+redis.call('zrem', KEYS[2], ARGV[2])
+local gate = redis.call(
+    'hmget', KEYS[1], 'state', 'window_start', 'calls', 'failures', 'limit', 'probe'
+)
+local calls = tonumber(gate[3]) or 0
+local failures = tonumber(gate[4]) or 0
+if now - (tonumber(gate[2]) or 0) > tonumber(ARGV[4]) then
+    calls = 0
+    failures = 0
+    redis.call('hset', KEYS[1], 'window_start', now)
+end
+calls = calls + 1
+failures = failures + failed
+if gate[6] == ARGV[2] then
+    redis.call('hdel', KEYS[1], 'probe')
+    if failed == 1 then
+        redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now)
+    else
+        redis.call('hset', KEYS[1], 'state', 'closed', 'window_start', now)
+        calls = 0
+        failures = 0
+    end
+elseif (gate[1] or 'closed') == 'closed' and calls >= tonumber(ARGV[5])
+        and failures >= calls * tonumber(ARGV[6]) then
+    redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now)
+end
+local limit = tonumber(gate[5]) or tonumber(ARGV[8])
+if failed == 1 then
+    limit = math.max(tonumber(ARGV[7]), limit / 2)
+else
+    limit = math.min(tonumber(ARGV[8]), limit + 1 / limit)
+end
+redis.call('hset', KEYS[1], 'calls', calls, 'failures', failures, 'limit', limit)
+"""
+
+ENQUEUE_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], '-inf', '(' .. (tonumber(ARGV[1]) - tonumber(ARGV[4])))
+if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[5]) then
+    return 0
+end
+redis.call('zadd', KEYS[1], ARGV[3], ARGV[2])
+return 1
+"""
+
+
+def call_deadline(now: float) -> float:
+    # Slots of workers that died mid-call are reclaimed after this.
+    return now + settings.LLM_TIMEOUT + 5
+
+
+def is_failure(ok: bool, latency: float) -> bool:
+    return not ok or latency > settings.LLM_SLOW_CALL_SECONDS
+
+
+class RedisLLMGate:
+    """Gate state in a Redis hash and two sorted sets, changed atomically by Lua scripts."""
+
+    key = "llm:gate"
+    in_flight_key = "llm:gate:in-flight"
+    pending_key = "llm:gate:pending"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+        self._enqueue = self.client.register_script(ENQUEUE_SCRIPT)
+
+    def acquire(self, now: float = None):
+        """A token for one call, or None when the breaker or the concurrency limit refuses it."""
+        now = time.time() if now is None else now
+        token = uuid.uuid4().hex
+        allowed = self._acquire(
+            keys=[self.key, self.in_flight_key],
+            args=[now, token, call_deadline(now), settings.LLM_BREAKER_COOLDOWN,
+                  settings.LLM_CONCURRENCY_MAX]
+        )
+        return token if allowed else None
+
+    def release(self, token: str, ok: bool, latency: float, now: float = None) -> None:
+        self._release(
+            keys=[self.key, self.in_flight_key],
+            args=[
+                time.time() if now is None else now, token, int(is_failure(ok, latency)),
+                settings.LLM_BREAKER_WINDOW, settings.LLM_BREAKER_MIN_CALLS,
+                settings.LLM_BREAKER_FAILURE_RATIO, settings.LLM_CONCURRENCY_MIN,
+                settings.LLM_CONCURRENCY_MAX,
+            ]
+        )
+
+    def enqueue(self, reply_id: str, due: float, now: float = None) -> bool:
+        """Track a scheduled reply; False when LLM_MAX_QUEUE_DEPTH replies are queued already."""
+        return bool(self._enqueue(
+            keys=[self.pending_key],
+            args=[time.time() if now is None else now, reply_id, due,
+                  settings.LLM_REPLY_MAX_AGE, settings.LLM_MAX_QUEUE_DEPTH]
+        ))
+
+    def settle(self, reply_id: str) -> None:
+        self.client.zrem(self.pending_key, reply_id)
+
+    def count(self, event: str) -> None:
+        self.client.hincrby(self.key, event, 1)
+
+    def status(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hgetall(self.key)
+        pipeline.zcount(self.in_flight_key, f"({now}", "+inf")
+        pipeline.zcount(self.pending_key, now - settings.LLM_REPLY_MAX_AGE, "+inf")
+        gate, in_flight, queue_depth = pipeline.execute()
+        gate = {key.decode(): value.decode() for key, value in gate.items()}
+        return {
+            "state": gate.get("state", "closed"),
+            "concurrency_limit": float(gate.get("limit", settings.LLM_CONCURRENCY_MAX)),
+            "in_flight": in_flight,
+            "queue_depth": queue_depth,
+            "window_calls": int(gate.get("calls", 0)),
+            "window_failures": int(gate.get("failures", 0)),
+            "deferred": int(gate.get("deferred", 0)),
+            "shed": int(gate.get("shed", 0)),
+        }
+
+    def clear(self) -> None:
+        self.client.delete(self.key, self.in_flight_key, self.pending_key)
+
+
+class MemoryLLMGate:
+    """In-process stand-in for RedisLLMGate, for tests and single-process runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def acquire(self, now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            gate = self._gate
+            self._in_flight = {
+                token: deadline for token, deadline in self._in_flight.items() if deadline > now
+            }
+            if gate["state"] == "open":
+                if now < gate["opened_at"] + settings.LLM_BREAKER_COOLDOWN:
+                    return None
+                gate["state"] = "half_open"
+
+            token = uuid.uuid4().hex
+            if gate["state"] == "half_open":
+                if gate["probe"] in self._in_flight:
+                    return None
+                gate["probe"] = token
+            elif len(self._in_flight) >= int(gate["limit"]):
+                return None
+            self._in_flight[token] = call_deadline(now)
+            return token
+
+    def release(self, token: str, ok: bool, latency: float, now: float = None) -> None:
+        now = time.time() if now is None else now
+        failed = is_failure(ok, latency)
+        with self._lock:
+            gate = self._gate
+            self._in_flight.pop(token, None)
+            if now - gate["window_start"] > settings.LLM_BREAKER_WINDOW:
+                gate.update(window_start=now, calls=0, failures=0)
+            gate["calls"] += 1
+            gate["failures"] += failed
+
+            if token == gate["probe"]:
+                gate["probe"] = None
+                if failed:
+                    gate.update(state="open", opened_at=now)
+                else:
+                    gate.update(state="closed", window_start=now, calls=0, failures=0)
+            elif (gate["state"] == "closed" and gate["calls"] >= settings.LLM_BREAKER_MIN_CALLS
+                    and gate["failures"] >= gate["calls"] * settings.LLM_BREAKER_FAILURE_RATIO):
+                gate.update(state="open", opened_at=now)
+
+            if failed:
+                gate["limit"] = max(settings.LLM_CONCURRENCY_MIN, gate["limit"] / 2)
+            else:
+                gate["limit"] = min(settings.LLM_CONCURRENCY_MAX, gate["limit"] + 1 / gate["limit"])
+
+    def enqueue(self, reply_id: str, due: float, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._pending = {
+                pending_id: pending_due for pending_id, pending_due in self._pending.items()
+                if pending_due >= now - settings.LLM_REPLY_MAX_AGE
+            }
+            if len(self._pending) >= settings.LLM_MAX_QUEUE_DEPTH:
+                return False
+            self._pending[reply_id] = due
+            return True
+
+    def settle(self, reply_id: str) -> None:
+        with self._lock:
+            self._pending.pop(reply_id, None)
+
+    def count(self, event: str) -> None:
+        with self._lock:
+            self._gate[event] += 1
+
+    def status(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            gate = self._gate
+            return {
+                "state": gate["state"],
+                "concurrency_limit": float(gate["limit"]),
+                "in_flight": sum(deadline > now for deadline in self._in_flight.values()),
+                "queue_depth": sum(
+                    due >= now - settings.LLM_REPLY_MAX_AGE for due in self._pending.values()
+                ),
+                "window_calls": gate["calls"],
+                "window_failures": gate["failures"],
+                "deferred": gate["deferred"],
+                "shed": gate["shed"],
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._gate = {
+                "state": "closed", "opened_at": 0.0, "probe": None,
+                "window_start": 0.0, "calls": 0, "failures": 0,
+                "limit": float(settings.LLM_CONCURRENCY_MAX), "deferred": 0, "shed": 0,
+            }
+            self._in_flight = {}
+            self._pending = {}
+
+
+@lru_cache
+def _llm_gate(backend: str):
+    if backend == "memory":
+        return MemoryLLMGate()
+    return RedisLLMGate()
+
+
+def get_llm_gate():
+    return _llm_gate(settings.LLM_GATE_BACKEND)
+
+
+class LLMUnavailable(Exception):
+    """The breaker is open or the concurrency limit is reached; try again later."""
+
+
+@contextmanager
+def llm_call():
+    """
+    Hold a slot of the gate around one LLM call and report its outcome and
+    latency. Raises LLMUnavailable instead of calling when the gate refuses.
+    Like the other Redis features the gate fails open: without Redis, calls
+    go through unguarded.
+    """
+    gate = get_llm_gate()
+    try:
+        token = gate.acquire()
+    except RedisError:
+        logger.warning("Could not check the LLM gate", exc_info=True)
+        token = ""
+    if token is None:
+        raise LLMUnavailable
+
+    started = time.monotonic()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        if token:
+            try:
+                gate.release(token, ok, time.monotonic() - started)
+            except RedisError:
+                logger.warning("Could not report an LLM call to the gate", exc_info=True)
+
+
+def enqueue_reply(reply_id: str, due: float) -> bool:
+    """Whether a reply due at ``due`` fits in the queue; it is then tracked until settled."""
+    try:
+        if get_llm_gate().enqueue(reply_id, due):
+            return True
+    except RedisError:
+        logger.warning("Could not track a scheduled reply", exc_info=True)
+        return True
+    count_reply("shed")
+    return False
+
+
+def settle_reply(reply_id: str) -> None:
+    if reply_id is None:
+        return
+    try:
+        get_llm_gate().settle(reply_id)
+    except RedisError:
+        logger.warning("Could not settle a scheduled reply", exc_info=True)
+
+
+def count_reply(event: str) -> None:
+    """Count a ``"deferred"`` or ``"shed"`` reply."""
+    try:
+        get_llm_gate().count(event)
+    except RedisError:
+        logger.warning("Could not count a %s reply", event, exc_info=True)
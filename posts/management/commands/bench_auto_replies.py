@@ -0,0 +1,199 @@
+import resource
+import threading
+import time
+
+from celery.contrib.testing.worker import start_worker
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F
+from django.test import Client, override_settings
+from ninja_jwt.tokens import RefreshToken
+
+from comments.models import Comment
+from posts.celery import app
+from posts.fake_llm import FakeLLMServer
+from posts.llm_gate import get_llm_gate
+from posts.models import Post
+from posts.tasks import send_auto_reply
+from social_media.benchmarks import throwaway_database
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the comment -> Celery -> LLM -> reply pipeline against a fake "
+        "OpenAI-compatible server and an in-memory broker on a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=4)
+        parser.add_argument("--comments", type=int, default=25, help="Comments per client")
+        parser.add_argument("--latency-ms", type=float, default=200,
+                            help="Median latency of the fake LLM")
+        parser.add_argument("--jitter", type=float, default=0.5,
+                            help="Shape of the log-normal latency distribution")
+        parser.add_argument("--error", action="append", default=[], metavar="STATUS:PROBABILITY",
+                            help="Let the fake LLM fail with STATUS this often, e.g. 500:0.05")
+        parser.add_argument("--pool", default="solo", choices=("solo", "threads"))
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--timeout", type=float, default=300,
+                            help="Seconds to wait for the worker to finish")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--polling-interval-ms", type=float, default=10,
+                            help="How often the worker polls the in-memory broker")
+
+    def handle(self, *args, **options):
+        try:
+            errors = {
+                int(status): float(probability)
+                for status, probability in (error.split(":") for error in options["error"])
+            }
+        except ValueError:
+            raise CommandError("--error must look like STATUS:PROBABILITY")
+
+        # The worker runs in a thread of this process and gets its tasks
+        # through kombu's in-memory transport, which polls once a second by
+        # default; the settings loaded from Django keep their CELERY_ prefix.
+        app.conf.update(
+            CELERY_BROKER_URL="memory://",
+            CELERY_BROKER_TRANSPORT_OPTIONS={
+                "polling_interval": options["polling_interval_ms"] / 1000
+            },
+            CELERY_TASK_IGNORE_RESULT=True,
+        )
+        server = FakeLLMServer(
+            options["latency_ms"] / 1000, options["jitter"], errors, options["seed"]
+        )
+        with throwaway_database(), server, override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            LLM_BASE_URL=server.url,
+            LLM_MODEL="bench",
+            COMMENT_INGESTION_MODE="sync",
+            MODERATION_MODE="inline",
+            RATE_LIMIT_BACKEND="memory",
+            RATE_LIMIT_USER="",
+            RATE_LIMIT_IP="",
+            RATE_LIMIT_AUTO_REPLIES="",
+            POST_CACHE_INVALIDATION="memory",
+            TRENDING_BACKEND="memory",
+            COMMENT_STREAM_BACKEND="memory",
+            LLM_GATE_BACKEND="memory",
+        ):
+            get_llm_gate().clear()
+            owner = get_user_model().objects.create_user(username="bench_owner", password="bench")
+            post = Post.objects.create(
+                title="Bench", content="Bench", user=owner,
+                auto_reply_enabled=True, auto_reply_delay=0
+            )
+            tokens = [
+                str(RefreshToken.for_user(get_user_model().objects.create_user(
+                    username=f"bench_commenter_{index}", password="bench"
+                )).access_token)
+                for index in range(options["clients"])
+            ]
+
+            with start_worker(
+                app, pool=options["pool"], concurrency=options["concurrency"],
+                perform_ping_check=False, shutdown_timeout=60
+            ):
+                self.run(post, owner, tokens, server, options)
+
+    def run(self, post, owner, tokens: list, server: FakeLLMServer, options: dict):
+        failed = []
+        published, waits = {}, []
+        lock = threading.Lock()
+
+        def count(sender=None, state=None, **kwargs):
+            if sender.name == send_auto_reply.name and state == "FAILURE":
+                with lock:
+                    failed.append(state)
+
+        # Time from publishing a reply task to a worker starting it, without
+        # the deferred ones, which wait for their ETA on purpose.
+        def sent(sender=None, headers=None, **kwargs):
+            if sender == send_auto_reply.name and headers.get("eta") is None:
+                with lock:
+                    published[headers["id"]] = time.perf_counter()
+
+        def started(task_id=None, **kwargs):
+            with lock:
+                if task_id in published:
+                    waits.append(time.perf_counter() - published.pop(task_id))
+
+        task_postrun.connect(count, weak=False)
+        before_task_publish.connect(sent, weak=False)
+        task_prerun.connect(started, weak=False)
+        memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scheduled = []
+
+        def send(token: str):
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+            for i in range(options["comments"]):
+                response = client.post(
+                    f"/api/posts/{post.id}/comments/",
+                    data={"comment": f"Comment {i}"},
+                    content_type="application/json",
+                )
+                if response.status_code == 201:
+                    with lock:
+                        scheduled.append(response)
+            connections.close_all()
+
+        try:
+            threads = [threading.Thread(target=send, args=(token,)) for token in tokens]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            # Replies leave the gate's queue once posted, shed or failed.
+            deadline = time.monotonic() + options["timeout"]
+            while get_llm_gate().status()["queue_depth"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - start
+        finally:
+            task_postrun.disconnect(count)
+            before_task_publish.disconnect(sent)
+            task_prerun.disconnect(started)
+        memory_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        gate = get_llm_gate().status()
+
+        lags = sorted(
+            (created_at - parent_created_at).total_seconds()
+            for created_at, parent_created_at in Comment.objects.filter(
+                post=post, user=owner, parent__isnull=False
+            ).values_list("created_at", F("parent__created_at"))
+        )
+        self.stdout.write(
+            f"{len(scheduled)} comments, {len(lags)} replies in {elapsed:.2f}s "
+            f"({len(lags) / elapsed:.1f} replies/s), "
+            f"{gate['queue_depth']} unfinished, {len(failed)} failed, "
+            f"{gate['deferred']} deferred, {gate['shed']} shed"
+        )
+        if lags:
+            self.stdout.write(
+                f"end-to-end lag p50 {percentile(lags, 0.5) * 1000:.0f} ms, "
+                f"p95 {percentile(lags, 0.95) * 1000:.0f} ms, "
+                f"p99 {percentile(lags, 0.99) * 1000:.0f} ms, max {lags[-1] * 1000:.0f} ms"
+            )
+        if waits:
+            waits.sort()
+            # Includes the wait for a free worker once tasks queue up.
+            self.stdout.write(
+                f"broker overhead (publish to task start, polling every "
+                f"{options['polling_interval_ms']:g} ms) "
+                f"p50 {percentile(waits, 0.5) * 1000:.0f} ms, "
+                f"p95 {percentile(waits, 0.95) * 1000:.0f} ms, max {waits[-1] * 1000:.0f} ms"
+            )
+        self.stdout.write(
+            f"LLM responses {dict(sorted(server.statuses.items()))}, breaker {gate['state']}, "
+            f"concurrency limit {gate['concurrency_limit']:.1f}, "
+            f"peak RSS of web and worker {memory_after / 1024:.0f} MB "
+            f"(+{(memory_after - memory_before) / 1024:.0f} MB during the run)"
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute trending post scores from recent comments, e.g. after Redis lost them"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Ranked {rebuild()} posts")
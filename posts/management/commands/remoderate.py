@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import RemoderationJob
+from posts.remoderation import TARGETS, run_job, start_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-check existing posts and comments against the current profanity "
+        "list, in the foreground with a process pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=[*TARGETS, "all"], default="all")
+        parser.add_argument("--unblock", action="store_true", help="Also unblock clean content")
+        parser.add_argument("--resume", type=int, metavar="JOB_ID")
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            jobs = list(RemoderationJob.objects.filter(id=options["resume"]).exclude(status="done"))
+            if not jobs:
+                raise CommandError(f"No unfinished re-moderation job {options['resume']}")
+            RemoderationJob.objects.filter(id=options["resume"]).update(status="running")
+            jobs[0].status = "running"
+        else:
+            targets = list(TARGETS) if options["target"] == "all" else [options["target"]]
+            jobs = [
+                job for target in targets for job in start_jobs(target, options["unblock"])
+            ]
+
+        for job in jobs:
+            self.stdout.write(
+                f"Job {job.id}: {job.target} on {job.database} up to id {job.max_id}"
+            )
+            run_job(job, workers=options["workers"], on_batch=self.report)
+            self.report(job)
+
+    def report(self, job):
+        self.stdout.write(
+            f"  {job.status} {job.progress:6.1%}  scanned {job.scanned}  "
+            f"blocked {job.blocked}  unblocked {job.unblocked}  {job.throughput:,.0f} rows/s"
+        )
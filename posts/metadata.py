@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from posts.models import Post
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+class PostMetadata(NamedTuple):
+    """What the comment write path needs to know about a post."""
+    id: int
+    user_id: int
+    auto_reply_enabled: bool
+    auto_reply_delay: float
+    is_blocked: bool
+    is_pending: bool
+    is_deleted: bool
+
+    def visible_to(self, user) -> bool:
+        """Same rule as posts.moderation.visible_to, for a single post."""
+        if self.is_deleted:
+            return False
+        return not self.is_pending or (
+            user is not None and user.is_authenticated and user.id == self.user_id
+        )
+
+
+class PostMetadataCache:
+    """
+    LRU of PostMetadata kept for ``ttl`` seconds in this process. Writers
+    call invalidate_posts(), which evicts the posts here and in every other
+    process, so the TTL only bounds staleness when a message is lost.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, post_id: int):
+        with self._lock:
+            entry = self._entries.get(post_id)
+            if entry is None:
+                return None
+            metadata, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[post_id]
+                return None
+            self._entries.move_to_end(post_id)
+            return metadata
+
+    def set(self, metadata: PostMetadata) -> None:
+        with self._lock:
+            self._entries[metadata.id] = (metadata, time.monotonic() + self.ttl)
+            self._entries.move_to_end(metadata.id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def evict(self, post_ids) -> None:
+        with self._lock:
+            for post_id in post_ids:
+                self._entries.pop(post_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+post_metadata = PostMetadataCache(settings.POST_CACHE_SIZE, settings.POST_CACHE_TTL)
+
+
+class RedisInvalidation:
+    """
+    Broadcasts evicted post ids on a Redis channel. Each process listens in a
+    daemon thread, started on its first cache lookup, and clears its cache
+    whenever it (re)subscribes, since messages sent meanwhile are lost.
+    """
+
+    channel = "posts:metadata:invalidate"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, post_ids: list) -> None:
+        self.client.publish(self.channel, ",".join(str(post_id) for post_id in post_ids))
+
+    def start(self, cache: PostMetadataCache) -> None:
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, args=(cache,), name="post-metadata-invalidation",
+                    daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self, cache: PostMetadataCache) -> None:
+        failures = 0
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                cache.clear()
+                failures = 0
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        cache.evict(int(post_id) for post_id in message["data"].split(b","))
+            except RedisError:
+                failures += 1
+                if failures == 1:
+                    logger.warning("Post metadata invalidation lost its subscription", exc_info=True)
+                time.sleep(min(2 ** failures, 30))
+
+
+class MemoryInvalidation:
+    """Stand-in for RedisInvalidation in single-process runs: nothing to broadcast."""
+
+    def publish(self, post_ids: list) -> None:
+        pass
+
+    def start(self, cache: PostMetadataCache) -> None:
+        pass
+
+
+@lru_cache
+def _invalidation(backend: str):
+    if backend == "memory":
+        return MemoryInvalidation()
+    return RedisInvalidation()
+
+
+def get_invalidation():
+    return _invalidation(settings.POST_CACHE_INVALIDATION)
+
+
+def get_post_metadata(post_id: int):
+    """The post's metadata, read from the database only on a cache miss."""
+    get_invalidation().start(post_metadata)
+
+    metadata = post_metadata.get(post_id)
+    if metadata is None:
+        row = Post.all_objects.filter(id=post_id).values_list(*PostMetadata._fields).first()
+        if row is None:
+            return None
+        metadata = PostMetadata(*row)
+        post_metadata.set(metadata)
+    return metadata
+
+
+def invalidate_posts(post_ids: list) -> None:
+    post_metadata.evict(post_ids)
+    try:
+        get_invalidation().publish(post_ids)
+    except RedisError:
+        logger.warning("Could not broadcast post metadata invalidation", exc_info=True)
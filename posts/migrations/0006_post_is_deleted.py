@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0005_pending_moderation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="is_deleted",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_deleted", True)),
+                fields=["id"],
+                name="post_deleted_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0008_remoderationjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="remoderationjob",
+            name="database",
+            field=models.CharField(default="default", max_length=64),
+        ),
+    ]
@@ -2,6 +2,11 @@ from django.db import models
 from django.contrib.auth import get_user_model
 
 
+class PostManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Post(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
@@ -14,6 +19,79 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     auto_reply_enabled = models.BooleanField(default=False)
     auto_reply_delay = models.FloatField(default=0)
+    is_pending = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+
+    # Deleted posts stay in the table as tombstones until
+    # posts.tasks.purge_deleted_post has removed their comments.
+    objects = PostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_pending=True),
+                name="post_pending_idx"
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_deleted=True),
+                name="post_deleted_idx"
+            ),
+            models.Index(fields=["is_blocked", "id"], name="post_blocked_idx"),
+            models.Index(fields=["created_at"], name="post_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Post by {self.user.username}"
+
+
+class RemoderationJob(models.Model):
+    """
+    Re-check of existing posts or comments against the current profanity
+    list, run by posts.remoderation. ``last_id`` is the checkpoint a job
+    resumes from.
+    """
+    TARGET_CHOICES = [("posts", "Posts"), ("comments", "Comments")]
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("paused", "Paused"),
+        ("done", "Done"),
+    ]
+
+    target = models.CharField(max_length=16, choices=TARGET_CHOICES)
+    # Comment shard the job scans, see comments.sharding.
+    database = models.CharField(max_length=64, default="default")
+    unblock = models.BooleanField(default=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="running")
+    min_id = models.BigIntegerField(default=0)
+    max_id = models.BigIntegerField(default=0)
+    last_id = models.BigIntegerField(default=0)
+    scanned = models.BigIntegerField(default=0)
+    blocked = models.BigIntegerField(default=0)
+    unblocked = models.BigIntegerField(default=0)
+    active_seconds = models.FloatField(default=0)
+    started_by = models.ForeignKey(
+        get_user_model(),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="remoderation_jobs"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done" or self.max_id <= self.min_id:
+            return 1.0
+        return max(0.0, (self.last_id - self.min_id) / (self.max_id - self.min_id))
+
+    @property
+    def throughput(self) -> float:
+        return self.scanned / self.active_seconds if self.active_seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"Re-moderation of {self.target} on {self.database} ({self.status})"
@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+
+def is_deferred() -> bool:
+    return settings.MODERATION_MODE == "deferred"
+
+
+@lru_cache(maxsize=None)
+def get_profanity():
+    # better_profanity builds its word set when imported, so the import is
+    # deferred to the first check or to warm_up() at worker boot.
+    from better_profanity import profanity
+    if settings.PROFANITY_WORDLIST:
+        profanity.load_censor_words_from_file(settings.PROFANITY_WORDLIST)
+    return profanity
+
+
+def contains_profanity(*texts: str) -> bool:
+    profanity = get_profanity()
+    return any(profanity.contains_profanity(text) for text in texts)
+
+
+def visible_to(user) -> Q:
+    """Pending content is only shown to its author until it is moderated."""
+    if user is not None and user.is_authenticated:
+        return Q(is_pending=False) | Q(user_id=user.id)
+    return Q(is_pending=False)
+
+
+def moderate_pending(model, fields: tuple, batch_size: int,
+                     using: str = "default") -> tuple[list, list]:
+    """
+    Moderate the oldest ``batch_size`` pending rows of ``model`` in the
+    ``using`` database and publish or block them with one UPDATE each.
+    Returns the published and blocked ids.
+
+    The rows stay locked from the read to the UPDATEs, so an edit cannot
+    land in between and be published on the verdict for the old text.
+    """
+    with transaction.atomic(using=using):
+        rows = list(
+            model.objects.using(using).select_for_update().filter(is_pending=True)
+            .order_by("id")
+            .values("id", *fields)[:batch_size]
+        )
+
+        published, blocked = [], []
+        for row in rows:
+            if contains_profanity(*(row[field] for field in fields)):
+                blocked.append(row["id"])
+            else:
+                published.append(row["id"])
+
+        model.objects.using(using).filter(id__in=blocked).update(
+            is_pending=False, is_blocked=True
+        )
+        model.objects.using(using).filter(id__in=published).update(
+            is_pending=False, is_blocked=False
+        )
+
+    return published, blocked
@@ -0,0 +1,139 @@
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from comments.models import Comment
+from comments.sharding import comment_shards
+from posts.metadata import invalidate_posts
+from posts.models import Post, RemoderationJob
+from posts.moderation import contains_profanity
+from posts.trending import record_comments
+
+
+TARGETS = {
+    "posts": (Post, ("title", "content")),
+    "comments": (Comment, ("comment",)),
+}
+
+
+def find_profane(rows: list) -> list:
+    """Ids of the ``(id, *texts)`` rows that contain profanity."""
+    return [row[0] for row in rows if contains_profanity(*row[1:])]
+
+
+def start_job(target: str, unblock: bool = False, user=None,
+              database: str = "default") -> RemoderationJob:
+    """Create a job over the id range ``target`` has now; later rows are moderated on write."""
+    model, _ = TARGETS[target]
+    bounds = model.objects.using(database).aggregate(min_id=Min("id"), max_id=Max("id"))
+    start = (bounds["min_id"] or 1) - 1
+    return RemoderationJob.objects.create(
+        target=target,
+        database=database,
+        unblock=unblock,
+        started_by=user,
+        min_id=start,
+        last_id=start,
+        max_id=bounds["max_id"] or 0,
+    )
+
+
+def start_jobs(target: str, unblock: bool = False, user=None) -> list[RemoderationJob]:
+    """One job per database holding ``target``: comments get a job per shard."""
+    databases = comment_shards() if target == "comments" else ["default"]
+    return [start_job(target, unblock, user, database) for database in databases]
+
+
+def pool_size() -> int:
+    # Celery's prefork children are daemonic and may not start processes, so
+    # jobs run by such workers check rows in the worker process itself.
+    if multiprocessing.current_process().daemon:
+        return 0
+    return settings.REMODERATION_WORKERS
+
+
+def classify(rows: list, executor, workers: int):
+    if executor is None:
+        return find_profane(rows)
+    size = -(-len(rows) // workers)
+    chunks = [rows[start:start + size] for start in range(0, len(rows), size)]
+    return itertools.chain.from_iterable(executor.map(find_profane, chunks))
+
+
+def run_job(job: RemoderationJob, time_budget: float = None, workers: int = None,
+            on_batch=None) -> bool:
+    """
+    Re-check the job's rows from its checkpoint in batches of
+    REMODERATION_BATCH_SIZE, spread over a process pool, until the range is
+    done, the job is paused or ``time_budget`` seconds have passed. Each
+    batch is applied with bulk UPDATEs and checkpointed in one transaction,
+    and the scan is throttled to REMODERATION_MAX_ROWS_PER_SECOND.
+    Returns whether the job is done.
+    """
+    model, fields = TARGETS[job.target]
+    workers = pool_size() if workers is None else workers
+    deadline = time.monotonic() + time_budget if time_budget else None
+    executor = (
+        ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+        if workers > 1 else None
+    )
+
+    with executor or nullcontext():
+        while job.status == "running":
+            started = time.monotonic()
+            rows = list(
+                model.objects.using(job.database).filter(id__gt=job.last_id, id__lte=job.max_id, is_pending=False)
+                .order_by("id")
+                .values_list("id", *fields)[:settings.REMODERATION_BATCH_SIZE]
+            )
+            if not rows:
+                RemoderationJob.objects.filter(id=job.id).update(
+                    status="done", finished_at=timezone.now()
+                )
+                job.refresh_from_db()
+                return True
+
+            profane = set(classify(rows, executor, workers))
+            clean = {row[0] for row in rows} - profane
+            rows_of_job = model.objects.using(job.database)
+            to_block = rows_of_job.filter(id__in=profane, is_blocked=False)
+            to_unblock = rows_of_job.filter(id__in=clean, is_blocked=True) if job.unblock else None
+            hidden, shown = [], []
+            with transaction.atomic(), transaction.atomic(using=job.database):
+                if model is Comment:
+                    # Comments that change visibility move their post's trending score.
+                    hidden = list(to_block.select_for_update().only("post_id", "created_at"))
+                    if to_unblock is not None:
+                        shown = list(to_unblock.select_for_update().only("post_id", "created_at"))
+                blocked = to_block.update(is_blocked=True)
+                unblocked = to_unblock.update(is_blocked=False) if to_unblock is not None else 0
+                RemoderationJob.objects.filter(id=job.id).update(
+                    last_id=rows[-1][0],
+                    scanned=F("scanned") + len(rows),
+                    blocked=F("blocked") + blocked,
+                    unblocked=F("unblocked") + unblocked,
+                    active_seconds=F("active_seconds") + (time.monotonic() - started),
+                    updated_at=timezone.now(),
+                )
+            if model is Post and (blocked or unblocked):
+                invalidate_posts([row[0] for row in rows])
+            record_comments(hidden, -1)
+            record_comments(shown)
+            job.refresh_from_db()
+            if on_batch is not None:
+                on_batch(job)
+
+            if settings.REMODERATION_MAX_ROWS_PER_SECOND:
+                budget = len(rows) / settings.REMODERATION_MAX_ROWS_PER_SECOND
+                time.sleep(max(0.0, budget - (time.monotonic() - started)))
+            if deadline is not None and time.monotonic() > deadline:
+                break
+
+    return False
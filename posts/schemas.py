@@ -1,7 +1,7 @@
-from typing import Optional
+from typing import Literal, Optional
 from ninja import Schema, ModelSchema
 
-from posts.models import Post
+from posts.models import Post, RemoderationJob
 
 
 class PostSchema(ModelSchema):
@@ -10,6 +10,14 @@ class PostSchema(ModelSchema):
         fields = ("id", "title", "content", "user", "created_at",)
 
 
+class TrendingPostSchema(ModelSchema):
+    score: float
+
+    class Meta:
+        model = Post
+        fields = PostSchema.Meta.fields
+
+
 class PostCreationSchema(ModelSchema):
     class Meta:
         model = Post
@@ -19,3 +27,31 @@ class PostCreationSchema(ModelSchema):
 class PostUpdateSchema(Schema):
     title: Optional[str] = None
     content: Optional[str] = None
+
+
+class RemoderationJobSchema(ModelSchema):
+    progress: float
+    throughput: float
+
+    class Meta:
+        model = RemoderationJob
+        fields = (
+            "id", "target", "database", "unblock", "status", "last_id", "max_id", "scanned",
+            "blocked", "unblocked", "created_at", "updated_at", "finished_at",
+        )
+
+
+class LLMGateSchema(Schema):
+    state: Literal["closed", "open", "half_open"]
+    concurrency_limit: float
+    in_flight: int
+    queue_depth: int
+    window_calls: int
+    window_failures: int
+    deferred: int
+    shed: int
+
+
+class RemoderationRequestSchema(Schema):
+    target: Literal["posts", "comments", "all"] = "all"
+    unblock: bool = False
@@ -0,0 +1,19 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from posts.metadata import invalidate_posts, post_metadata
+from posts.models import Post
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_metadata(sender, instance, created, **kwargs):
+    if created:
+        # Ids of rolled back posts are handed out again, so the cache may
+        # hold one that never committed.
+        post_metadata.evict([instance.id])
+    else:
+        # Updates through the API or the admin; bulk updates call invalidate_posts themselves.
+        transaction.on_commit(partial(invalidate_posts, [instance.id]), using=instance._state.db)
@@ -1,30 +1,221 @@
-import os
+import random
+import time
+import uuid
+from functools import lru_cache, partial
 
 from celery import shared_task
-from dotenv import load_dotenv
-from openai import OpenAI
+from django.conf import settings
+from django.db import transaction
 
-from comments.models import Comment
+from comments.live import publish_comments
+from comments.models import ArchivedComment, Comment
+from comments.sharding import comment_shards
+from comments.threads import reply_path
+from posts.llm_gate import LLMUnavailable, count_reply, enqueue_reply, llm_call, settle_reply
+from posts.metadata import invalidate_posts
+from posts.models import Post, RemoderationJob
+from posts.moderation import moderate_pending
+from posts.remoderation import run_job
+from posts.trending import forget_posts, get_trending_ranking, record_comments
+from social_media.ratelimit import auto_reply_allowed
 
 
-load_dotenv()
+@lru_cache(maxsize=None)
+def _llm_client(base_url: str):
+    # Importing openai costs more than the rest of the URL conf together, so
+    # web processes that only schedule replies never pay for it.
+    from openai import OpenAI
 
-client = OpenAI(
-    api_key=f"{os.getenv('AI_API_KEY')}",
-    base_url="https://api.aimlapi.com",
-)
+    # The gate defers failed calls instead of retrying them in the worker.
+    return OpenAI(
+        api_key=f"{settings.AI_API_KEY}",
+        base_url=base_url,
+        timeout=settings.LLM_TIMEOUT,
+        max_retries=0,
+    )
 
 
-@shared_task
-def send_auto_reply(post_id: int, user_id: int, comment: str):
-    response = client.chat.completions.create(
-        model="mistralai/Mistral-7B-Instruct-v0.2",
-        messages=[
-            {
-                "role": "user",
-                "content": f"Answer to this comment '{comment}' as it was me, in a positive way"
-            },
-        ],
+def get_llm_client():
+    return _llm_client(settings.LLM_BASE_URL)
+
+
+def defer_auto_reply(post_id: int, user_id: int, comment: str, comment_id: int,
+                     reply_id: str, due: float) -> None:
+    # Jittered, so deferred replies do not all come back together.
+    send_auto_reply.apply_async(
+        args=[post_id, user_id, comment, comment_id],
+        kwargs={"reply_id": reply_id, "due": due},
+        countdown=settings.LLM_DEFER_SECONDS * random.uniform(0.5, 1.5)
     )
+
+
+@shared_task
+def send_auto_reply(post_id: int, user_id: int, comment: str, comment_id: int = None,
+                    reply_id: str = None, due: float = None):
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    thread = {}
+    pending = False
+    if comment_id is not None:
+        state = Comment.objects.for_post(post_id).filter(id=comment_id).values(
+            "is_blocked", "is_pending", "parent_id", "path"
+        ).first()
+        if state is None or state["is_blocked"]:
+            settle_reply(reply_id)
+            return
+        pending = state["is_pending"]
+
+        # Replies to the deepest comments become their siblings instead.
+        try:
+            thread = {"parent_id": comment_id, "path": reply_path(comment_id, state["path"])}
+        except ValueError:
+            thread = {"parent_id": state["parent_id"], "path": state["path"]}
+
+    # Replies scheduled before the post was deleted are dropped here.
+    if not Post.objects.filter(id=post_id).exists():
+        settle_reply(reply_id)
+        return
+
+    # Replies held back for too long are dropped rather than all posted at
+    # once when the LLM recovers.
+    due = time.time() if due is None else due
+    if time.time() - due > settings.LLM_REPLY_MAX_AGE:
+        count_reply("shed")
+        settle_reply(reply_id)
+        return
+
+    # Waiting for moderation counts towards the same age, so replies to
+    # comments that stay pending are shed like any other.
+    if pending:
+        defer_auto_reply(post_id, user_id, comment, comment_id, reply_id, due)
+        return
+
+    try:
+        with llm_call():
+            response = get_llm_client().chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Answer to this comment '{comment}' as it was me, in a positive way"
+                        )
+                    },
+                ],
+            )
+    except (LLMUnavailable, APIConnectionError, InternalServerError, RateLimitError):
+        count_reply("deferred")
+        defer_auto_reply(post_id, user_id, comment, comment_id, reply_id, due)
+        return
+    except Exception:
+        settle_reply(reply_id)
+        raise
+
     message = response.choices[0].message.content
-    Comment.objects.create(post_id=post_id, comment=message, user_id=user_id)
+    Comment.objects.for_post(post_id).create(post_id=post_id, comment=message, user_id=user_id, **thread)
+    settle_reply(reply_id)
+
+
+def schedule_auto_reply(user_id: int, post, comment: str, comment_id: int = None):
+    if post.user_id == user_id or not post.auto_reply_enabled:
+        return
+    # Every reply is an LLM call, so each post owner gets a budget of them.
+    if not auto_reply_allowed(post.user_id):
+        return
+
+    reply_id = uuid.uuid4().hex
+    due = time.time() + post.auto_reply_delay * 60
+    if not enqueue_reply(reply_id, due):
+        return
+    send_auto_reply.apply_async(
+        args=[post.id, post.user_id, comment, comment_id],
+        kwargs={"reply_id": reply_id, "due": due},
+        countdown=post.auto_reply_delay * 60
+    )
+
+
+def moderate_pending_comments(alias: str) -> tuple[list, list]:
+    """
+    Moderate a batch of pending comments on ``alias``, then count the
+    published ones in trending and push them to live listeners.
+    """
+    published, blocked = moderate_pending(
+        Comment, ("comment",), settings.MODERATION_BATCH_SIZE, using=alias
+    )
+    if published:
+        comments = list(Comment.objects.using(alias).filter(id__in=published))
+        record_comments(comments)
+        publish_comments(comments)
+    return published, blocked
+
+
+@shared_task
+def moderate_pending_content() -> int:
+    moderated = 0
+    while True:
+        posts = moderate_pending(Post, ("title", "content"), settings.MODERATION_BATCH_SIZE)
+        if any(posts):
+            invalidate_posts([*posts[0], *posts[1]])
+
+        batch = sum(
+            len(published) + len(blocked)
+            for published, blocked in (
+                posts,
+                *(moderate_pending_comments(alias) for alias in comment_shards()),
+            )
+        )
+        if not batch:
+            return moderated
+        moderated += batch
+
+
+def delete_posts(post_ids: list) -> None:
+    """Hide posts at once and purge their comments in the background."""
+    Post.objects.filter(id__in=post_ids).update(is_deleted=True)
+    transaction.on_commit(partial(invalidate_posts, post_ids))
+    transaction.on_commit(partial(forget_posts, post_ids))
+    for post_id in post_ids:
+        transaction.on_commit(partial(purge_deleted_post.delay, post_id))
+
+
+@shared_task
+def purge_deleted_post(post_id: int) -> int:
+    purged = 0
+    for _ in range(settings.PURGE_BATCHES_PER_RUN):
+        for model in (Comment, ArchivedComment):
+            comment_ids = list(
+                model.objects.for_post(post_id)
+                .values_list("id", flat=True)[:settings.PURGE_BATCH_SIZE]
+            )
+            if comment_ids:
+                break
+        else:
+            Post.all_objects.filter(id=post_id, is_deleted=True).delete()
+            return purged
+
+        purged += model.objects.for_post(post_id).filter(id__in=comment_ids).delete()[0]
+        time.sleep(settings.PURGE_BATCH_PAUSE)
+
+    purge_deleted_post.apply_async(args=[post_id], countdown=settings.PURGE_BATCH_PAUSE)
+    return purged
+
+
+@shared_task
+def purge_deleted_posts():
+    for post_id in Post.all_objects.filter(is_deleted=True).values_list("id", flat=True):
+        purge_deleted_post.delay(post_id)
+
+
+@shared_task
+def remoderate(job_id: int) -> None:
+    job = RemoderationJob.objects.filter(id=job_id, status="running").first()
+    if job is None:
+        return
+
+    if not run_job(job, time_budget=settings.REMODERATION_TIME_BUDGET) and job.status == "running":
+        remoderate.apply_async(args=[job_id])
+
+
+@shared_task
+def compact_trending() -> int:
+    return get_trending_ranking().compact()
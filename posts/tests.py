@@ -1,10 +1,29 @@
 import json
+import time
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.contrib import admin
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from ninja_jwt.tokens import RefreshToken
 
-from posts.models import Post
+from comments.admin import CommentAdmin
+from posts.admin import PostAdmin
+from posts.fake_llm import FakeLLMServer
+from posts.llm_gate import MemoryLLMGate, get_llm_gate
+from posts.metadata import PostMetadata, PostMetadataCache, post_metadata
+from posts.models import Post, RemoderationJob
+from posts.remoderation import run_job, start_job
+from posts.schemas import PostSchema
+from comments.models import Comment
+from posts.tasks import (
+    delete_posts, moderate_pending_content, purge_deleted_post, schedule_auto_reply,
+    send_auto_reply
+)
+from posts.trending import MemoryTrendingRanking, get_trending_ranking, rebuild
+from social_media.fieldsets import sparse_fields
 
 
 def sample_post():
@@ -40,6 +59,59 @@ class PostUnauthorizedTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response_data), 1)
 
+    def test_list_projection_matches_single_post(self):
+        list_data = json.loads(self.client.get("/api/posts/").content)
+        single_data = json.loads(self.client.get("/api/posts/1/").content)
+
+        self.assertEqual(list_data[0], single_data)
+
+    def test_get_posts_with_sparse_fields(self):
+        response = self.client.get("/api/posts/?fields=title,id")
+        response_data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_data, [{"id": 1, "title": "Test"}])
+
+    def test_get_single_post_with_sparse_fields(self):
+        response = self.client.get("/api/posts/1/?fields=content")
+        response_data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_data, {"content": "Test"})
+
+    def test_get_posts_with_unknown_field(self):
+        response = self.client.get("/api/posts/?fields=id,password")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_expand_user_joins_author_in_one_query(self):
+        Post.objects.create(**sample_post())
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/posts/?expand=user&fields=id,user")
+        self.assertEqual(
+            json.loads(response.content),
+            [{"id": 1, "user": {"id": 1, "username": "admin"}},
+             {"id": 2, "user": {"id": 1, "username": "admin"}}]
+        )
+        response = self.client.get("/api/posts/1/?expand=user")
+        self.assertEqual(json.loads(response.content)["user"], {"id": 1, "username": "admin"})
+
+    def test_expand_unknown_relation(self):
+        response = self.client.get("/api/posts/?expand=comments")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields_follow_the_schema_order(self):
+        self.assertEqual(sparse_fields(PostSchema, "title, id"), ("id", "title"))
+        self.assertEqual(sparse_fields(PostSchema, None), tuple(PostSchema.model_fields))
+
+    def test_empty_fields_return_the_full_schema(self):
+        Post.objects.create(**sample_post())
+        for query in ("?fields=,", "?fields=%20"):
+            posts = json.loads(self.client.get(f"/api/posts/{query}").content)
+            self.assertEqual(list(posts[0]), list(PostSchema.model_fields))
+
     def test_get_single_post(self):
         response = self.client.get("/api/posts/1/")
         response_data = json.loads(response.content)
@@ -123,3 +195,508 @@ class PostAuthorizedTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MODERATION_MODE="deferred")
+class PostDeferredModerationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(user).access_token)}"
+        }
+
+    def create_post(self, title):
+        return self.client.post(
+            "/api/posts/",
+            data=json.dumps({"title": title, "content": "Test"}),
+            content_type="application/json",
+            **self.headers
+        )
+
+    def test_pending_post_visible_only_to_author(self):
+        response = self.create_post("damn")
+        post_id = json.loads(response.content)["id"]
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(json.loads(self.client.get("/api/posts/").content)), 0)
+        self.assertEqual(self.client.get(f"/api/posts/{post_id}/").status_code, 404)
+
+        response = self.client.get("/api/posts/", **self.headers)
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    def test_moderation_publishes_and_blocks_in_batch(self):
+        self.create_post("Clean")
+        self.create_post("damn")
+
+        self.assertEqual(moderate_pending_content(), 2)
+
+        clean = Post.objects.get(title="Clean")
+        profane = Post.objects.get(title="damn")
+        self.assertFalse(clean.is_pending)
+        self.assertFalse(clean.is_blocked)
+        self.assertFalse(profane.is_pending)
+        self.assertTrue(profane.is_blocked)
+        self.assertEqual(len(json.loads(self.client.get("/api/posts/").content)), 2)
+
+
+@override_settings(PURGE_BATCH_SIZE=2, PURGE_BATCH_PAUSE=0, PURGE_BATCHES_PER_RUN=2)
+class PostDeletionTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(user).access_token)}"
+        }
+        self.post = Post.objects.create(title="Test", content="Test", user=user)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, user=user, comment=f"Comment {i}")
+            for i in range(5)
+        )
+
+    def test_delete_hides_post_and_comments(self):
+        with mock.patch("posts.tasks.purge_deleted_post.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f"/api/posts/{self.post.id}/", **self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once_with(self.post.id)
+        self.assertTrue(Post.all_objects.get(id=self.post.id).is_deleted)
+        self.assertEqual(self.client.get(f"/api/posts/{self.post.id}/").status_code, 404)
+        response = self.client.get(f"/api/posts/{self.post.id}/comments/")
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_purge_deletes_in_batches_and_requeues(self):
+        Post.objects.filter(id=self.post.id).update(is_deleted=True)
+
+        with mock.patch("posts.tasks.purge_deleted_post.apply_async") as apply_async:
+            self.assertEqual(purge_deleted_post(self.post.id), 4)
+        apply_async.assert_called_once()
+        self.assertEqual(Comment.objects.filter(post_id=self.post.id).count(), 1)
+
+        self.assertEqual(purge_deleted_post(self.post.id), 1)
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
+
+    def test_auto_reply_skipped_for_deleted_post(self):
+        Post.objects.filter(id=self.post.id).update(is_deleted=True)
+
+        with mock.patch("posts.tasks.get_llm_client") as get_llm_client:
+            send_auto_reply(self.post.id, self.post.user_id, "Hello")
+        get_llm_client.assert_not_called()
+
+
+class PostAdminTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        self.client.force_login(self.admin)
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", content="Test", user=self.admin)
+            for i in range(3)
+        ]
+
+    @mock.patch.object(PostAdmin, "list_per_page", 2)
+    def test_keyset_navigation(self):
+        response = self.client.get("/admin/posts/post/")
+        self.assertEqual(
+            [post.id for post in response.context["cl"].result_list],
+            [self.posts[2].id, self.posts[1].id]
+        )
+
+        response = self.client.get(f"/admin/posts/post/{response.context['older_url']}")
+        self.assertEqual(
+            [post.id for post in response.context["cl"].result_list], [self.posts[0].id]
+        )
+        self.assertNotIn("older_url", response.context)
+
+    def test_bulk_block_and_tombstone_delete(self):
+        ids = [str(post.id) for post in self.posts[:2]]
+        self.client.post(
+            "/admin/posts/post/",
+            {"action": "block_selected", "_selected_action": ids}
+        )
+        self.assertEqual(Post.objects.filter(is_blocked=True).count(), 2)
+
+        with mock.patch("posts.tasks.purge_deleted_post.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    "/admin/posts/post/",
+                    {"action": "delete_selected", "_selected_action": ids, "post": "yes"}
+                )
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(Post.all_objects.filter(is_deleted=True).count(), 2)
+        self.assertEqual(Post.objects.count(), 1)
+
+
+@override_settings(REMODERATION_BATCH_SIZE=2, REMODERATION_MAX_ROWS_PER_SECOND=0)
+class RemoderationTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        for title in ["Clean", "damn", "Fine", "shit", "Nice"]:
+            Post.objects.create(title=title, content="Test", user=self.admin)
+        Post.objects.filter(title="Nice").update(is_blocked=True)
+
+    def blocked_titles(self):
+        return set(Post.objects.filter(is_blocked=True).values_list("title", flat=True))
+
+    def test_blocks_profane_content_in_batches(self):
+        job = start_job("posts")
+
+        self.assertTrue(run_job(job, workers=0))
+        self.assertEqual(job.status, "done")
+        self.assertEqual((job.scanned, job.blocked, job.unblocked), (5, 2, 0))
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(self.blocked_titles(), {"damn", "shit", "Nice"})
+
+    def test_unblock_and_process_pool(self):
+        job = start_job("posts", unblock=True)
+
+        self.assertTrue(run_job(job, workers=2))
+        self.assertEqual(self.blocked_titles(), {"damn", "shit"})
+        self.assertEqual(job.unblocked, 1)
+
+    def test_resumes_from_checkpoint(self):
+        job = start_job("posts")
+
+        def crash(job):
+            raise RuntimeError("worker died")
+
+        with self.assertRaises(RuntimeError):
+            run_job(job, workers=0, on_batch=crash)
+        job = RemoderationJob.objects.get(id=job.id)
+        self.assertEqual(job.scanned, 2)
+        self.assertEqual(job.progress, 0.4)
+
+        self.assertTrue(run_job(job, workers=0))
+        self.assertEqual(job.scanned, 5)
+
+    def test_staff_endpoint_starts_jobs(self):
+        client = Client()
+        token = str(RefreshToken.for_user(self.admin).access_token)
+
+        with mock.patch("posts.tasks.remoderate.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(
+                    "/api/ops/remoderation/",
+                    data=json.dumps({"target": "all"}),
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=f"Bearer {token}"
+                )
+
+        jobs = json.loads(response.content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([job["target"] for job in jobs], ["posts", "comments"])
+        self.assertEqual(delay.call_count, 2)
+
+        job_id = jobs[0]["id"]
+        response = client.post(
+            f"/api/ops/remoderation/{job_id}/pause/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(json.loads(response.content)["status"], "paused")
+        self.assertFalse(run_job(RemoderationJob.objects.get(id=job_id), workers=0))
+
+
+@override_settings(
+    TRENDING_BACKEND="memory", TRENDING_HALF_LIFE_HOURS=1,
+    TRENDING_MIN_SCORE=0.1, TRENDING_MAX_POSTS=2
+)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(username="user", password="user")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.posts = [Post.objects.create(**sample_post()) for _ in range(3)]
+        get_trending_ranking().clear()
+
+    def comment(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/posts/{post.id}/comments/",
+                data={"comment": "Nice"},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}"
+            )
+        return json.loads(response.content)["id"]
+
+    def trending(self):
+        return [post["id"] for post in json.loads(self.client.get("/api/posts/trending/").content)]
+
+    def test_scores_decay_by_half_every_half_life(self):
+        ranking = MemoryTrendingRanking()
+        hour = 60 * 60
+        ranking.record([(1, 0, 1), (1, 0, 1), (1, 0, 1), (2, 2 * hour, 1)], now=0)
+
+        self.assertEqual(ranking.top(2, now=2 * hour), [(2, 1.0), (1, 0.75)])
+
+    def test_compaction_keeps_scores_and_bounds_size(self):
+        ranking = MemoryTrendingRanking()
+        hour = 60 * 60
+        ranking.record([(1, 0, 1), (2, hour, 1), (3, 4 * hour, 1), (4, 4 * hour, 2)], now=0)
+
+        self.assertEqual(ranking.compact(now=4 * hour), 2)
+        self.assertEqual(ranking.top(10, now=5 * hour), [(4, 1.0), (3, 0.5)])
+
+    def test_comments_rank_posts_and_deletions_update_them(self):
+        first, second, _ = self.posts
+        self.comment(first)
+        comment_ids = [self.comment(second), self.comment(second)]
+
+        self.assertEqual(self.trending(), [second.id, first.id])
+
+        for comment_id in comment_ids:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    f"/api/posts/{second.id}/comments/{comment_id}/",
+                    HTTP_AUTHORIZATION=f"Bearer {self.token}"
+                )
+        self.assertEqual(self.trending(), [first.id])
+
+        with mock.patch("posts.tasks.purge_deleted_post.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    f"/api/posts/{first.id}/", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+                )
+        self.assertEqual(self.trending(), [])
+
+    def test_only_visible_comments_count(self):
+        first, second, third = self.posts
+        with override_settings(MODERATION_MODE="deferred"):
+            pending = self.comment(first)
+        self.comment(second)
+        self.assertEqual(self.trending(), [second.id])
+
+        moderate_pending_content()
+        self.assertEqual(sorted(self.trending()), [first.id, second.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/posts/{first.id}/comments/{pending}/",
+                data={"comment": "damn"},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}"
+            )
+        self.assertEqual(self.trending(), [second.id])
+
+        self.comment(third)
+        with self.captureOnCommitCallbacks(execute=True):
+            block = CommentAdmin(Comment, admin.site).actions[0]
+            block(mock.Mock(), None, Comment.objects.filter(post=second))
+        self.assertEqual(self.trending(), [third.id])
+
+        Comment.objects.filter(post=third).update(comment="damn")
+        self.assertTrue(run_job(start_job("comments"), workers=0))
+        self.assertEqual(self.trending(), [])
+
+    def test_rebuild_recounts_recent_comments(self):
+        for post in self.posts:
+            Comment.objects.create(post=post, user=self.user, comment="Old")
+        Comment.objects.create(post=self.posts[2], user=self.user, comment="New")
+        # Counted once moderate_pending_content publishes them.
+        for _ in range(2):
+            Comment.objects.create(
+                post=self.posts[1], user=self.user, comment="Pending", is_pending=True
+            )
+
+        self.assertEqual(rebuild(), 3)
+        self.assertEqual(self.trending(), [self.posts[2].id, self.posts[0].id])
+
+
+@override_settings(POST_CACHE_INVALIDATION="memory")
+class PostMetadataCacheTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = get_user_model().objects.create_user(username="owner", password="owner")
+        self.other = get_user_model().objects.create_user(username="other", password="other")
+        post_metadata.clear()
+
+    def comment(self, post_id, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f"/api/posts/{post_id}/comments/",
+                data={"comment": "Nice"},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+
+    def test_cached_post_is_not_read_again(self):
+        post = Post.objects.create(title="Test", content="Test", user=self.owner)
+        self.assertEqual(self.comment(post.id, self.other).status_code, 201)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.comment(post.id, self.other).status_code, 201)
+        self.assertFalse(any("posts_post" in query["sql"] for query in queries))
+
+    def test_moderation_and_deletion_evict_the_post(self):
+        post = Post.objects.create(title="Test", content="Test", user=self.owner, is_pending=True)
+        self.assertEqual(self.comment(post.id, self.owner).status_code, 201)
+        self.assertEqual(self.comment(post.id, self.other).status_code, 404)
+
+        moderate_pending_content()
+        self.assertEqual(self.comment(post.id, self.other).status_code, 201)
+
+        with mock.patch("posts.tasks.purge_deleted_post.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                delete_posts([post.id])
+        self.assertEqual(self.comment(post.id, self.other).status_code, 404)
+
+    def test_entries_expire_and_least_recently_used_are_dropped(self):
+        cache = PostMetadataCache(size=2, ttl=5)
+        first, second, third = (
+            PostMetadata(post_id, 1, False, 0, False, False, False) for post_id in (1, 2, 3)
+        )
+        with mock.patch("posts.metadata.time.monotonic", return_value=0):
+            cache.set(first)
+            cache.set(second)
+            cache.get(1)
+            cache.set(third)
+
+            self.assertEqual(cache.get(1), first)
+            self.assertIsNone(cache.get(2))
+        with mock.patch("posts.metadata.time.monotonic", return_value=6):
+            self.assertIsNone(cache.get(1))
+
+
+class AutoReplyLLMTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="user", password="user")
+        self.post = Post.objects.create(title="Test", content="Test", user=self.user)
+        self.server = FakeLLMServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def test_replies_come_from_the_configured_endpoint_and_model(self):
+        with override_settings(LLM_BASE_URL=self.server.url, LLM_MODEL="fake-model"):
+            send_auto_reply(self.post.id, self.user.id, "Hello")
+
+        self.assertEqual(self.server.statuses, {200: 1})
+        self.assertEqual(self.server.models, {"fake-model"})
+        self.assertEqual(Comment.objects.get(post=self.post).comment, "Thank you!")
+
+
+@override_settings(
+    LLM_GATE_BACKEND="memory", LLM_BREAKER_MIN_CALLS=2, LLM_BREAKER_FAILURE_RATIO=0.5,
+    LLM_BREAKER_COOLDOWN=60, LLM_CONCURRENCY_MIN=1, LLM_CONCURRENCY_MAX=4,
+    RATE_LIMIT_AUTO_REPLIES=""
+)
+class LLMGateTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user(username="owner", password="owner")
+        self.post = Post.objects.create(
+            title="Test", content="Test", user=self.owner, auto_reply_enabled=True
+        )
+        get_llm_gate().clear()
+
+    def serve(self, **options):
+        server = FakeLLMServer(**options)
+        server.start()
+        self.addCleanup(server.stop)
+        return override_settings(LLM_BASE_URL=server.url), server
+
+    def reply(self):
+        with mock.patch("posts.tasks.send_auto_reply.apply_async") as apply_async:
+            send_auto_reply(self.post.id, self.owner.id, "Hello", reply_id="reply", due=time.time())
+        return apply_async
+
+    def test_errors_open_the_breaker_and_defer_replies_until_a_probe_succeeds(self):
+        endpoint, server = self.serve(errors={500: 1.0})
+        with endpoint:
+            self.assertEqual(self.reply().call_args.kwargs["kwargs"]["reply_id"], "reply")
+            self.reply()
+            self.assertEqual(get_llm_gate().status()["state"], "open")
+
+            self.reply().assert_called_once()
+            self.assertEqual(server.statuses, {500: 2})
+
+            server.errors = {}
+            with override_settings(LLM_BREAKER_COOLDOWN=0):
+                self.reply().assert_not_called()
+
+        self.assertEqual(get_llm_gate().status()["state"], "closed")
+        self.assertEqual(get_llm_gate().status()["deferred"], 3)
+        self.assertEqual(Comment.objects.get(post=self.post).comment, "Thank you!")
+
+    def test_slow_calls_open_the_breaker_and_shrink_concurrency(self):
+        endpoint, server = self.serve(latency=0.05)
+        with endpoint, override_settings(LLM_SLOW_CALL_SECONDS=0.01):
+            self.reply()
+            self.reply()
+
+        status = get_llm_gate().status()
+        self.assertEqual(status["state"], "open")
+        self.assertEqual(status["concurrency_limit"], 1)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+
+    def test_concurrency_limit_grows_after_successes_and_halves_on_failure(self):
+        gate = MemoryLLMGate()
+        tokens = [gate.acquire(now=0) for _ in range(5)]
+        self.assertIsNone(tokens[-1])
+
+        gate.release(tokens[0], ok=False, latency=0, now=1)
+        self.assertEqual(gate.status(now=1)["concurrency_limit"], 2)
+        self.assertIsNone(gate.acquire(now=1))
+
+        gate.release(tokens[1], ok=True, latency=0, now=1)
+        self.assertEqual(gate.status(now=1)["concurrency_limit"], 2.5)
+
+    @override_settings(LLM_MAX_QUEUE_DEPTH=1, LLM_REPLY_MAX_AGE=60)
+    def test_queue_is_bounded_and_overdue_replies_are_shed(self):
+        commenter = get_user_model().objects.create_user(username="commenter", password="user")
+        with mock.patch("posts.tasks.send_auto_reply.apply_async") as apply_async:
+            schedule_auto_reply(commenter.id, self.post, "First")
+            schedule_auto_reply(commenter.id, self.post, "Second")
+        apply_async.assert_called_once()
+        self.assertEqual(get_llm_gate().status()["queue_depth"], 1)
+
+        with mock.patch("posts.tasks.get_llm_client") as get_llm_client:
+            send_auto_reply(*apply_async.call_args.kwargs["args"],
+                            reply_id=apply_async.call_args.kwargs["kwargs"]["reply_id"],
+                            due=time.time() - 120)
+        get_llm_client.assert_not_called()
+
+        status = get_llm_gate().status()
+        self.assertEqual((status["queue_depth"], status["shed"]), (0, 2))
+
+    @override_settings(LLM_REPLY_MAX_AGE=60)
+    def test_replies_to_pending_comments_are_deferred_until_shed(self):
+        commenter = get_user_model().objects.create_user(username="commenter", password="user")
+        comment = Comment.objects.create(
+            post=self.post, user=commenter, comment="Hello", is_pending=True
+        )
+        with mock.patch("posts.tasks.send_auto_reply.apply_async") as apply_async:
+            schedule_auto_reply(commenter.id, self.post, "Hello", comment.id)
+        reply_id = apply_async.call_args.kwargs["kwargs"]["reply_id"]
+
+        with mock.patch("posts.tasks.send_auto_reply.apply_async") as apply_async, \
+                mock.patch("posts.tasks.get_llm_client") as get_llm_client:
+            send_auto_reply(self.post.id, self.owner.id, "Hello", comment.id,
+                            reply_id=reply_id, due=time.time())
+            self.assertEqual(apply_async.call_args.kwargs["kwargs"]["reply_id"], reply_id)
+            self.assertEqual(get_llm_gate().status()["queue_depth"], 1)
+
+            apply_async.reset_mock()
+            send_auto_reply(self.post.id, self.owner.id, "Hello", comment.id,
+                            reply_id=reply_id, due=time.time() - 120)
+        apply_async.assert_not_called()
+        get_llm_client.assert_not_called()
+
+        status = get_llm_gate().status()
+        self.assertEqual((status["queue_depth"], status["shed"], status["deferred"]), (0, 1, 0))
+
+    def test_staff_can_read_gate_metrics(self):
+        admin = get_user_model().objects.create_superuser(username="admin", password="admin")
+        response = Client().get(
+            "/api/ops/llm/",
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["state"], "closed")
@@ -0,0 +1,242 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+# Each comment adds 2 ** ((created_at - epoch) / half-life) to its post's
+# score, so older comments weigh exponentially less without ever touching
+# the stored scores. Compaction moves the epoch forward (scaling every score
+# down to keep them small), drops posts whose score decayed below
+# TRENDING_MIN_SCORE and keeps at most TRENDING_MAX_POSTS posts.
+
+
+def half_life() -> float:
+    return settings.TRENDING_HALF_LIFE_HOURS * 60 * 60
+
+
+def weight(timestamp: float, epoch: float) -> float:
+    return 2 ** ((timestamp - epoch) / half_life())
+
+
+RECORD_SCRIPT = """
+local epoch = tonumber(redis.call('get', KEYS[2]))
+if not epoch then
+    epoch = tonumber(ARGV[1])
+    redis.call('set', KEYS[2], ARGV[1])
+end
+local floor = tonumber(ARGV[3]) * 2 ^ ((tonumber(ARGV[1]) - epoch) / tonumber(ARGV[2]))
+for index = 4, #ARGV, 3 do
+    local count = tonumber(ARGV[index + 2])
+    local change = count * 2 ^ ((tonumber(ARGV[index + 1]) - epoch) / tonumber(ARGV[2]))
+    local score = tonumber(redis.call('zincrby', KEYS[1], change, ARGV[index]))
+    if count < 0 and score < floor then
+        redis.call('zrem', KEYS[1], ARGV[index])
+    end
+end
+"""
+
+COMPACT_SCRIPT = """
+local epoch = tonumber(redis.call('get', KEYS[2]))
+if epoch then
+    local factor = 2 ^ ((epoch - tonumber(ARGV[1])) / tonumber(ARGV[2]))
+    redis.call('zunionstore', KEYS[1], 1, KEYS[1], 'WEIGHTS', tostring(factor))
+end
+redis.call('set', KEYS[2], ARGV[1])
+local dropped = redis.call('zremrangebyscore', KEYS[1], '-inf', '(' .. ARGV[3])
+dropped = dropped + redis.call('zremrangebyrank', KEYS[1], 0, -tonumber(ARGV[4]) - 1)
+return dropped
+"""
+
+
+class RedisTrendingRanking:
+    """Scores in a sorted set, updated and compacted by Lua scripts so both stay atomic."""
+
+    key = "trending:posts"
+    epoch_key = "trending:epoch"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._record = self.client.register_script(RECORD_SCRIPT)
+        self._compact = self.client.register_script(COMPACT_SCRIPT)
+
+    def record(self, events: list, now: float = None) -> None:
+        """
+        Apply ``(post_id, timestamp, count)`` events: a count of 1 for a new
+        comment, -1 for a removed one. Removals drop a post whose score falls
+        below TRENDING_MIN_SCORE, so rounding never leaves it ranked.
+        """
+        now = time.time() if now is None else now
+        arguments = [now, half_life(), settings.TRENDING_MIN_SCORE]
+        for post_id, timestamp, count in events:
+            arguments += [post_id, timestamp, count]
+        self._record(keys=[self.key, self.epoch_key], args=arguments)
+
+    def remove(self, post_ids: list) -> None:
+        if post_ids:
+            self.client.zrem(self.key, *post_ids)
+
+    def top(self, limit: int, now: float = None) -> list:
+        """The ``limit`` highest ``(post_id, score)`` pairs, scores decayed to ``now``."""
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(self.epoch_key)
+        pipeline.zrevrange(self.key, 0, limit - 1, withscores=True)
+        epoch, entries = pipeline.execute()
+        if epoch is None:
+            return []
+        scale = 1 / weight(time.time() if now is None else now, float(epoch))
+        return [(int(post_id), score * scale) for post_id, score in entries]
+
+    def compact(self, now: float = None) -> int:
+        return self._compact(
+            keys=[self.key, self.epoch_key],
+            args=[
+                time.time() if now is None else now, half_life(),
+                settings.TRENDING_MIN_SCORE, settings.TRENDING_MAX_POSTS,
+            ]
+        )
+
+    def clear(self) -> None:
+        self.client.delete(self.key, self.epoch_key)
+
+
+class MemoryTrendingRanking:
+    """In-process stand-in for RedisTrendingRanking, for tests and single-process runs."""
+
+    def __init__(self):
+        self._scores = {}
+        self._epoch = None
+        self._lock = threading.Lock()
+
+    def record(self, events: list, now: float = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._epoch is None:
+                self._epoch = now
+            floor = settings.TRENDING_MIN_SCORE * weight(now, self._epoch)
+            for post_id, timestamp, count in events:
+                score = self._scores.get(post_id, 0.0) + count * weight(timestamp, self._epoch)
+                if count < 0 and score < floor:
+                    self._scores.pop(post_id, None)
+                else:
+                    self._scores[post_id] = score
+
+    def remove(self, post_ids: list) -> None:
+        with self._lock:
+            for post_id in post_ids:
+                self._scores.pop(post_id, None)
+
+    def top(self, limit: int, now: float = None) -> list:
+        with self._lock:
+            if self._epoch is None:
+                return []
+            scale = 1 / weight(time.time() if now is None else now, self._epoch)
+            return [
+                (post_id, score * scale)
+                for post_id, score in heapq.nlargest(
+                    limit, self._scores.items(), key=lambda item: item[1]
+                )
+            ]
+
+    def compact(self, now: float = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            scale = 1 / weight(now, self._epoch) if self._epoch is not None else 1
+            self._epoch = now
+            scores = {
+                post_id: score * scale for post_id, score in self._scores.items()
+                if score * scale >= settings.TRENDING_MIN_SCORE
+            }
+            if len(scores) > settings.TRENDING_MAX_POSTS:
+                scores = dict(heapq.nlargest(
+                    settings.TRENDING_MAX_POSTS, scores.items(), key=lambda item: item[1]
+                ))
+            dropped = len(self._scores) - len(scores)
+            self._scores = scores
+            return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+            self._epoch = None
+
+
+@lru_cache
+def _trending_ranking(backend: str):
+    if backend == "memory":
+        return MemoryTrendingRanking()
+    return RedisTrendingRanking()
+
+
+def get_trending_ranking():
+    return _trending_ranking(settings.TRENDING_BACKEND)
+
+
+def record_comments(comments, sign: int = 1) -> None:
+    """
+    Count ``comments`` that just became visible towards their post's score,
+    or take back ones that stopped being visible with ``sign=-1``. The
+    ranking is best effort: when Redis is unavailable the change is only
+    logged, and rebuild_trending restores the scores.
+    """
+    events = [(comment.post_id, comment.created_at.timestamp(), sign) for comment in comments]
+    if not events:
+        return
+    try:
+        get_trending_ranking().record(events)
+    except RedisError:
+        logger.warning("Could not update trending scores", exc_info=True)
+
+
+def forget_posts(post_ids: list) -> None:
+    try:
+        get_trending_ranking().remove(post_ids)
+    except RedisError:
+        logger.warning("Could not remove posts from trending", exc_info=True)
+
+
+def rebuild(now=None) -> int:
+    """
+    Recompute the ranking from the visible comments of the last
+    TRENDING_REBUILD_HALF_LIVES half-lives, counted per post and hour on
+    every shard. Returns the number of ranked posts.
+    """
+    from comments.models import Comment
+    from comments.sharding import scatter
+
+    now = now or timezone.now()
+    since = now - timedelta(seconds=half_life() * settings.TRENDING_REBUILD_HALF_LIVES)
+
+    def hourly_counts(alias):
+        return list(
+            Comment.objects.using(alias)
+            .filter(created_at__gte=since, is_blocked=False, is_pending=False)
+            .annotate(hour=TruncHour("created_at"))
+            .values("post_id", "hour")
+            .annotate(count=Count("id"))
+            .values_list("post_id", "hour", "count")
+        )
+
+    events = [
+        (post_id, hour.timestamp() + 30 * 60, count)
+        for counts in scatter(hourly_counts)
+        for post_id, hour, count in counts
+    ]
+    ranking = get_trending_ranking()
+    ranking.clear()
+    for start in range(0, len(events), 1000):
+        ranking.record(events[start:start + 1000], now=now.timestamp())
+    ranking.compact(now.timestamp())
+    return len({post_id for post_id, _, _ in events})
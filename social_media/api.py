@@ -0,0 +1,115 @@
+from functools import partial
+
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from ninja import Query
+from ninja_extra import NinjaExtraAPI, api_controller, permissions, route
+from ninja_jwt.authentication import JWTAuth
+from redis.exceptions import RedisError
+
+from posts.llm_gate import get_llm_gate
+from posts.models import RemoderationJob
+from posts.remoderation import TARGETS, start_jobs
+from posts.schemas import LLMGateSchema, RemoderationJobSchema, RemoderationRequestSchema
+from posts.tasks import remoderate
+from social_media.profiling import profiles, stats_file, summary
+from social_media.slow_queries import get_slow_query_log
+from social_media.renderers import ORJSONRenderer
+from users.schemas import Error
+
+
+api = NinjaExtraAPI(urls_namespace="ops-api", renderer=ORJSONRenderer())
+
+
+@api_controller("/profiles", auth=JWTAuth(), permissions=[permissions.IsAdminUser])
+class ProfileController:
+    @route.get("/", response=list[dict])
+    def list_profiles(self, request):
+        return [summary(profile) for profile in profiles.list()]
+
+    @route.get("/{profile_id}/", response={200: dict, 404: Error})
+    def get_profile(self, request, profile_id: str):
+        profile = profiles.get(profile_id)
+        if profile is None:
+            return 404, {"message": "Profile not found"}
+        return {key: value for key, value in profile.items() if key != "stats"}
+
+    @route.get("/{profile_id}/download/", response={404: Error})
+    def download_profile(self, request, profile_id: str):
+        profile = profiles.get(profile_id)
+        if profile is None:
+            return 404, {"message": "Profile not found"}
+
+        response = HttpResponse(stats_file(profile), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="{profile_id}.prof"'
+        return response
+
+
+@api_controller("/slow-queries", auth=JWTAuth(), permissions=[permissions.IsAdminUser])
+class SlowQueryController:
+    @route.get("/", response=list[dict])
+    def list_slow_queries(self, request, limit: int = Query(50, ge=1, le=500)):
+        return get_slow_query_log().entries(limit)
+
+    @route.delete("/", response={204: None})
+    def clear_slow_queries(self, request):
+        get_slow_query_log().clear()
+        return 204, None
+
+
+@api_controller("/remoderation", auth=JWTAuth(), permissions=[permissions.IsAdminUser])
+class RemoderationController:
+    """Re-check existing content after the profanity list changed."""
+
+    @route.post("/", response={201: list[RemoderationJobSchema]})
+    def start_remoderation(self, request, data: RemoderationRequestSchema):
+        targets = list(TARGETS) if data.target == "all" else [data.target]
+        jobs = [
+            job for target in targets
+            for job in start_jobs(target, data.unblock, request.user)
+        ]
+        for job in jobs:
+            transaction.on_commit(partial(remoderate.delay, job.id))
+        return 201, jobs
+
+    @route.get("/", response=list[RemoderationJobSchema])
+    def list_jobs(self, request):
+        return RemoderationJob.objects.order_by("-id")[:20]
+
+    @route.get("/{job_id}/", response=RemoderationJobSchema)
+    def get_job(self, request, job_id: int):
+        return get_object_or_404(RemoderationJob, id=job_id)
+
+    @route.post("/{job_id}/pause/", response=RemoderationJobSchema)
+    def pause_job(self, request, job_id: int):
+        RemoderationJob.objects.filter(id=job_id, status="running").update(status="paused")
+        return get_object_or_404(RemoderationJob, id=job_id)
+
+    @route.post("/{job_id}/resume/", response=RemoderationJobSchema)
+    def resume_job(self, request, job_id: int):
+        job = get_object_or_404(RemoderationJob, id=job_id)
+        if job.status != "done":
+            # Also restarts running jobs whose worker died mid-run; a second
+            # runner only repeats batches, which is harmless.
+            RemoderationJob.objects.filter(id=job_id).update(status="running")
+            transaction.on_commit(partial(remoderate.delay, job.id))
+            job.refresh_from_db()
+        return job
+
+
+@api_controller("/llm", auth=JWTAuth(), permissions=[permissions.IsAdminUser])
+class LLMController:
+    """Breaker state, concurrency and reply queue of the auto-reply LLM."""
+
+    @route.get("/", response={200: LLMGateSchema, 503: Error})
+    def llm_gate_status(self, request):
+        try:
+            return get_llm_gate().status()
+        except RedisError:
+            return 503, {"message": "LLM gate state is unavailable"}
+
+
+api.register_controllers(
+    ProfileController, SlowQueryController, RemoderationController, LLMController
+)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class SocialMediaConfig(AppConfig):
+    name = "social_media"
+
+    def ready(self):
+        import social_media.db  # noqa: F401
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class ConnectionPool:
+    """
+    Process-level pool of idle DB-API connections.
+
+    Connections are checked out when Django opens a connection and returned
+    when Django closes it, so a request reuses an already authenticated
+    connection instead of paying for a new TCP/TLS handshake and backend
+    startup. At most ``max_size`` idle connections are kept; connections idle
+    for longer than ``max_idle`` seconds are closed on checkout.
+    """
+
+    def __init__(self, max_size: int = 10, max_idle: float = 300, health_checks: bool = True):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_checks = health_checks
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, connect):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, returned_at = self._idle.pop()
+
+            if time.monotonic() - returned_at > self.max_idle or not self.is_usable(connection):
+                self.discard(connection)
+                continue
+
+            self.reused += 1
+            return connection
+
+        self.created += 1
+        return connect()
+
+    def put(self, connection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self.discard(connection)
+
+    def is_usable(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def discard(connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def forget(self) -> None:
+        # After fork the child shares sockets with its parent, so they must be
+        # dropped without sending a termination message to the server.
+        with self._lock:
+            self._idle = deque()
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, settings_dict: dict):
+    options = settings_dict.get("POOL") or {}
+    if not options.get("max_size"):
+        return None
+
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                max_size=options["max_size"],
+                max_idle=options.get("max_idle", 300),
+                health_checks=settings_dict.get("CONN_HEALTH_CHECKS", True),
+            )
+        return _pools[alias]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.clear()
+
+
+def _forget_pools_after_fork() -> None:
+    for pool in _pools.values():
+        pool.forget()
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools_after_fork)
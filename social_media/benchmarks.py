@@ -0,0 +1,26 @@
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connections
+
+
+@contextmanager
+def throwaway_database(alias: str = "default"):
+    """
+    Run a benchmark against a freshly migrated test database instead of the
+    configured one. SQLite gets a temporary file rather than the in-memory
+    test database so concurrent connections behave as in production.
+    """
+    connection = connections[alias]
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = str(Path(directory) / "bench.sqlite3")
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
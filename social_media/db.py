@@ -0,0 +1,63 @@
+from types import MethodType
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def get_sqlite_profile(connection) -> dict:
+    return connection.settings_dict.get(
+        "SQLITE_PROFILE", getattr(settings, "SQLITE_PROFILE", {})
+    )
+
+
+def sqlite_pragmas(profile: dict) -> list[str]:
+    pragmas = []
+
+    journal_mode = profile.get("journal_mode")
+    if journal_mode:
+        if journal_mode.upper() not in SQLITE_JOURNAL_MODES:
+            raise ValueError(f"Unknown SQLite journal mode: {journal_mode}")
+        pragmas.append(f"PRAGMA journal_mode = {journal_mode.upper()}")
+
+    synchronous = profile.get("synchronous")
+    if synchronous:
+        if synchronous.upper() not in SQLITE_SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown SQLite synchronous mode: {synchronous}")
+        pragmas.append(f"PRAGMA synchronous = {synchronous.upper()}")
+
+    for pragma in ("mmap_size", "cache_size", "busy_timeout"):
+        if profile.get(pragma) is not None:
+            pragmas.append(f"PRAGMA {pragma} = {int(profile[pragma])}")
+
+    return pragmas
+
+
+def _begin_immediate(self):
+    self.cursor().execute("BEGIN IMMEDIATE")
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+
+    profile = get_sqlite_profile(connection)
+    if not profile:
+        return
+
+    with connection.cursor() as cursor:
+        for pragma in sqlite_pragmas(profile):
+            cursor.execute(pragma)
+
+    # Django 5.0 opens atomic blocks with a deferred BEGIN. Upgrading such a
+    # transaction from a read to a write lock fails instantly with "database
+    # is locked" instead of waiting on busy_timeout.
+    if profile.get("begin_immediate"):
+        connection._start_transaction_under_autocommit = MethodType(
+            _begin_immediate, connection
+        )
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+
+
+def sparse_fields(schema, fields: str = None) -> tuple:
+    """
+    The comma-separated ``fields`` of ``schema`` in the schema's order, or
+    all of its fields when none are requested (including ``?fields=,``), so
+    the field order in the query string does not matter.
+    """
+    requested = {name.strip() for name in (fields or "").split(",") if name.strip()}
+    if not requested:
+        return tuple(schema.model_fields)
+
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+EXPANDABLE = ("user",)
+
+# Column joined in for ``?expand=user``.
+USERNAME = "user__username"
+
+
+def parse_expand(expand: str = None) -> set:
+    """The relations requested in a comma-separated ``?expand=`` value."""
+    if not expand:
+        return set()
+
+    requested = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = requested - set(EXPANDABLE)
+    if unknown:
+        raise ValueError(f"Cannot expand: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def embed_users(rows: list) -> list:
+    """
+    Replace the ``user`` id of ``rows`` with ``{"id", "username"}``. Rows
+    fetched with the USERNAME column already carry the name from the join;
+    the others are resolved together with one query.
+    """
+    missing = {row["user"] for row in rows if USERNAME not in row}
+    usernames = dict(
+        get_user_model().objects.filter(id__in=missing).values_list("id", "username")
+    ) if missing else {}
+
+    for row in rows:
+        username = row.pop(USERNAME) if USERNAME in row else usernames.get(row["user"])
+        row["user"] = {"id": row["user"], "username": username}
+    return rows
@@ -0,0 +1,100 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from ninja_jwt.authentication import JWTBaseAuthentication
+from ninja_jwt.exceptions import InvalidToken
+from ninja_jwt.settings import api_settings
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def token_user_id(request):
+    """User id claim of a valid bearer token, without a database lookup."""
+    auth = request.headers.get("Authorization", "")
+    scheme, _, raw_token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not raw_token:
+        return None
+    try:
+        return JWTBaseAuthentication.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+
+def idempotency_cache_key(user_id, key: str) -> str:
+    return f"idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response of a POST retried with the same
+    Idempotency-Key by the same user, so retries never reach the write path.
+    Concurrent requests with one key are serialized with a short cache lock.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != "POST" or not key:
+            return self.get_response(request)
+
+        user_id = token_user_id(request)
+        if user_id is None:
+            return self.get_response(request)
+
+        cache_key = idempotency_cache_key(user_id, key)
+        fingerprint = hashlib.sha256(
+            request.path.encode() + b"\n" + request.body
+        ).hexdigest()
+
+        lock_key, token = f"{cache_key}:lock", uuid.uuid4().hex
+        deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+        while not cache.add(lock_key, token, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                return JsonResponse(
+                    {"message": "A request with this Idempotency-Key is in progress"},
+                    status=409
+                )
+            time.sleep(0.05)
+
+        try:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+
+            response = self.get_response(request)
+            if response.status_code < 500 and not response.streaming:
+                cache.set(cache_key, {
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            # A request that outlived its lock must not release the one
+            # another request has taken since.
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    @staticmethod
+    def replay(stored: dict, fingerprint: str) -> HttpResponse:
+        if stored["fingerprint"] != fingerprint:
+            return JsonResponse(
+                {"message": "Idempotency-Key was used for a different request"},
+                status=422
+            )
+
+        response = HttpResponse(
+            stored["content"],
+            status=stored["status"],
+            content_type=stored["content_type"]
+        )
+        response["Idempotent-Replayed"] = "true"
+        return response
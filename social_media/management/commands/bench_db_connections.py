@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from social_media.backends.pool import close_pools, get_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request connection setup time with and without the "
+        "process-level connection pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        connection = connections[alias]
+        pool_options = connection.settings_dict.get("POOL")
+        if get_pool(alias, connection.settings_dict) is None:
+            raise CommandError(
+                f"Database '{alias}' has no connection pool configured, "
+                "set DB_ENGINE=postgresql and DB_POOL_MAX_SIZE"
+            )
+
+        close_pools()
+        connection.settings_dict["POOL"] = None
+        unpooled = self.run_requests(connection, options["requests"])
+
+        connection.settings_dict["POOL"] = pool_options
+        pooled = self.run_requests(connection, options["requests"])
+        close_pools()
+
+        self.stdout.write(f"without pool: {unpooled * 1000:.2f} ms per request")
+        self.stdout.write(f"   with pool: {pooled * 1000:.2f} ms per request")
+        self.stdout.write(f"        saved: {(unpooled - pooled) * 1000:.2f} ms per request")
+
+    @staticmethod
+    def run_requests(connection, count: int) -> float:
+        start = time.perf_counter()
+        for _ in range(count):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.close()
+        return (time.perf_counter() - start) / count
@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ninja.responses import NinjaJSONEncoder
+from pydantic import TypeAdapter
+
+from comments.models import Comment
+from comments.schemas import CommentSchema
+from posts.models import Post
+from posts.schemas import PostSchema
+from social_media.renderers import dumps
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization through schema validation and the "
+        "default JSON renderer with the orjson projection fast path"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                username="bench_serialization", password="bench"
+            )
+            Post.objects.bulk_create(
+                Post(title=f"Post {i}", content="Content " * 50, user=user)
+                for i in range(options["rows"])
+            )
+            post = Post.objects.filter(user=user).first()
+            Comment.objects.bulk_create(
+                Comment(post=post, comment="Comment " * 20, user=user)
+                for _ in range(options["rows"])
+            )
+
+            for schema, queryset in (
+                (PostSchema, Post.objects.filter(user=user)),
+                (CommentSchema, Comment.objects.filter(post=post)),
+            ):
+                before = self.measure(options["repeat"], self.validated, schema, queryset)
+                after = self.measure(options["repeat"], self.projected, schema, queryset)
+                self.stdout.write(
+                    f"{schema.__name__:>13}: {before * 1000:.1f} ms -> "
+                    f"{after * 1000:.1f} ms per {options['rows']} rows "
+                    f"({before / after:.1f}x)"
+                )
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(repeat: int, serialize, schema, queryset) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            serialize(schema, queryset)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    @staticmethod
+    def validated(schema, queryset) -> bytes:
+        adapter = TypeAdapter(list[schema])
+        rows = adapter.dump_python(
+            adapter.validate_python(list(queryset.all()), from_attributes=True)
+        )
+        return json.dumps(rows, cls=NinjaJSONEncoder).encode()
+
+    @staticmethod
+    def projected(schema, queryset) -> bytes:
+        return dumps(list(queryset.all().values(*schema.model_fields)))
@@ -0,0 +1,104 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent comment-like writes on SQLite with the default "
+        "journaling and with the configured SQLITE_PROFILE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writes", type=int, default=200)
+
+    def handle(self, *args, **options):
+        profiles = {
+            "default": {},
+            "tuned": settings.SQLITE_PROFILE,
+        }
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in profiles.items():
+                alias = f"bench_{name}"
+                connections.databases[alias] = {
+                    **connections.databases["default"],
+                    "NAME": str(Path(directory) / f"{name}.sqlite3"),
+                    "SQLITE_PROFILE": profile,
+                }
+                result = self.run_profile(alias, options)
+                connections[alias].close()
+
+                self.stdout.write(
+                    f"{name:>8}: {result['writes']} writes in "
+                    f"{result['elapsed']:.2f}s "
+                    f"({result['writes'] / result['elapsed']:.0f} writes/s), "
+                    f"{result['locked']} 'database is locked' errors"
+                )
+
+    def run_profile(self, alias: str, options: dict) -> dict:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench_comment ("
+                "id INTEGER PRIMARY KEY, post_id INTEGER, comment TEXT)"
+            )
+
+        stats = {"writes": 0, "locked": 0}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def write():
+            for i in range(options["writes"]):
+                try:
+                    # Read-then-write, like get_or_create or a moderation
+                    # check followed by an insert.
+                    with transaction.atomic(using=alias):
+                        with connections[alias].cursor() as cursor:
+                            cursor.execute(
+                                "SELECT COUNT(*) FROM bench_comment "
+                                "WHERE post_id = %s", [i % 10]
+                            )
+                            cursor.execute(
+                                "INSERT INTO bench_comment (post_id, comment) "
+                                "VALUES (%s, %s)", [i % 10, "Comment" * 20]
+                            )
+                    key = "writes"
+                except OperationalError as error:
+                    if "locked" not in str(error):
+                        raise
+                    key = "locked"
+                with lock:
+                    stats[key] += 1
+            connections[alias].close()
+
+        def read():
+            while not done.is_set():
+                try:
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute("SELECT COUNT(*) FROM bench_comment")
+                        cursor.fetchone()
+                except OperationalError:
+                    pass
+            connections[alias].close()
+
+        writers = [threading.Thread(target=write) for _ in range(options["writers"])]
+        readers = [threading.Thread(target=read) for _ in range(options["readers"])]
+
+        start = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        return {**stats, "elapsed": elapsed}
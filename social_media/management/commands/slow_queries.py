@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from social_media.slow_queries import get_slow_query_log
+
+
+class Command(BaseCommand):
+    help = "Show the slowest queries logged by SlowQueryMiddleware, grouped by normalized SQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--explain", action="store_true", help="Print captured plans")
+        parser.add_argument("--clear", action="store_true", help="Reset the log")
+
+    def handle(self, *args, **options):
+        log = get_slow_query_log()
+        if options["clear"]:
+            log.clear()
+            self.stdout.write("Slow query log cleared")
+            return
+
+        for entry in log.entries(options["limit"]):
+            mean = entry["total_ms"] / entry["count"]
+            routes = ", ".join(
+                f"{route or '-'} ({count})"
+                for route, count in sorted(entry["routes"].items(), key=lambda item: -item[1])
+            )
+            self.stdout.write(
+                f"{entry['total_ms']:10.1f} ms total  {entry['count']:6d} calls  "
+                f"{mean:8.1f} ms mean  {entry['max_ms']:8.1f} ms max"
+            )
+            self.stdout.write(f"  routes: {routes}")
+            self.stdout.write(f"  {entry['sql']}")
+            if options["explain"] and entry["plan"]:
+                for line in entry["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+            self.stdout.write("")
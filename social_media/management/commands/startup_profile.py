@@ -0,0 +1,66 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+PROFILED_STARTUP = """
+import time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from social_media.warmup import warm_up
+warm_up()
+end = time.perf_counter()
+print(f"{setup - start} {end - setup}")
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Report import-time costs of a cold web process: django.setup(), "
+        "then warm_up() with the URL conf and moderation data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15)
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROFILED_STARTUP],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+        )
+        if result.returncode:
+            self.stderr.write(result.stderr)
+            return
+
+        imports = []
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                imports.append((module, len(indent) // 2, int(self_us), int(cumulative_us)))
+
+        setup, warm_up = map(float, result.stdout.split()[-2:])
+        self.stdout.write(f"django.setup(): {setup * 1000:.0f} ms")
+        self.stdout.write(f"warm_up():      {warm_up * 1000:.0f} ms")
+        self.stdout.write(f"modules:        {len(imports)}")
+
+        self.stdout.write("\nSlowest top-level imports (cumulative):")
+        top_level = sorted(
+            (item for item in imports if item[1] == 0), key=lambda item: -item[3]
+        )
+        for module, _, _, cumulative in top_level[:options["top"]]:
+            self.stdout.write(f"{cumulative / 1000:>9.1f} ms  {module}")
+
+        self.stdout.write("\nSlowest modules (self):")
+        for module, _, self_us, _ in sorted(imports, key=lambda item: -item[2])[:options["top"]]:
+            self.stdout.write(f"{self_us / 1000:>9.1f} ms  {module}")
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+
+from social_media.routers import routing_state
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_COOKIE = "db_primary_until"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends reads of safe requests to replicas. After a client writes, its reads
+    stick to the primary for REPLICA_STICKY_SECONDS so it sees its own writes
+    despite replication lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        try:
+            primary_until = float(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0
+
+        token = routing_state.set({
+            "use_replica": (request.method in SAFE_METHODS
+                            and primary_until < time.time())
+        })
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
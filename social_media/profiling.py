@@ -0,0 +1,174 @@
+import cProfile
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from ninja_extra import permissions
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_QUERY_PARAMETER = "profile"
+
+
+class ProfileBuffer:
+    """
+    The last ``size`` request profiles of this process. Each worker process
+    keeps its own buffer, so look for a profile on the worker that served it
+    (its id is returned in the X-Profile-Id header).
+    """
+
+    def __init__(self, size: int):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str):
+        return next(
+            (profile for profile in self.list() if profile["id"] == profile_id), None
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profiles = ProfileBuffer(settings.PROFILER_BUFFER_SIZE)
+
+
+def profiling_requested(request) -> bool:
+    return (
+        PROFILE_HEADER in request.META
+        or request.GET.get(PROFILE_QUERY_PARAMETER) == "1"
+    )
+
+
+def is_staff(request) -> bool:
+    try:
+        user = JWTAuth()(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    return user is not None and permissions.IsAdminUser().has_permission(request, None)
+
+
+class QueryRecorder:
+    def __init__(self, alias: str, queries: list):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": self.alias,
+                "sql": sql,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+            })
+
+
+def function_name(function: tuple) -> str:
+    filename, line, name = function
+    return f"{filename}:{line}({name})" if line else name
+
+
+def call_tree(stats: dict, limit: int) -> list:
+    """The ``limit`` functions with the highest cumulative time and their callees."""
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((cumulative, function))
+
+    tree = []
+    for function, (_, calls, own, cumulative, _) in sorted(
+        stats.items(), key=lambda item: item[1][3], reverse=True
+    )[:limit]:
+        tree.append({
+            "function": function_name(function),
+            "calls": calls,
+            "own_ms": own * 1000,
+            "cumulative_ms": cumulative * 1000,
+            "callees": [
+                {"function": function_name(callee), "cumulative_ms": time_spent * 1000}
+                for time_spent, callee in sorted(callees.get(function, []), reverse=True)
+            ],
+        })
+    return tree
+
+
+def summary(profile: dict) -> dict:
+    return {
+        key: value for key, value in profile.items()
+        if key not in ("stats", "functions", "queries")
+    } | {"query_count": len(profile["queries"])}
+
+
+def stats_file(profile: dict) -> bytes:
+    """The profile in the format of ``pstats.Stats.dump_stats``."""
+    return marshal.dumps(profile["stats"])
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request of a staff user who sends an ``X-Profile``
+    header or a ``profile=1`` query flag. Everyone else only pays for the
+    flag lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request) or not is_staff(request):
+            return self.get_response(request)
+
+        queries = []
+        profiler = cProfile.Profile()
+        started_at = timezone.now()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(QueryRecorder(connection.alias, queries))
+                )
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+
+        duration = time.perf_counter() - start
+        stats = pstats.Stats(profiler).stats
+        profile = {
+            "id": uuid.uuid4().hex,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "started_at": started_at,
+            "duration_ms": duration * 1000,
+            "sql_ms": sum(query["duration_ms"] for query in queries),
+            "queries": queries,
+            "functions": call_tree(stats, settings.PROFILER_TOP_FUNCTIONS),
+            "stats": stats,
+        }
+        profiles.add(profile)
+
+        response["X-Profile-Id"] = profile["id"]
+        return response
@@ -0,0 +1,189 @@
+import logging
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from django.http import JsonResponse
+from redis.exceptions import RedisError
+
+from social_media.idempotency import token_user_id
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class Bucket(NamedTuple):
+    """A token bucket holding up to ``capacity`` tokens, refilled at ``rate`` per second."""
+    key: str
+    capacity: float
+    rate: float
+
+
+def bucket(key: str, limit: str):
+    """The bucket of a ``"<requests>/<seconds>"`` limit, or None when it is empty."""
+    if not limit:
+        return None
+    requests, seconds = limit.split("/")
+    return Bucket(key, float(requests), float(requests) / float(seconds))
+
+
+# Takes a token from every bucket, or from none of them when one is empty,
+# and returns the seconds until all of them hold a token again ("0" when
+# the tokens were taken). Returned as a string, since Redis truncates Lua
+# numbers to integers.
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for index, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[index * 2])
+    local rate = tonumber(ARGV[index * 2 + 1])
+    local state = redis.call('hmget', key, 'tokens', 'updated')
+    local level = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - updated) * rate)
+    tokens[index] = level
+    if level < 1 then
+        wait = math.max(wait, (1 - level) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for index, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[index * 2])
+    local rate = tonumber(ARGV[index * 2 + 1])
+    redis.call('hset', key, 'tokens', tokens[index] - 1, 'updated', now)
+    redis.call('pexpire', key, math.ceil((capacity - tokens[index] + 1) / rate * 1000))
+end
+return '0'
+"""
+
+
+class RedisRateLimiter:
+    """Buckets in Redis hashes, expiring once full, updated atomically by a Lua script."""
+
+    prefix = "ratelimit:"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, buckets: list, now: float = None) -> float:
+        arguments = [time.time() if now is None else now]
+        for entry in buckets:
+            arguments += [entry.capacity, entry.rate]
+        return float(self._take(
+            keys=[f"{self.prefix}{entry.key}" for entry in buckets], args=arguments
+        ))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class MemoryRateLimiter:
+    """In-process stand-in for RedisRateLimiter, for tests and single-process runs."""
+
+    # Buckets that refilled completely are dropped once there are more than this.
+    max_buckets = 100000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets: list, now: float = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens = []
+            for entry in buckets:
+                level, updated = self._buckets.get(entry.key, (entry.capacity, now))
+                tokens.append(min(entry.capacity, level + max(0.0, now - updated) * entry.rate))
+            wait = max(
+                ((1 - level) / entry.rate for entry, level in zip(buckets, tokens) if level < 1),
+                default=0.0
+            )
+            if wait:
+                return wait
+
+            for entry, level in zip(buckets, tokens):
+                self._buckets[entry.key] = (level - 1, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+            return 0.0
+
+    def _prune(self, now: float) -> None:
+        # Without the limits at hand, a bucket idle for an hour counts as full.
+        self._buckets = {
+            key: (level, updated) for key, (level, updated) in self._buckets.items()
+            if now - updated < 60 * 60
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+@lru_cache
+def _rate_limiter(backend: str):
+    if backend == "memory":
+        return MemoryRateLimiter()
+    return RedisRateLimiter()
+
+
+def get_rate_limiter():
+    return _rate_limiter(settings.RATE_LIMIT_BACKEND)
+
+
+def take(buckets: list) -> float:
+    """
+    Take a token from each of ``buckets``; returns 0 when allowed, otherwise
+    the seconds to wait. Limits fail open: when Redis is unavailable every
+    request is allowed and the outage is only logged.
+    """
+    buckets = [entry for entry in buckets if entry is not None]
+    if not buckets:
+        return 0.0
+    try:
+        return get_rate_limiter().take(buckets)
+    except RedisError:
+        logger.warning("Could not check rate limits", exc_info=True)
+        return 0.0
+
+
+def auto_reply_allowed(owner_id: int) -> bool:
+    """Whether the auto-reply budget of the post owner ``owner_id`` has room for one more."""
+    return not take([bucket(f"auto-replies:{owner_id}", settings.RATE_LIMIT_AUTO_REPLIES)])
+
+
+class RateLimitMiddleware:
+    """
+    Rejects API writes beyond the per-user or per-IP token bucket with a 429
+    and Retry-After. The user comes from the bearer token's claims, so
+    rejected requests never reach authentication or the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in WRITE_METHODS or not request.path.startswith("/api/"):
+            return self.get_response(request)
+
+        user_id = token_user_id(request)
+        retry_after = take([
+            bucket(f"ip:{request.META.get('REMOTE_ADDR')}", settings.RATE_LIMIT_IP),
+            bucket(f"user:{user_id}", settings.RATE_LIMIT_USER) if user_id is not None else None,
+        ])
+        if retry_after:
+            response = JsonResponse({"message": "Too many requests"}, status=429)
+            response["Retry-After"] = str(math.ceil(retry_after))
+            return response
+        return self.get_response(request)
@@ -0,0 +1,37 @@
+import orjson
+from django.http import HttpResponse
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback_encoder = NinjaJSONEncoder()
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(
+        dumps(data),
+        status=status,
+        content_type=f"{ORJSONRenderer.media_type}; charset={ORJSONRenderer.charset}"
+    )
+
+
+def projection_response(queryset, fields, status: int = 200) -> HttpResponse:
+    """
+    Serialize ``queryset`` as a list of objects with ``fields`` straight from
+    a ``.values()`` projection, skipping model instantiation and per-row
+    validation. Only valid for fields that are model fields.
+    """
+    return json_response(list(queryset.values(*fields)), status)
@@ -0,0 +1,31 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+# Per-request routing state, set by ReplicaRoutingMiddleware. Code running
+# outside a request (Celery tasks, management commands) always uses the primary.
+routing_state = ContextVar("routing_state", default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        state = routing_state.get()
+        if settings.DATABASE_REPLICAS and state and state["use_replica"]:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state:
+            # Reads later in the same request must see this write.
+            state["use_replica"] = False
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
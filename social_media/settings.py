@@ -26,6 +26,30 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+AI_API_KEY = os.getenv("AI_API_KEY")
+
+# OpenAI-compatible endpoint and model that write auto-replies.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.aimlapi.com")
+LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+
+# Every LLM call passes a gate shared by the workers (see posts.llm_gate):
+# a circuit breaker over the failed or slow calls of the last window, and an
+# adaptive limit on concurrent calls. Refused replies are retried after about
+# LLM_DEFER_SECONDS; replies overdue by LLM_REPLY_MAX_AGE, or scheduled while
+# LLM_MAX_QUEUE_DEPTH replies are queued, are dropped.
+LLM_GATE_BACKEND = os.getenv("LLM_GATE_BACKEND", "redis")
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", 60))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 10))
+LLM_BREAKER_FAILURE_RATIO = float(os.getenv("LLM_BREAKER_FAILURE_RATIO", 0.5))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", 10))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", 1))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", 16))
+LLM_DEFER_SECONDS = float(os.getenv("LLM_DEFER_SECONDS", 15))
+LLM_REPLY_MAX_AGE = float(os.getenv("LLM_REPLY_MAX_AGE", 15 * 60))
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", 1000))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -43,6 +67,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "ninja_extra",
     "ninja_jwt",
+    "social_media",
     "users",
     "posts",
     "comments",
@@ -50,12 +75,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "social_media.profiling.ProfilingMiddleware",
+    "social_media.slow_queries.SlowQueryMiddleware",
+    "social_media.ratelimit.RateLimitMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "social_media.middleware.ReplicaRoutingMiddleware",
+    "social_media.idempotency.IdempotencyMiddleware",
 ]
 
 ROOT_URLCONF = "social_media.urls"
@@ -82,11 +112,76 @@ WSGI_APPLICATION = "social_media.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "social_media.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "social_media"),
+            "USER": os.getenv("DB_USER", "postgres"),
+            "PASSWORD": os.getenv("DB_PASSWORD", ""),
+            "HOST": os.getenv("DB_HOST", "localhost"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+            # Pooled connections are returned at the end of every request,
+            # so persistent connections are only needed with the pool off.
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 0)),
+            "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
+            "POOL": {
+                "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+
+# Read replicas, as hosts for PostgreSQL or file paths for SQLite.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(","))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME" if DB_ENGINE == "sqlite" else "HOST": replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Comments are sharded by post id over these databases when COMMENT_SHARDS
+# lists SQLite files (or PostgreSQL hosts); otherwise they live in "default".
+# Add shards at the end of the list and run rebalance_comment_shards.
+COMMENT_SHARDS = []
+for index, shard in enumerate(filter(None, os.getenv("COMMENT_SHARDS", "").split(","))):
+    alias = f"comments_shard_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME" if DB_ENGINE == "sqlite" else "HOST": shard,
+        "TEST": {},
     }
+    COMMENT_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    "comments.sharding.CommentShardRouter",
+    "social_media.routers.PrimaryReplicaRouter",
+]
+
+# How long a client's reads stay on the primary after it writes.
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+# Applied to every new SQLite connection by social_media.db.configure_sqlite.
+# A database alias can override it with its own "SQLITE_PROFILE" key.
+SQLITE_PROFILE = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 128 * 1024 * 1024)),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+    "begin_immediate": os.getenv("SQLITE_BEGIN_IMMEDIATE", "True") == "True",
 }
 
 
@@ -133,8 +228,167 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.User"
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+if os.getenv("CACHE_BACKEND", "redis") == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Admin changelists count rows exactly up to this many and estimate beyond.
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT", 10000))
+
+# Queries slower than SLOW_QUERY_THRESHOLD_MS (0 disables) are aggregated by
+# normalized SQL, with their EXPLAIN plan, for `manage.py slow_queries` and
+# api/ops/slow-queries/.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_LOG_BACKEND = os.getenv("SLOW_QUERY_LOG_BACKEND", "redis")
+SLOW_QUERY_LOG_TTL = int(os.getenv("SLOW_QUERY_LOG_TTL", 7 * 24 * 60 * 60))
+
+# Comment writes read post metadata (owner, auto-reply settings, state) from
+# a per-process LRU of POST_CACHE_SIZE posts, kept POST_CACHE_TTL seconds.
+# Post updates evict it in every process through Redis pub/sub ("redis") or
+# only in their own process ("memory").
+POST_CACHE_SIZE = int(os.getenv("POST_CACHE_SIZE", 10000))
+POST_CACHE_TTL = float(os.getenv("POST_CACHE_TTL", 5))
+POST_CACHE_INVALIDATION = os.getenv("POST_CACHE_INVALIDATION", "redis")
+
+# GET api/users/?ids= resolves at most USER_BATCH_LIMIT ids per request, and
+# clients may cache the result for USER_BATCH_CACHE_SECONDS.
+USER_BATCH_LIMIT = int(os.getenv("USER_BATCH_LIMIT", 500))
+USER_BATCH_CACHE_SECONDS = int(os.getenv("USER_BATCH_CACHE_SECONDS", 5 * 60))
+
+# API writes are limited per user and per client IP, and auto-replies per
+# post owner, by token buckets given as "<requests>/<seconds>" (empty
+# disables a limit): the burst size, refilled evenly over the period.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis")
+RATE_LIMIT_USER = os.getenv("RATE_LIMIT_USER", "60/60")
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "300/60")
+RATE_LIMIT_AUTO_REPLIES = os.getenv("RATE_LIMIT_AUTO_REPLIES", "100/3600")
+
+# Responses to POSTs with an Idempotency-Key header are kept this long.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 10))
+
+# Staff requests sent with an X-Profile header or ?profile=1 are profiled; the
+# last PROFILER_BUFFER_SIZE profiles of each process are kept for api/ops/profiles/.
+PROFILER_BUFFER_SIZE = int(os.getenv("PROFILER_BUFFER_SIZE", 50))
+PROFILER_TOP_FUNCTIONS = int(os.getenv("PROFILER_TOP_FUNCTIONS", 50))
+
 # Celery Configuration Options
 CELERY_TIMEZONE = "Europe/Kiev"
 CELERY_TASK_TRACK_STARTED = True
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
+
+# Workers run one task after another for hours, so they keep their database
+# connections open (None) instead of following DB_CONN_MAX_AGE.
+WORKER_DB_CONN_MAX_AGE = (
+    int(os.getenv("WORKER_DB_CONN_MAX_AGE"))
+    if os.getenv("WORKER_DB_CONN_MAX_AGE") else None
+)
+
+# New comments are pushed to api/posts/<id>/comments/stream/ listeners through
+# Redis pub/sub ("redis") or in process ("memory", single process only).
+# Idle streams send a keep-alive line every COMMENT_STREAM_KEEPALIVE seconds;
+# reconnecting clients first get at most COMMENT_STREAM_CATCH_UP missed
+# comments, and each listener buffers at most COMMENT_STREAM_BUFFER events.
+COMMENT_STREAM_BACKEND = os.getenv("COMMENT_STREAM_BACKEND", "redis")
+COMMENT_STREAM_KEEPALIVE = float(os.getenv("COMMENT_STREAM_KEEPALIVE", 15))
+COMMENT_STREAM_CATCH_UP = int(os.getenv("COMMENT_STREAM_CATCH_UP", 100))
+COMMENT_STREAM_BUFFER = int(os.getenv("COMMENT_STREAM_BUFFER", 100))
+
+# "sync" writes comments in the request, "async" queues them and answers 202.
+COMMENT_INGESTION_MODE = os.getenv("COMMENT_INGESTION_MODE", "sync")
+# "redis" (a Redis stream) or "memory" (single process only).
+COMMENT_QUEUE_BACKEND = os.getenv("COMMENT_QUEUE_BACKEND", "redis")
+COMMENT_INGESTION_BATCH_SIZE = int(os.getenv("COMMENT_INGESTION_BATCH_SIZE", 500))
+
+# Replies nest at most this many levels below a top-level comment (up to 21,
+# bounded by the length of Comment.path).
+COMMENT_MAX_DEPTH = int(os.getenv("COMMENT_MAX_DEPTH", 16))
+
+# "inline" moderates content in the request, "deferred" stores it as pending
+# and lets posts.tasks.moderate_pending_content publish or block it in batches.
+# Deferred moderation publishes comments out of id order, so incremental sync
+# (?since_id=) is rejected and live streams cannot catch up on such comments.
+MODERATION_MODE = os.getenv("MODERATION_MODE", "inline")
+MODERATION_BATCH_SIZE = int(os.getenv("MODERATION_BATCH_SIZE", 1000))
+
+# Optional file of censored words, one per line, used instead of the
+# better_profanity default list.
+PROFANITY_WORDLIST = os.getenv("PROFANITY_WORDLIST")
+
+# Re-moderation jobs (posts.remoderation) scan existing content in batches of
+# REMODERATION_BATCH_SIZE over REMODERATION_WORKERS processes, at most
+# REMODERATION_MAX_ROWS_PER_SECOND rows per second (0 for no limit). A Celery
+# run stops after REMODERATION_TIME_BUDGET seconds and requeues the job.
+REMODERATION_BATCH_SIZE = int(os.getenv("REMODERATION_BATCH_SIZE", 5000))
+REMODERATION_WORKERS = int(os.getenv("REMODERATION_WORKERS", os.cpu_count() or 1))
+REMODERATION_MAX_ROWS_PER_SECOND = int(os.getenv("REMODERATION_MAX_ROWS_PER_SECOND", 20000))
+REMODERATION_TIME_BUDGET = float(os.getenv("REMODERATION_TIME_BUDGET", 60))
+
+# Comments of a deleted post are purged in batches of PURGE_BATCH_SIZE with
+# PURGE_BATCH_PAUSE seconds between them; one task run handles at most
+# PURGE_BATCHES_PER_RUN batches and then requeues itself.
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 1000))
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", 0.1))
+PURGE_BATCHES_PER_RUN = int(os.getenv("PURGE_BATCHES_PER_RUN", 50))
+
+# Comments older than COMMENT_ARCHIVE_AFTER_DAYS, and blocked comments older
+# than BLOCKED_COMMENT_RETENTION_DAYS, are moved to the archive table.
+COMMENT_ARCHIVE_AFTER_DAYS = int(os.getenv("COMMENT_ARCHIVE_AFTER_DAYS", 180))
+BLOCKED_COMMENT_RETENTION_DAYS = int(os.getenv("BLOCKED_COMMENT_RETENTION_DAYS", 7))
+COMMENT_ARCHIVE_BATCH_SIZE = int(os.getenv("COMMENT_ARCHIVE_BATCH_SIZE", 1000))
+
+# Trending posts rank posts by comments, each weighing half as much every
+# TRENDING_HALF_LIFE_HOURS, in a Redis sorted set ("redis") or in process
+# ("memory"). Compaction drops posts below TRENDING_MIN_SCORE and keeps at
+# most TRENDING_MAX_POSTS; rebuild_trending recounts the comments of the
+# last TRENDING_REBUILD_HALF_LIVES half-lives.
+TRENDING_BACKEND = os.getenv("TRENDING_BACKEND", "redis")
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 6))
+TRENDING_MIN_SCORE = float(os.getenv("TRENDING_MIN_SCORE", 0.05))
+TRENDING_MAX_POSTS = int(os.getenv("TRENDING_MAX_POSTS", 10000))
+TRENDING_REBUILD_HALF_LIVES = int(os.getenv("TRENDING_REBUILD_HALF_LIVES", 8))
+
+# New comments are buffered in Redis sets ("redis") or in the process
+# ("memory", single process only) and merged into the daily distinct-count
+# sketches every COMMENT_SKETCH_FLUSH_INTERVAL seconds, and before analytics
+# are read.
+COMMENT_SKETCH_BACKEND = os.getenv("COMMENT_SKETCH_BACKEND", "redis")
+
+CELERY_BEAT_SCHEDULE = {
+    "archive-old-comments": {
+        "task": "comments.tasks.archive_old_comments",
+        "schedule": float(os.getenv("COMMENT_ARCHIVE_INTERVAL", 60 * 60)),
+    },
+    # Resumes purges whose task was lost, e.g. when a worker died.
+    "purge-deleted-posts": {
+        "task": "posts.tasks.purge_deleted_posts",
+        "schedule": float(os.getenv("PURGE_SWEEP_INTERVAL", 15 * 60)),
+    },
+    "compact-trending": {
+        "task": "posts.tasks.compact_trending",
+        "schedule": float(os.getenv("TRENDING_COMPACT_INTERVAL", 10 * 60)),
+    },
+    "flush-comment-sketches": {
+        "task": "comments.tasks.flush_comment_sketches",
+        "schedule": float(os.getenv("COMMENT_SKETCH_FLUSH_INTERVAL", 30)),
+    },
+}
+
+if MODERATION_MODE == "deferred":
+    CELERY_BEAT_SCHEDULE["moderate-pending-content"] = {
+        "task": "posts.tasks.moderate_pending_content",
+        "schedule": float(os.getenv("MODERATION_INTERVAL", 5)),
+    }
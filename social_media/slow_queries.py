@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack, nullcontext
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from social_media.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Route of the request being served, set by SlowQueryMiddleware.
+current_route = ContextVar("current_route", default=None)
+_explaining = ContextVar("explaining", default=False)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse literals and IN lists so that queries differing only in values group together."""
+    return _LISTS.sub("(...)", _LITERALS.sub("%s", sql))
+
+
+def sql_digest(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def params_fingerprint(params) -> str:
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+
+class RedisSlowQueryLog:
+    index = "slow_queries"
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def _key(self, digest: str) -> str:
+        return f"{self.index}:{digest}"
+
+    def record(self, digest: str, sql: str, route: str, duration_ms: float,
+               fingerprint: str) -> None:
+        key = self._key(digest)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.hsetnx(key, "sql", sql)
+        pipeline.hincrby(key, "count", 1)
+        pipeline.hincrbyfloat(key, "total_ms", duration_ms)
+        pipeline.hset(key, mapping={"last_seen": time.time(), "last_params": fingerprint})
+        pipeline.hincrby(f"{key}:routes", route or "", 1)
+        pipeline.zincrby(self.index, duration_ms, digest)
+        pipeline.eval(
+            "if tonumber(redis.call('hget', KEYS[1], 'max_ms') or '0') < tonumber(ARGV[1]) "
+            "then redis.call('hset', KEYS[1], 'max_ms', ARGV[1]) end",
+            1, key, duration_ms
+        )
+        for name in (key, f"{key}:routes", self.index):
+            pipeline.expire(name, settings.SLOW_QUERY_LOG_TTL)
+        pipeline.execute()
+
+    def has_plan(self, digest: str) -> bool:
+        return bool(self.client.hexists(self._key(digest), "plan"))
+
+    def set_plan(self, digest: str, plan: str) -> None:
+        self.client.hset(self._key(digest), "plan", plan)
+
+    def entries(self, limit: int) -> list:
+        entries = []
+        for digest in self.client.zrevrange(self.index, 0, limit - 1):
+            digest = digest.decode()
+            data = {
+                field.decode(): value.decode()
+                for field, value in self.client.hgetall(self._key(digest)).items()
+            }
+            if not data:
+                continue
+            routes = self.client.hgetall(f"{self._key(digest)}:routes")
+            entries.append({
+                "digest": digest,
+                "sql": data["sql"],
+                "count": int(data["count"]),
+                "total_ms": float(data["total_ms"]),
+                "max_ms": float(data.get("max_ms", 0)),
+                "last_seen": float(data["last_seen"]),
+                "last_params": data["last_params"],
+                "routes": {route.decode(): int(count) for route, count in routes.items()},
+                "plan": data.get("plan"),
+            })
+        return entries
+
+    def clear(self) -> None:
+        digests = [digest.decode() for digest in self.client.zrange(self.index, 0, -1)]
+        keys = [self._key(digest) for digest in digests]
+        self.client.delete(self.index, *keys, *(f"{key}:routes" for key in keys))
+
+
+class MemorySlowQueryLog:
+    """In-process stand-in for RedisSlowQueryLog, for tests and single-process runs."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, digest: str, sql: str, route: str, duration_ms: float,
+               fingerprint: str) -> None:
+        with self._lock:
+            entry = self._entries.setdefault(digest, {
+                "digest": digest, "sql": sql, "count": 0, "total_ms": 0.0,
+                "max_ms": 0.0, "routes": {}, "plan": None,
+            })
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = time.time()
+            entry["last_params"] = fingerprint
+            entry["routes"][route or ""] = entry["routes"].get(route or "", 0) + 1
+
+    def has_plan(self, digest: str) -> bool:
+        entry = self._entries.get(digest)
+        return bool(entry and entry["plan"])
+
+    def set_plan(self, digest: str, plan: str) -> None:
+        with self._lock:
+            self._entries[digest]["plan"] = plan
+
+    def entries(self, limit: int) -> list:
+        with self._lock:
+            entries = sorted(
+                self._entries.values(), key=lambda entry: entry["total_ms"], reverse=True
+            )
+            return [{**entry, "routes": dict(entry["routes"])} for entry in entries[:limit]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+@lru_cache
+def _slow_query_log(backend: str):
+    if backend == "memory":
+        return MemorySlowQueryLog()
+    return RedisSlowQueryLog()
+
+
+def get_slow_query_log():
+    return _slow_query_log(settings.SLOW_QUERY_LOG_BACKEND)
+
+
+def explain(connection, sql: str, params) -> str:
+    token = _explaining.set(True)
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction.
+        savepoint = (
+            transaction.atomic(using=connection.alias)
+            if connection.in_atomic_block else nullcontext()
+        )
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+    finally:
+        _explaining.reset(token)
+
+
+class SlowQueryRecorder:
+    """
+    Execute wrapper that logs queries slower than SLOW_QUERY_THRESHOLD_MS,
+    grouped by normalized SQL. The plan of each group is captured with
+    EXPLAIN the first time it is slow; fast queries only cost a clock read.
+    """
+
+    def __init__(self, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+
+        if duration >= self.threshold and not _explaining.get():
+            try:
+                self.record(sql, params, many, context["connection"], duration * 1000)
+            except Exception:
+                logger.warning("Could not record a slow query", exc_info=True)
+        return result
+
+    @staticmethod
+    def record(sql, params, many, connection, duration_ms: float) -> None:
+        log = get_slow_query_log()
+        normalized = normalize_sql(sql)
+        digest = sql_digest(normalized)
+        log.record(
+            digest, normalized, current_route.get(), duration_ms, params_fingerprint(params)
+        )
+
+        if (
+            not many
+            and sql.lstrip()[:6].upper().startswith(EXPLAINABLE)
+            and not log.has_plan(digest)
+        ):
+            try:
+                log.set_plan(digest, explain(connection, sql, params))
+            except Exception as error:
+                log.set_plan(digest, f"EXPLAIN failed: {error}")
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_THRESHOLD_MS:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(settings.SLOW_QUERY_THRESHOLD_MS)
+        token = current_route.set(request.path_info)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                return self.get_response(request)
+        finally:
+            current_route.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match is not None:
+            current_route.set(request.resolver_match.route)
@@ -0,0 +1,451 @@
+import json
+import marshal
+import sqlite3
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from ninja_jwt.tokens import RefreshToken
+
+from comments.models import Comment
+from posts.models import Post
+from social_media.admin import EstimatedCountPaginator
+from social_media.backends.pool import ConnectionPool, get_pool
+from social_media.db import sqlite_pragmas
+from social_media.idempotency import idempotency_cache_key
+from social_media.profiling import profiles
+from social_media.ratelimit import MemoryRateLimiter, bucket, get_rate_limiter
+from social_media.slow_queries import get_slow_query_log, normalize_sql
+from social_media.routers import PrimaryReplicaRouter, routing_state
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_invalid_journal_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            sqlite_pragmas({"journal_mode": "WAL; DROP TABLE posts_post"})
+
+    def test_atomic_uses_begin_immediate(self):
+        connection.ensure_connection()
+        self.assertEqual(
+            connection._start_transaction_under_autocommit.__name__,
+            "_begin_immediate"
+        )
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OSError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self, setup_time: float = 0):
+        time.sleep(setup_time)
+        self.closed = False
+        self.broken = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    def test_connection_reused(self):
+        pool = ConnectionPool(max_size=2)
+
+        first = pool.get(FakeConnection)
+        pool.put(first)
+        second = pool.get(FakeConnection)
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.created, 1)
+        self.assertEqual(pool.reused, 1)
+
+    def test_broken_and_expired_connections_discarded(self):
+        pool = ConnectionPool(max_size=2, max_idle=60)
+        broken = pool.get(FakeConnection)
+        pool.put(broken)
+        broken.broken = True
+
+        self.assertIsNot(pool.get(FakeConnection), broken)
+        self.assertTrue(broken.closed)
+
+        pool.max_idle = 0
+        expired = pool.get(FakeConnection)
+        pool.put(expired)
+        self.assertIsNot(pool.get(FakeConnection), expired)
+
+    def test_idle_connections_bounded(self):
+        pool = ConnectionPool(max_size=1)
+        connections = [pool.get(FakeConnection) for _ in range(3)]
+        for connection in connections:
+            pool.put(connection)
+
+        self.assertEqual(len(pool), 1)
+        self.assertTrue(connections[1].closed)
+        self.assertTrue(connections[2].closed)
+
+    def test_setup_time_saved(self):
+        pool = ConnectionPool(max_size=1)
+        connect = partial(FakeConnection, setup_time=0.01)
+
+        start = time.perf_counter()
+        for _ in range(20):
+            pool.put(pool.get(connect))
+        pooled = time.perf_counter() - start
+
+        self.assertEqual(pool.created, 1)
+        self.assertLess(pooled, 20 * 0.01 / 2)
+
+    def test_pool_disabled_without_size(self):
+        self.assertIsNone(get_pool("other", {"POOL": {"max_size": 0}}))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_test"])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        connections.databases["replica_test"] = {
+            **connections.databases["default"],
+            "NAME": str(Path(self.directory.name) / "replica.sqlite3"),
+        }
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(self.user).access_token)}"
+        }
+        self.replicate()
+
+    def tearDown(self):
+        connections["replica_test"].close()
+        del connections["replica_test"]
+        del connections.databases["replica_test"]
+        self.directory.cleanup()
+
+    def replicate(self):
+        replica = sqlite3.connect(connections.databases["replica_test"]["NAME"])
+        connections["default"].ensure_connection()
+        connections["default"].connection.backup(replica)
+        replica.close()
+
+    def test_reads_go_to_replica_until_replicated(self):
+        Post.objects.create(title="Test", content="Test", user=self.user)
+
+        response = Client().get("/api/posts/")
+        self.assertEqual(len(json.loads(response.content)), 0)
+
+        self.replicate()
+        response = Client().get("/api/posts/")
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    def test_writer_reads_own_writes(self):
+        client = Client()
+        response = client.post(
+            "/api/posts/",
+            data=json.dumps({"title": "New post", "content": "Test"}),
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertIn("db_primary_until", response.cookies)
+
+        response = client.get("/api/posts/")
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+        response = Client().get("/api/posts/")
+        self.assertEqual(len(json.loads(response.content)), 0)
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        router = PrimaryReplicaRouter()
+        token = routing_state.set({"use_replica": True})
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica_test")
+            router.db_for_write(Post)
+            self.assertEqual(router.db_for_read(Post), "default")
+        finally:
+            routing_state.reset(token)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+})
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username="user1", password="user1"
+        )
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(self.user).access_token)}",
+            "HTTP_IDEMPOTENCY_KEY": "retry-1",
+        }
+        self.addCleanup(cache.clear)
+
+    def create_post(self, title="New post", **headers):
+        return self.client.post(
+            "/api/posts/",
+            data=json.dumps({"title": title, "content": "Test"}),
+            content_type="application/json",
+            **{**self.headers, **headers}
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.create_post()
+        second = self.create_post()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_different_keys_create_separate_posts(self):
+        self.create_post()
+        self.create_post(HTTP_IDEMPOTENCY_KEY="retry-2")
+
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        self.create_post()
+        response = self.create_post(title="Other post")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Post.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=0)
+    def test_concurrent_duplicate_rejected_while_in_progress(self):
+        cache.add(f"{idempotency_cache_key(self.user.id, 'retry-1')}:lock", 1)
+
+        response = self.create_post()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_expired_lock_taken_by_another_request_is_kept(self):
+        lock_key = f"{idempotency_cache_key(self.user.id, 'retry-1')}:lock"
+
+        def expire_and_take_over(**kwargs):
+            cache.set(lock_key, "other request")
+
+        post_save.connect(expire_and_take_over, sender=Post)
+        self.addCleanup(post_save.disconnect, expire_and_take_over, sender=Post)
+        self.create_post()
+
+        self.assertEqual(cache.get(lock_key), "other request")
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        staff = get_user_model().objects.create_superuser(username="admin", password="admin")
+        user = get_user_model().objects.create_user(username="user1", password="user1")
+        self.staff_headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(staff).access_token)}"
+        }
+        self.user_headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(user).access_token)}"
+        }
+        Post.objects.create(title="Test", content="Test", user=staff)
+        profiles.clear()
+        self.addCleanup(profiles.clear)
+
+    def test_staff_request_is_profiled(self):
+        response = self.client.get("/api/posts/", HTTP_X_PROFILE="1", **self.staff_headers)
+        profile_id = response["X-Profile-Id"]
+
+        response = self.client.get("/api/ops/profiles/", **self.staff_headers)
+        summary = json.loads(response.content)[0]
+        self.assertEqual(summary["id"], profile_id)
+        self.assertEqual(summary["path"], "/api/posts/")
+        self.assertGreater(summary["query_count"], 0)
+
+        profile = json.loads(
+            self.client.get(f"/api/ops/profiles/{profile_id}/", **self.staff_headers).content
+        )
+        self.assertTrue(any("posts_post" in query["sql"] for query in profile["queries"]))
+        self.assertTrue(profile["functions"])
+
+        response = self.client.get(
+            f"/api/ops/profiles/{profile_id}/download/", **self.staff_headers
+        )
+        self.assertIsInstance(marshal.loads(response.content), dict)
+
+    def test_other_requests_are_not_profiled(self):
+        response = self.client.get("/api/posts/?profile=1", **self.user_headers)
+        self.assertNotIn("X-Profile-Id", response)
+        response = self.client.get("/api/posts/", **self.staff_headers)
+        self.assertNotIn("X-Profile-Id", response)
+        for query in ("?noprofile=1", "?profile=10"):
+            with mock.patch("social_media.profiling.is_staff") as is_staff:
+                response = self.client.get(f"/api/posts/{query}", **self.staff_headers)
+            self.assertNotIn("X-Profile-Id", response)
+            is_staff.assert_not_called()
+
+        self.assertEqual(profiles.list(), [])
+        response = self.client.get("/api/ops/profiles/", **self.user_headers)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PROFILER_TOP_FUNCTIONS=5)
+    def test_buffer_keeps_recent_profiles(self):
+        for _ in range(settings.PROFILER_BUFFER_SIZE + 1):
+            self.client.get("/api/posts/?profile=1", **self.staff_headers)
+
+        self.assertEqual(len(profiles.list()), settings.PROFILER_BUFFER_SIZE)
+        self.assertEqual(len(profiles.list()[0]["functions"]), 5)
+
+
+@override_settings(SLOW_QUERY_LOG_BACKEND="memory", SLOW_QUERY_THRESHOLD_MS=0.000001)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        staff = get_user_model().objects.create_superuser(username="admin", password="admin")
+        self.headers = {
+            "HTTP_AUTHORIZATION": f"Bearer {str(RefreshToken.for_user(staff).access_token)}"
+        }
+        self.post = Post.objects.create(title="Test", content="Test", user=staff)
+        get_slow_query_log().clear()
+        self.addCleanup(get_slow_query_log().clear)
+
+    def test_normalizes_literals_and_lists(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 5 AND b = 'x' AND c IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE a = %s AND b = %s AND c IN (...)"
+        )
+
+    def test_slow_queries_are_grouped_with_route_and_plan(self):
+        self.client.get(f"/api/posts/{self.post.id}/")
+        self.client.get(f"/api/posts/{self.post.id}/")
+
+        entry = next(
+            entry for entry in get_slow_query_log().entries(50)
+            if 'FROM "posts_post"' in entry["sql"]
+        )
+        self.assertEqual(entry["count"], 2)
+        self.assertEqual(entry["routes"], {"api/posts/<post_id>/": 2})
+        self.assertIn("posts_post", entry["plan"])
+
+    def test_staff_endpoint_lists_and_clears(self):
+        self.client.get("/api/posts/")
+
+        response = self.client.get("/api/ops/slow-queries/?limit=5", **self.headers)
+        self.assertTrue(json.loads(response.content))
+
+        self.client.delete("/api/ops/slow-queries/", **self.headers)
+        self.assertEqual(get_slow_query_log().entries(50), [])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_disabled_by_zero_threshold(self):
+        self.client.get("/api/posts/")
+        self.assertEqual(get_slow_query_log().entries(50), [])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="user1", password="user1")
+        Post.objects.bulk_create(
+            Post(title="Test", content="Test", user=user) for _ in range(5)
+        )
+
+    def test_counts_exactly_below_limit(self):
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=10):
+            self.assertEqual(EstimatedCountPaginator(Post.objects.order_by("id"), 2).count, 5)
+
+    def test_count_is_bounded_without_planner_statistics(self):
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=2):
+            paginator = EstimatedCountPaginator(Post.objects.order_by("id"), 2)
+            self.assertEqual(paginator.count, 3)
+
+
+@override_settings(
+    RATE_LIMIT_BACKEND="memory", RATE_LIMIT_USER="2/60", RATE_LIMIT_IP="3/60",
+    RATE_LIMIT_AUTO_REPLIES="1/3600", POST_CACHE_INVALIDATION="memory"
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = get_user_model().objects.create_user(username="owner", password="owner")
+        self.users = [
+            get_user_model().objects.create_user(username=f"user{index}", password="user")
+            for index in range(2)
+        ]
+        self.post = Post.objects.create(
+            title="Test", content="Test", user=self.owner, auto_reply_enabled=True
+        )
+        get_rate_limiter().clear()
+        self.addCleanup(get_rate_limiter().clear)
+
+    def comment(self, user, **extra):
+        token = str(RefreshToken.for_user(user).access_token)
+        return self.client.post(
+            f"/api/posts/{self.post.id}/comments/",
+            data={"comment": "Nice"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            **extra
+        )
+
+    def test_buckets_refill_over_time(self):
+        limiter = MemoryRateLimiter()
+        buckets = [bucket("user:1", "2/10"), bucket("ip:1", "5/10")]
+
+        self.assertEqual(limiter.take(buckets, now=0), 0)
+        self.assertEqual(limiter.take(buckets, now=0), 0)
+        self.assertEqual(limiter.take(buckets, now=0), 5)
+        self.assertEqual(limiter.take(buckets, now=5), 0)
+
+    def test_rejects_users_over_limit_before_touching_the_database(self):
+        with mock.patch("posts.tasks.send_auto_reply.apply_async"):
+            for _ in range(2):
+                self.assertEqual(self.comment(self.users[0]).status_code, 201)
+
+            with self.assertNumQueries(0):
+                response = self.comment(self.users[0])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_rejects_addresses_over_limit(self):
+        with mock.patch("posts.tasks.send_auto_reply.apply_async"):
+            responses = [
+                self.comment(user) for user in (self.users[0], self.users[1], self.users[0])
+            ]
+            rejected = self.comment(self.users[1])
+            elsewhere = self.comment(self.users[1], REMOTE_ADDR="10.0.0.1")
+
+        self.assertEqual([response.status_code for response in responses], [201, 201, 201])
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected["Retry-After"], "20")
+        self.assertEqual(elsewhere.status_code, 201)
+
+    def test_auto_replies_are_budgeted_per_post_owner(self):
+        with mock.patch("posts.tasks.send_auto_reply.apply_async") as apply_async:
+            self.comment(self.users[0])
+            self.comment(self.users[1])
+
+        self.assertEqual(Comment.objects.count(), 2)
+        apply_async.assert_called_once()
@@ -18,11 +18,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from comments.views import comment_stream
 from users.api import api as user_api
 from posts.api import api as post_api
+from social_media.api import api as ops_api
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", user_api.urls),
+    path("api/posts/<int:post_id>/comments/stream/", comment_stream, name="comment-stream"),
     path("api/posts/", post_api.urls),
+    path("api/ops/", ops_api.urls),
 ]
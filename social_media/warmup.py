@@ -0,0 +1,12 @@
+from django.urls import get_resolver
+
+from posts.moderation import get_profanity
+
+
+def warm_up():
+    """
+    Load what the first request would otherwise load: the URL conf with all
+    API modules and the profanity word set. Called once at worker boot.
+    """
+    get_resolver().url_patterns
+    get_profanity()
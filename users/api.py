@@ -1,11 +1,14 @@
 from ninja_jwt.controller import NinjaJWTDefaultController
 from ninja_extra import NinjaExtraAPI, api_controller, route
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils.cache import patch_cache_control
 
-from users.schemas import UserCreationSchema, RegisterResponseSchema, Error
+from users.schemas import UserCreationSchema, RegisterResponseSchema, UserSchema, Error
+from social_media.renderers import ORJSONRenderer, json_response
 
 
-api = NinjaExtraAPI(urls_namespace="user-api")
+api = NinjaExtraAPI(urls_namespace="user-api", renderer=ORJSONRenderer())
 api.register_controllers(NinjaJWTDefaultController)
 User = get_user_model()
 
@@ -28,4 +31,30 @@ class RegisterController:
         return {"id": user.id, "username": user.username}
 
 
-api.register_controllers(RegisterController)
+@api_controller()
+class UserController:
+    @route.get(
+        "/",
+        response={200: list[UserSchema], 400: Error}
+    )
+    def get_users(self, request, ids: str):
+        """
+        Resolve the comma-separated user ``ids`` with one primary-key lookup.
+        Unknown ids are left out. The response may be cached by clients and
+        proxies for USER_BATCH_CACHE_SECONDS.
+        """
+        try:
+            user_ids = {int(user_id) for user_id in ids.split(",") if user_id.strip()}
+        except ValueError:
+            return 400, {"message": "ids must be comma-separated integers"}
+        if len(user_ids) > settings.USER_BATCH_LIMIT:
+            return 400, {"message": f"At most {settings.USER_BATCH_LIMIT} ids per request"}
+
+        response = json_response(list(
+            User.objects.filter(id__in=user_ids).order_by("id").values("id", "username")
+        ))
+        patch_cache_control(response, public=True, max_age=settings.USER_BATCH_CACHE_SECONDS)
+        return response
+
+
+api.register_controllers(RegisterController, UserController)
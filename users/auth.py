@@ -0,0 +1,19 @@
+from django.contrib.auth.models import AnonymousUser
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+class OptionalJWTAuth(JWTAuth):
+    """Authenticates a bearer token when one is sent, otherwise lets the
+    request through with an anonymous user."""
+
+    def __call__(self, request):
+        try:
+            user = super().__call__(request)
+        except (InvalidToken, AuthenticationFailed):
+            user = None
+
+        if user is None:
+            request.user = AnonymousUser()
+            return request.user
+        return user
@@ -12,5 +12,10 @@ class RegisterResponseSchema(Schema):
     username: str
 
 
+class UserSchema(Schema):
+    id: int
+    username: str
+
+
 class Error(Schema):
     message: str
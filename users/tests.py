@@ -1,3 +1,30 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+
+
+class UserBatchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.users = [
+            get_user_model().objects.create_user(username=f"user{index}", password="user")
+            for index in range(3)
+        ]
+
+    def test_resolves_ids_in_one_query(self):
+        ids = ",".join(str(user.id) for user in reversed(self.users))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/users/?ids={ids},999")
+
+        self.assertEqual(
+            json.loads(response.content),
+            [{"id": user.id, "username": user.username} for user in self.users]
+        )
+        self.assertIn("max-age", response["Cache-Control"])
+
+    @override_settings(USER_BATCH_LIMIT=2)
+    def test_rejects_too_many_or_invalid_ids(self):
+        self.assertEqual(self.client.get("/api/users/?ids=1,2,3").status_code, 400)
+        self.assertEqual(self.client.get("/api/users/?ids=1,x").status_code, 400)